@@ -0,0 +1,216 @@
+"""
+WebSocket fan-out for the chat interface
+Messages are serialized once and queued per connection, each connection has its
+own writer task so that a slow client only delays itself, and messages are
+relayed to the other uvicorn workers through Redis pub/sub
+"""
+
+import asyncio
+import json
+import uuid
+from typing import Dict, Iterable, Optional, Set
+
+from fastapi import WebSocket
+from loguru import logger
+
+BROADCAST_CHANNEL = "adhd:websocket"
+
+# What to do when a connection's queue is full
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+DISCONNECT = "disconnect"
+SLOW_CONSUMER_POLICIES = (DROP_OLDEST, DROP_NEWEST, DISCONNECT)
+
+# Close code sent to clients disconnected for not keeping up
+TRY_AGAIN_LATER = 1013
+
+
+class Connection:
+    """A single WebSocket with its bounded outgoing queue"""
+
+    def __init__(self, websocket: WebSocket, user_id: Optional[str], queue_size: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(queue_size, 1))
+        self.dropped = 0
+        self.writer: Optional[asyncio.Task] = None
+
+
+class ConnectionManager:
+    """Tracks the WebSockets of this worker and delivers messages to them
+
+    A user may have several sockets open, e.g. one per browser tab.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = 100,
+        slow_consumer_policy: str = DROP_OLDEST,
+        send_timeout_seconds: float = 10.0,
+        channel: str = BROADCAST_CHANNEL,
+    ):
+        if slow_consumer_policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {slow_consumer_policy}")
+        self.queue_size = queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        self.send_timeout_seconds = send_timeout_seconds
+        self.channel = channel
+        self.connections: Dict[WebSocket, Connection] = {}
+        self.user_connections: Dict[str, Set[Connection]] = {}
+        self.worker_id = uuid.uuid4().hex
+        self.redis = None
+        self.relay_task: Optional[asyncio.Task] = None
+        # Closes of slow consumers in flight, kept until done so they are not collected
+        self._closing: Set[asyncio.Task] = set()
+        self.dropped_messages = 0
+        self.slow_disconnects = 0
+
+    @property
+    def active_connections(self):
+        return list(self.connections)
+
+    async def connect(self, websocket: WebSocket, user_id: str = None):
+        await websocket.accept()
+        connection = Connection(websocket, user_id, self.queue_size)
+        self.connections[websocket] = connection
+        if user_id:
+            self.user_connections.setdefault(user_id, set()).add(connection)
+        connection.writer = asyncio.create_task(self._write(connection))
+        logger.info(f"WebSocket connected for user: {user_id}")
+
+    def disconnect(self, websocket: WebSocket, user_id: str = None):
+        connection = self.connections.pop(websocket, None)
+        if connection is None:
+            return
+        if connection.user_id in self.user_connections:
+            self.user_connections[connection.user_id].discard(connection)
+            if not self.user_connections[connection.user_id]:
+                del self.user_connections[connection.user_id]
+        if connection.writer is not None and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+        logger.info(f"WebSocket disconnected for user: {connection.user_id}")
+
+    async def _write(self, connection: Connection):
+        try:
+            while self.connections.get(connection.websocket) is connection:
+                text = await connection.queue.get()
+                async with asyncio.timeout(self.send_timeout_seconds):
+                    await connection.websocket.send_text(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"Dropping WebSocket for user {connection.user_id}: {e!r}")
+            self.disconnect(connection.websocket)
+            await self._close(connection.websocket, TRY_AGAIN_LATER)
+
+    async def _close(self, websocket: WebSocket, code: int):
+        try:
+            await asyncio.wait_for(websocket.close(code=code), self.send_timeout_seconds)
+        except Exception:
+            pass
+
+    def _enqueue(self, connection: Connection, text: str):
+        try:
+            connection.queue.put_nowait(text)
+            return
+        except asyncio.QueueFull:
+            pass
+        connection.dropped += 1
+        self.dropped_messages += 1
+        if self.slow_consumer_policy == DROP_OLDEST:
+            connection.queue.get_nowait()
+            connection.queue.put_nowait(text)
+        elif self.slow_consumer_policy == DISCONNECT:
+            logger.warning(f"Disconnecting slow WebSocket consumer for user: {connection.user_id}")
+            self.slow_disconnects += 1
+            self.disconnect(connection.websocket)
+            closing = asyncio.create_task(self._close(connection.websocket, TRY_AGAIN_LATER))
+            self._closing.add(closing)
+            closing.add_done_callback(self._closing.discard)
+
+    def deliver(self, text: str, user_id: Optional[str] = None):
+        """Queue an already serialized message for local sockets, never blocks"""
+        targets: Iterable[Connection]
+        if user_id is None:
+            targets = list(self.connections.values())
+        else:
+            targets = list(self.user_connections.get(user_id, ()))
+        for connection in targets:
+            self._enqueue(connection, text)
+
+    async def send(self, websocket: WebSocket, message: dict) -> bool:
+        """Queue a message for one socket, waiting for room instead of dropping
+
+        Used for streamed replies, where losing a message would corrupt the
+        stream; returns whether the socket is still connected.
+        """
+        connection = self.connections.get(websocket)
+        if connection is None:
+            return False
+        try:
+            async with asyncio.timeout(self.send_timeout_seconds):
+                await connection.queue.put(json.dumps(message))
+        except TimeoutError:
+            return False
+        return self.connections.get(websocket) is connection
+
+    async def send_personal_message(self, message: dict, user_id: str):
+        text = json.dumps(message)
+        self.deliver(text, user_id)
+        await self._publish(text, user_id)
+
+    async def broadcast(self, message: dict):
+        text = json.dumps(message)
+        self.deliver(text)
+        await self._publish(text)
+
+    async def _publish(self, text: str, user_id: Optional[str] = None):
+        if self.redis is None:
+            return
+        envelope = json.dumps({"origin": self.worker_id, "user_id": user_id, "text": text})
+        try:
+            await self.redis.publish(self.channel, envelope)
+        except Exception as e:
+            logger.warning(f"Failed to relay WebSocket message to other workers: {e}")
+
+    def start_relay(self, redis):
+        """Exchange messages with the other workers through Redis pub/sub"""
+        self.redis = redis
+        self.relay_task = asyncio.create_task(self._relay())
+
+    async def stop_relay(self):
+        if self.relay_task:
+            self.relay_task.cancel()
+            await asyncio.gather(self.relay_task, return_exceptions=True)
+            self.relay_task = None
+        self.redis = None
+
+    async def _relay(self, retry_seconds: float = 1.0):
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                logger.info(f"Relaying WebSocket messages on {self.channel}")
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    envelope = json.loads(message["data"])
+                    if envelope.get("origin") == self.worker_id:
+                        continue
+                    self.deliver(envelope["text"], envelope.get("user_id"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"WebSocket relay subscription lost: {e}")
+            finally:
+                try:
+                    await pubsub.unsubscribe(self.channel)
+                    await pubsub.close()
+                except Exception:
+                    pass
+            await asyncio.sleep(retry_seconds)
+
+    async def close_all(self):
+        for websocket in list(self.connections):
+            self.disconnect(websocket)
+            await self._close(websocket, 1001)
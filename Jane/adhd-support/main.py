@@ -7,47 +7,29 @@ import asyncio
 import logging
 import os
 import json
+import time
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from contextlib import aclosing
+from typing import Optional, List, Dict, Any, AsyncIterator
 from pydantic import BaseModel, Field
 from dataclasses import dataclass, asdict
-import aioredis
+from redis import asyncio as aioredis
 import asyncpg
 import httpx
 from loguru import logger
 
+from connection_manager import ConnectionManager
+from motoko_client import MotokoBusy, MotokoClient
+
 # Configure logging
 logger.add("logs/adhd_support.log", rotation="1 day", retention="7 days", level="INFO")
 
 # WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.user_connections: Dict[str, WebSocket] = {}
-
-    async def connect(self, websocket: WebSocket, user_id: str = None):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        if user_id:
-            self.user_connections[user_id] = websocket
-        logger.info(f"WebSocket connected for user: {user_id}")
-
-    def disconnect(self, websocket: WebSocket, user_id: str = None):
-        self.active_connections.remove(websocket)
-        if user_id and user_id in self.user_connections:
-            del self.user_connections[user_id]
-        logger.info(f"WebSocket disconnected for user: {user_id}")
-
-    async def send_personal_message(self, message: dict, user_id: str):
-        if user_id in self.user_connections:
-            websocket = self.user_connections[user_id]
-            await websocket.send_text(json.dumps(message))
-
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            await connection.send_text(json.dumps(message))
-
-manager = ConnectionManager()
+manager = ConnectionManager(
+    queue_size=int(os.getenv("WEBSOCKET_QUEUE_SIZE", "100")),
+    slow_consumer_policy=os.getenv("WEBSOCKET_SLOW_CONSUMER_POLICY", "drop_oldest"),
+    send_timeout_seconds=float(os.getenv("WEBSOCKET_SEND_TIMEOUT_SECONDS", "10")),
+)
 
 # Rate limiting
 limiter = Limiter(key_func=get_remote_address)
@@ -92,6 +74,10 @@ class HealthResponse(BaseModel):
     timestamp: datetime
     services: Dict[str, str]
 
+# Active focus sessions are indexed in a sorted set scored by expiry time, so
+# they can be listed and counted without scanning the keyspace
+ACTIVE_SESSIONS_KEY = "active_sessions"
+
 # ADHD Support Service
 class ADHDSupportService:
     """Core service for ADHD executive function support"""
@@ -99,9 +85,19 @@ class ADHDSupportService:
     def __init__(self):
         self.redis_pool = None
         self.db_pool = None
-        self.motoko_client = httpx.AsyncClient()
         self.motoko_url = os.getenv("MOTOKO_LLM_URL", "http://192.168.1.12:8000")
         
+        # One pooled client for every Motoko call, with a cap on concurrent generations
+        self.motoko_client = MotokoClient(
+            self.motoko_url,
+            max_concurrency=int(os.getenv("MOTOKO_MAX_CONCURRENCY", "2")),
+            max_queue=int(os.getenv("MOTOKO_MAX_QUEUE", "8")),
+            queue_timeout_seconds=float(os.getenv("MOTOKO_QUEUE_TIMEOUT_SECONDS", "10")),
+            generate_timeout_seconds=float(os.getenv("MOTOKO_GENERATE_TIMEOUT_SECONDS", "30")),
+            health_timeout_seconds=float(os.getenv("MOTOKO_HEALTH_TIMEOUT_SECONDS", "5")),
+            health_ttl_seconds=float(os.getenv("MOTOKO_HEALTH_TTL_SECONDS", "10")),
+        )
+        
     async def initialize(self):
         """Initialize database connections"""
         try:
@@ -218,18 +214,48 @@ class ADHDSupportService:
             
             session.id = str(result['id'])
         
-        # Store active session in Redis
-        await self.redis_pool.setex(
-            f"active_session:{session.id}",
-            session.duration_minutes * 60,  # TTL = session duration
-            json.dumps(asdict(session), default=str)
-        )
+        # Store active session in Redis and index it by expiry time
+        ttl = session.duration_minutes * 60  # TTL = session duration
+        async with self.redis_pool.pipeline(transaction=True) as pipe:
+            pipe.setex(f"active_session:{session.id}", ttl, session.model_dump_json())
+            pipe.zadd(ACTIVE_SESSIONS_KEY, {session.id: time.time() + ttl})
+            await pipe.execute()
         
         logger.info(f"Started focus session: {session.id} for {session.duration_minutes} minutes")
         return session
     
-    async def ask_ai(self, request: AIRequest) -> Dict[str, Any]:
-        """Send AI request to Motoko with ADHD-optimized prompting"""
+    async def get_active_sessions(self) -> List[Dict[str, Any]]:
+        """Get currently active focus sessions, dropping expired ones from the index"""
+        async with self.redis_pool.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(ACTIVE_SESSIONS_KEY, "-inf", time.time())
+            pipe.zrange(ACTIVE_SESSIONS_KEY, 0, -1)
+            _, session_ids = await pipe.execute()
+        if not session_ids:
+            return []
+        
+        values = await self.redis_pool.mget([f"active_session:{session_id}" for session_id in session_ids])
+        sessions = []
+        missing = []
+        for session_id, value in zip(session_ids, values):
+            if value is None:
+                missing.append(session_id)
+            else:
+                sessions.append(json.loads(value))
+        if missing:
+            # Deleted or evicted before its expiry time
+            await self.redis_pool.zrem(ACTIVE_SESSIONS_KEY, *missing)
+        return sessions
+    
+    async def count_active_sessions(self) -> int:
+        """Count currently active focus sessions"""
+        async with self.redis_pool.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(ACTIVE_SESSIONS_KEY, "-inf", time.time())
+            pipe.zcard(ACTIVE_SESSIONS_KEY)
+            _, count = await pipe.execute()
+        return count
+    
+    def _motoko_payload(self, request: AIRequest) -> Dict[str, Any]:
+        """Build the Motoko request with ADHD-optimized prompting"""
         
         # Add ADHD-friendly context to the prompt
         enhanced_prompt = f"""
@@ -243,49 +269,70 @@ Please provide:
 3. Keep response concise but complete
 4. Use bullet points or numbered lists when helpful
 """
-        
+        return {
+            "prompt": enhanced_prompt,
+            "options": {
+                "max_tokens": 500,
+                "temperature": 0.7
+            }
+        }
+    
+    async def _remember_exchange(self, request: AIRequest, response: str):
+        """Cache the conversation for context"""
+        if request.conversation_id:
+            await self.redis_pool.lpush(
+                f"conversation:{request.conversation_id}",
+                json.dumps({
+                    "prompt": request.prompt,
+                    "response": response,
+                    "timestamp": datetime.utcnow().isoformat()
+                })
+            )
+            # Keep only last 10 messages
+            await self.redis_pool.ltrim(f"conversation:{request.conversation_id}", 0, 9)
+    
+    async def ask_ai(self, request: AIRequest) -> Dict[str, Any]:
+        """Send AI request to Motoko with ADHD-optimized prompting"""
         try:
-            async with self.motoko_client as client:
-                response = await client.post(
-                    f"{self.motoko_url}/generate",
-                    json={
-                        "prompt": enhanced_prompt,
-                        "max_tokens": 500,
-                        "temperature": 0.7
-                    },
-                    timeout=30.0
-                )
+            response = await self.motoko_client.generate(self._motoko_payload(request))
+            
+            if response.status_code == 200:
+                result = response.json()
+                await self._remember_exchange(request, result.get("response", ""))
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    
-                    # Cache the conversation for context
-                    if request.conversation_id:
-                        await self.redis_pool.lpush(
-                            f"conversation:{request.conversation_id}",
-                            json.dumps({
-                                "prompt": request.prompt,
-                                "response": result.get("response", ""),
-                                "timestamp": datetime.utcnow().isoformat()
-                            })
-                        )
-                        # Keep only last 10 messages
-                        await self.redis_pool.ltrim(f"conversation:{request.conversation_id}", 0, 9)
-                    
-                    return {
-                        "response": result.get("response", ""),
-                        "conversation_id": request.conversation_id,
-                        "timestamp": datetime.utcnow().isoformat()
-                    }
-                else:
-                    raise HTTPException(status_code=502, detail="AI service unavailable")
-                    
+                return {
+                    "response": result.get("response", ""),
+                    "conversation_id": request.conversation_id,
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+            else:
+                raise HTTPException(status_code=502, detail="AI service unavailable")
+                
+        except MotokoBusy:
+            raise HTTPException(status_code=503, detail="AI service is busy, please retry", headers={"Retry-After": "1"})
         except httpx.TimeoutException:
             raise HTTPException(status_code=408, detail="AI request timed out")
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"AI request failed: {e}")
             raise HTTPException(status_code=500, detail="AI request failed")
     
+    async def stream_ai(self, request: AIRequest) -> AsyncIterator[str]:
+        """Yield the AI response token by token as Motoko generates it
+        
+        Closing the generator early stops the generation on Motoko.
+        """
+        tokens = []
+        async with aclosing(self.motoko_client.stream(self._motoko_payload(request))) as events:
+            async for event in events:
+                if "error" in event:
+                    raise RuntimeError(event["error"])
+                if "token" in event:
+                    tokens.append(event["token"])
+                    yield event["token"]
+        await self._remember_exchange(request, "".join(tokens))
+    
     async def get_health_status(self) -> HealthResponse:
         """Check health of all connected services"""
         services = {}
@@ -305,13 +352,8 @@ Please provide:
         except Exception:
             services["postgresql"] = "unhealthy"
         
-        # Check Motoko
-        try:
-            async with self.motoko_client as client:
-                response = await client.get(f"{self.motoko_url}/health", timeout=5.0)
-                services["motoko"] = "healthy" if response.status_code == 200 else "unhealthy"
-        except Exception:
-            services["motoko"] = "unhealthy"
+        # Check Motoko, the result is cached for a few seconds
+        services["motoko"] = "healthy" if await self.motoko_client.healthy() else "unhealthy"
         
         overall_status = "healthy" if all(s == "healthy" for s in services.values()) else "degraded"
         
@@ -347,9 +389,12 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 @app.on_event("startup")
 async def startup_event():
     await adhd_service.initialize()
+    manager.start_relay(adhd_service.redis_pool)
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await manager.stop_relay()
+    await manager.close_all()
     if adhd_service.redis_pool:
         await adhd_service.redis_pool.close()
     if adhd_service.db_pool:
@@ -401,15 +446,7 @@ async def start_focus_session(session: FocusSession, request: Request):
 @limiter.limit("60/minute")
 async def get_active_sessions(request: Request):
     """Get currently active focus sessions"""
-    keys = await adhd_service.redis_pool.keys("active_session:*")
-    sessions = []
-    
-    for key in keys:
-        session_data = await adhd_service.redis_pool.get(key)
-        if session_data:
-            sessions.append(json.loads(session_data))
-    
-    return sessions
+    return await adhd_service.get_active_sessions()
 
 # Quick notes endpoints
 @app.post("/notes", response_model=QuickNote)
@@ -468,7 +505,7 @@ async def get_dashboard_summary(request: Request):
         """)
         
         # Get active focus sessions
-        active_sessions = len(await adhd_service.redis_pool.keys("active_session:*"))
+        active_sessions = await adhd_service.count_active_sessions()
         
         # Get recent notes count
         notes_today = await conn.fetchval("""
@@ -484,11 +521,32 @@ async def get_dashboard_summary(request: Request):
         "timestamp": datetime.utcnow().isoformat()
     }
 
+async def relay_ai_stream(websocket: WebSocket, message: dict):
+    """Forward a streamed AI response to the socket that asked for it"""
+    request_id = message.get("request_id")
+    try:
+        request = AIRequest(prompt=message["content"], conversation_id=message.get("conversation_id"))
+        async with aclosing(adhd_service.stream_ai(request)) as tokens:
+            async for token in tokens:
+                if not await manager.send(websocket, {"type": "ai_token", "request_id": request_id, "token": token}):
+                    return
+        await manager.send(websocket, {
+            "type": "ai_done",
+            "request_id": request_id,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+    except MotokoBusy:
+        await manager.send(websocket, {"type": "ai_error", "request_id": request_id, "message": "AI service is busy, please retry"})
+    except Exception as e:
+        logger.error(f"AI stream failed: {e}")
+        await manager.send(websocket, {"type": "ai_error", "request_id": request_id, "message": "AI request failed"})
+
 # WebSocket endpoint for real-time chat
 @app.websocket("/ws/chat/{user_id}")
 async def chat_websocket(websocket: WebSocket, user_id: str):
     """WebSocket endpoint for real-time chat interface"""
     await manager.connect(websocket, user_id)
+    ai_stream: Optional[asyncio.Task] = None
     
     try:
         while True:
@@ -511,6 +569,14 @@ async def chat_websocket(websocket: WebSocket, user_id: str):
                     "user_id": user_id,
                     "timestamp": datetime.utcnow().isoformat()
                 })
+            elif message["type"] == "ask":
+                # Stream an AI response back to this socket only, one question at a time
+                if ai_stream:
+                    ai_stream.cancel()
+                ai_stream = asyncio.create_task(relay_ai_stream(websocket, message))
+            elif message["type"] == "cancel":
+                if ai_stream:
+                    ai_stream.cancel()
     
     except WebSocketDisconnect:
         manager.disconnect(websocket, user_id)
@@ -522,7 +588,11 @@ async def chat_websocket(websocket: WebSocket, user_id: str):
         })
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
-        await manager.disconnect(websocket, user_id)
+        manager.disconnect(websocket, user_id)
+    finally:
+        # Stops the generation on Motoko when the client goes away
+        if ai_stream:
+            ai_stream.cancel()
 
 if __name__ == "__main__":
     import uvicorn
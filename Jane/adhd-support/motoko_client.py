@@ -0,0 +1,134 @@
+"""
+Long-lived client for the Motoko LLM server
+One pooled httpx client is shared by every request, generations are capped so
+that the single GPU box is not flooded, and the health probe is cached
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+import httpx
+
+
+class MotokoBusy(Exception):
+    """Raised when Motoko's generation backlog is too long to join"""
+
+
+class MotokoClient:
+    """Keep-alive client for Motoko's generation and health endpoints
+
+    Motoko generates on one GPU, so only max_concurrency generations are sent to
+    it at a time. A request arriving while all of them are busy waits behind at
+    most max_queue others and for at most queue_timeout_seconds, and is answered
+    with MotokoBusy otherwise, which the API turns into a retry hint. Once sent,
+    a generation has generate_timeout_seconds to finish and a health probe has
+    health_timeout_seconds, but either gives up after connect_timeout_seconds if
+    Motoko cannot be reached, so a down server does not hold generation slots.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout_seconds: float,
+        generate_timeout_seconds: float = 30.0,
+        health_timeout_seconds: float = 5.0,
+        health_ttl_seconds: float = 10.0,
+        connect_timeout_seconds: float = 3.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.base_url = base_url
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_queue = max(max_queue, 0)
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.generate_timeout = httpx.Timeout(generate_timeout_seconds, connect=connect_timeout_seconds)
+        self.health_timeout = httpx.Timeout(health_timeout_seconds, connect=connect_timeout_seconds)
+        self.health_ttl_seconds = health_ttl_seconds
+        self._clock = clock
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency + 2,
+                max_keepalive_connections=self.max_concurrency + 2,
+            ),
+        )
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._waiting = 0
+        self._running = 0
+        self._health: Optional[bool] = None
+        self._health_checked_at = 0.0
+        self._health_lock = asyncio.Lock()
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    async def _acquire(self):
+        """Take a generation slot, or raise MotokoBusy rather than pile up behind the GPU"""
+        if not self._slots.locked():
+            await self._slots.acquire()
+            return
+        if self._waiting >= self.max_queue:
+            raise MotokoBusy()
+        self._waiting += 1
+        try:
+            async with asyncio.timeout(self.queue_timeout_seconds):
+                await self._slots.acquire()
+        except TimeoutError:
+            raise MotokoBusy()
+        finally:
+            self._waiting -= 1
+
+    async def generate(self, payload: Dict[str, Any]) -> httpx.Response:
+        """POST a generation request once a slot is free"""
+        await self._acquire()
+        self._running += 1
+        try:
+            return await self._client.post("/generate", json=payload, timeout=self.generate_timeout)
+        finally:
+            self._running -= 1
+            self._slots.release()
+
+    async def stream(self, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the events of a streamed generation as Motoko produces them
+
+        The slot is held until the stream ends; closing the generator early closes
+        the connection, which stops the generation on Motoko.
+        """
+        await self._acquire()
+        self._running += 1
+        try:
+            async with self._client.stream("POST", "/generate/stream", json=payload, timeout=self.generate_timeout) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line:
+                        yield json.loads(line)
+        finally:
+            self._running -= 1
+            self._slots.release()
+
+    async def healthy(self) -> bool:
+        """Whether Motoko answered its health check recently"""
+        if self._health is not None and self._clock() - self._health_checked_at < self.health_ttl_seconds:
+            return self._health
+        async with self._health_lock:
+            # Another caller may have refreshed it while this one waited
+            if self._health is not None and self._clock() - self._health_checked_at < self.health_ttl_seconds:
+                return self._health
+            try:
+                response = await self._client.get("/health", timeout=self.health_timeout)
+                self._health = response.status_code == 200
+            except Exception:
+                self._health = False
+            self._health_checked_at = self._clock()
+            return self._health
+
+    async def aclose(self):
+        await self._client.aclose()
@@ -1,12 +1,14 @@
 # ai-workflow-fastapi/main.py
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from limits import parse as parse_rate_limit
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-import redis
+from redis import asyncio as aioredis
 import os
+import asyncio
 from loguru import logger
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel
@@ -15,10 +17,17 @@ from pydantic import BaseModel
 from services.card_database import card_db, Card
 from services.recommendation_engine import recommendation_engine
 from services.combo_database import combo_db 
+from services.result_cache import ResultCache, result_key
 
 # Create rate limiter
 limiter = Limiter(key_func=get_remote_address)
 
+# Cached results are cheap, so requests are limited loosely and only the
+# builds and analyses actually computed count against the strict limits
+CACHED_RATE_LIMIT = os.getenv("CACHED_RATE_LIMIT", "60/minute")
+BUILD_RATE_LIMIT = parse_rate_limit(os.getenv("BUILD_RATE_LIMIT", "5/minute"))
+ANALYSIS_RATE_LIMIT = parse_rate_limit(os.getenv("ANALYSIS_RATE_LIMIT", "10/minute"))
+
 # Pydantic models for API
 class CardResponse(BaseModel):
     name: str
@@ -98,7 +107,7 @@ app.add_middleware(
 
 # Redis connection
 try:
-    redis_client = redis.Redis(
+    redis_client = aioredis.Redis(
         host=os.getenv("REDIS_HOST", "localhost"),
         port=int(os.getenv("REDIS_PORT", 6379)),
         password=os.getenv("REDIS_PASSWORD", ""),
@@ -108,6 +117,30 @@ except Exception as e:
     logger.error(f"Redis connection failed: {e}")
     redis_client = None
 
+result_cache = ResultCache(redis_client, ttl_seconds=float(os.getenv("RESULT_CACHE_TTL_SECONDS", "3600")))
+
+def data_version() -> str:
+    """Version of the card data results are computed from, part of every result key"""
+    return card_db.version or "unversioned"
+
+def _charge_rate_limit(limit, scope: str, request: Request):
+    """Count a computed result against its limit, rejecting the request once it is used up"""
+    if not limiter.limiter.hit(limit, scope, get_remote_address(request)):
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded: {limit}",
+            headers={"Retry-After": str(limit.get_expiry())}
+        )
+
+@app.on_event("startup")
+async def load_card_database():
+    """Index the card snapshot before the first request needs it"""
+    await asyncio.to_thread(card_db.load)
+
+@app.on_event("shutdown")
+async def close_backend_client():
+    await combo_db.aclose()
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -121,7 +154,7 @@ async def health_check():
     # Check Redis
     try:
         if redis_client:
-            redis_client.ping()
+            await redis_client.ping()
             health_status["services"]["redis"] = "connected"
         else:
             health_status["services"]["redis"] = "unavailable"
@@ -129,17 +162,17 @@ async def health_check():
         health_status["services"]["redis"] = "error"
         health_status["status"] = "degraded"
     
-    # Check Django backend connection
+    # Check the local card index
     try:
         test_commander = card_db.find_commander("Atraxa")
-        health_status["services"]["django_backend"] = "connected" if test_commander else "limited"
+        health_status["services"]["card_database"] = "loaded" if test_commander else "limited"
     except Exception:
-        health_status["services"]["django_backend"] = "error"
+        health_status["services"]["card_database"] = "error"
         health_status["status"] = "degraded"
     
     # Check combo database connection
     try:
-        test_combos = combo_db.find_combos_for_commander(1)  # Test with ID 1
+        test_combos = await combo_db.find_combos_for_commander(1)  # Test with ID 1
         health_status["services"]["combo_database"] = "connected"
     except Exception:
         health_status["services"]["combo_database"] = "error"
@@ -149,12 +182,13 @@ async def health_check():
 
 @app.get("/api/status")
 @limiter.limit("10/minute")
-async def api_status(request):
+async def api_status(request: Request):
     """API status with rate limiting"""
     return {
         "api_version": "2.0.0",
         "status": "operational",
         "features": ["card_intelligence", "deck_optimization", "synergy_analysis"],
+        "result_cache": result_cache.metrics(),
         "timestamp": "2025-05-29T20:52:36.856599+00:00"
     }
 
@@ -202,9 +236,64 @@ def _calculate_color_distribution(cards: List[Card]) -> Dict[str, int]:
     
     return colors
 
+async def _build_deck(commander: Card, format_type: str, strategy_focus: str, budget_range: str) -> Dict[str, Any]:
+    """Run the full recommendation pipeline for a commander"""
+    # Step 2: Get combo analysis for this commander
+    commander_combos = await combo_db.find_combos_for_commander(commander.id)
+
+    # Step 3: Generate intelligent recommendations with combo detection
+    recommendation_result = recommendation_engine.recommend_deck_with_combos(
+        commander, 
+        strategy_focus, 
+        budget_range,
+        commander_combos
+    )
+
+    # Step 4: Format the enhanced response
+    deck_slots_response = []
+    for slot in recommendation_result.deck_slots:
+        slot_response = DeckSlotResponse(
+            name=slot.name,
+            target_count=slot.target_count,
+            cards=[_convert_card_to_response(card) for card in slot.cards[:5]],
+            priority=slot.priority
+        )
+        deck_slots_response.append(slot_response)
+
+    # Calculate advanced metrics
+    all_cards = recommendation_result.recommended_cards
+    mana_curve = _calculate_mana_curve(all_cards)
+    color_distribution = _calculate_color_distribution(all_cards)
+
+    # Create enhanced analysis with combo information
+    analysis = AdvancedAnalysis(
+        strategy=recommendation_result.strategy_summary,
+        synergies=recommendation_result.synergy_notes,
+        power_level=f"{recommendation_result.power_level}/10",
+        estimated_cost=recommendation_result.estimated_cost,
+        deck_slots=deck_slots_response,
+        mana_curve=mana_curve,
+        color_distribution=color_distribution
+    )
+
+    # Build final response with combo metadata
+    response = DeckBuildResponse(
+        commander=commander.name,
+        format=format_type,
+        recommended_cards=[card.name for card in all_cards[:30]],
+        analysis=analysis,
+        phase="3",  # Updated phase
+        status="success"
+    )
+
+    logger.info(f"Successfully generated {len(all_cards)} combo-aware recommendations for {commander.name}")
+    logger.info(f"Found {len(commander_combos)} potential combos for this commander")
+
+    return response.model_dump()
+
 @app.post("/api/ai/build-deck")
-@limiter.limit("5/minute")
-async def ai_build_deck(request, deck_request: DeckBuildRequest):
+@limiter.limit(CACHED_RATE_LIMIT)
+async def ai_build_deck(request: Request, response: Response, deck_request: DeckBuildRequest):
     """Enhanced AI Deck Builder endpoint - Phase 3 with Combo Intelligence"""
     try:
         commander_name = deck_request.commander
@@ -221,57 +310,14 @@ async def ai_build_deck(request, deck_request: DeckBuildRequest):
         
         logger.info(f"Found commander: {commander.name} - {commander.type_line}")
         
-        # Step 2: Generate intelligent recommendations with combo detection
-        recommendation_result = recommendation_engine.recommend_deck_with_combos(
-            commander, 
-            strategy_focus, 
-            budget_range
+        key = result_key("build-deck", data_version(), commander.id, format_type, strategy_focus, budget_range)
+        result, outcome = await result_cache.get_or_compute(
+            key,
+            lambda: _build_deck(commander, format_type, strategy_focus, budget_range),
+            admit=lambda: _charge_rate_limit(BUILD_RATE_LIMIT, "build-deck", request),
         )
-        
-        # Step 3: Get combo analysis for this commander
-        commander_combos = combo_db.find_combos_for_commander(commander.id)
-        
-        # Step 4: Format the enhanced response
-        deck_slots_response = []
-        for slot in recommendation_result.deck_slots:
-            slot_response = DeckSlotResponse(
-                name=slot.name,
-                target_count=slot.target_count,
-                cards=[_convert_card_to_response(card) for card in slot.cards[:5]],
-                priority=slot.priority
-            )
-            deck_slots_response.append(slot_response)
-        
-        # Calculate advanced metrics
-        all_cards = recommendation_result.recommended_cards
-        mana_curve = _calculate_mana_curve(all_cards)
-        color_distribution = _calculate_color_distribution(all_cards)
-        
-        # Create enhanced analysis with combo information
-        analysis = AdvancedAnalysis(
-            strategy=recommendation_result.strategy_summary,
-            synergies=recommendation_result.synergy_notes,
-            power_level=f"{recommendation_result.power_level}/10",
-            estimated_cost=recommendation_result.estimated_cost,
-            deck_slots=deck_slots_response,
-            mana_curve=mana_curve,
-            color_distribution=color_distribution
-        )
-        
-        # Build final response with combo metadata
-        response = DeckBuildResponse(
-            commander=commander.name,
-            format=format_type,
-            recommended_cards=[card.name for card in all_cards[:30]],
-            analysis=analysis,
-            phase="3",  # Updated phase
-            status="success"
-        )
-        
-        logger.info(f"Successfully generated {len(all_cards)} combo-aware recommendations for {commander.name}")
-        logger.info(f"Found {len(commander_combos)} potential combos for this commander")
-        
-        return response
+        response.headers["X-Cache"] = outcome
+        return result
         
     except HTTPException:
         raise
@@ -281,7 +327,7 @@ async def ai_build_deck(request, deck_request: DeckBuildRequest):
     
 @app.get("/api/cards/search")
 @limiter.limit("20/minute")
-async def search_cards(request, q: str, limit: int = 20):
+async def search_cards(request: Request, q: str, limit: int = 20):
     """Search cards endpoint"""
     try:
         cards = card_db.search_cards(q, limit)
@@ -296,7 +342,7 @@ async def search_cards(request, q: str, limit: int = 20):
 
 @app.get("/api/cards/commander/{name}")
 @limiter.limit("10/minute") 
-async def get_commander(request, name: str):
+async def get_commander(request: Request, name: str):
     """Get commander details"""
     try:
         commander = card_db.find_commander(name)
@@ -314,9 +360,63 @@ async def get_commander(request, name: str):
         logger.error(f"Error getting commander: {e}")
         raise HTTPException(status_code=500, detail="Error getting commander")
 
+async def _analyze_combos(commander: Card, additional_cards: List[str]) -> Dict[str, Any]:
+    """Look up the combos of a commander and of the cards played with it"""
+    # Get card IDs for additional cards
+    found_cards = card_db.find_cards(additional_cards)
+    card_ids = [found_cards[name].id for name in additional_cards if name in found_cards]
+
+    # Steps 2-4: Find combos for this commander, related combos for the
+    # additional cards and combo pieces for this color identity, all at once
+    lookups = [
+        combo_db.find_combos_for_commander(commander.id),
+        combo_db.get_combo_pieces_for_colors(commander.colors),
+    ]
+    if card_ids:
+        lookups.append(combo_db.find_combos_with_cards(card_ids))
+    commander_combos, combo_pieces, *related = await asyncio.gather(*lookups)
+    related_combos = related[0] if related else []
+    combo_pieces = combo_pieces[:10]  # Limit to 10
+    commander_combos_shown = commander_combos[:10]
+    related_combos_shown = related_combos[:10]
+
+    # Resolve every card the response names in one lookup
+    wanted_ids = set(combo_pieces)
+    for combo in commander_combos_shown + related_combos_shown:
+        wanted_ids.update(combo.card_ids[:5])  # Limit to 5 cards
+    cards_by_id = card_db.get_cards(wanted_ids)
+    combo_piece_names = [cards_by_id[piece_id].name for piece_id in combo_pieces if piece_id in cards_by_id]
+
+    # Step 5: Format response
+    def format_combo(combo) -> ComboResponse:
+        # Get card names for this combo
+        card_names = [cards_by_id[card_id].name for card_id in combo.card_ids[:5] if card_id in cards_by_id]
+
+        return ComboResponse(
+            id=combo.id,
+            description=combo.description[:200] + "..." if len(combo.description) > 200 else combo.description,
+            cards=card_names,
+            power_level=combo.power_level,
+            mana_value=combo.mana_value,
+            colors=combo.colors
+        )
+
+    response = ComboAnalysisResponse(
+        commander=commander.name,
+        total_combos_found=len(commander_combos) + len(related_combos),
+        commander_combos=[format_combo(combo) for combo in commander_combos_shown],
+        related_combos=[format_combo(combo) for combo in related_combos_shown],
+        combo_pieces=combo_piece_names,
+        status="success"
+    )
+
+    logger.info(f"Found {len(commander_combos)} commander combos and {len(related_combos)} related combos")
+
+    return response.model_dump()
+
 @app.post("/api/ai/analyze-combos")
-@limiter.limit("10/minute")
-async def ai_analyze_combos(request, combo_request: ComboAnalysisRequest):
+@limiter.limit(CACHED_RATE_LIMIT)
+async def ai_analyze_combos(request: Request, response: Response, combo_request: ComboAnalysisRequest):
     """AI Combo Analysis endpoint - Detect combos for commanders and card pools"""
     try:
         commander_name = combo_request.commander
@@ -329,60 +429,14 @@ async def ai_analyze_combos(request, combo_request: ComboAnalysisRequest):
         if not commander:
             raise HTTPException(status_code=404, detail=f"Commander '{commander_name}' not found")
         
-        # Step 2: Find combos for this commander
-        commander_combos = combo_db.find_combos_for_commander(commander.id)
-        
-        # Step 3: Find related combos if additional cards provided
-        related_combos = []
-        if additional_cards:
-            # Get card IDs for additional cards
-            card_ids = []
-            for card_name in additional_cards:
-                cards = card_db.search_cards(f'name:"{card_name}"', 1)
-                if cards:
-                    card_ids.append(cards[0].id)
-            
-            if card_ids:
-                related_combos = combo_db.find_combos_with_cards(card_ids)
-        
-        # Step 4: Get combo pieces for this color identity
-        combo_pieces = combo_db.get_combo_pieces_for_colors(commander.colors)
-        combo_piece_names = []
-        for piece_id in combo_pieces[:10]:  # Limit to 10
-            cards = card_db.search_cards(f'id:{piece_id}', 1)
-            if cards:
-                combo_piece_names.append(cards[0].name)
-        
-        # Step 5: Format response
-        def format_combo(combo) -> ComboResponse:
-            # Get card names for this combo
-            card_names = []
-            for card_id in combo.card_ids[:5]:  # Limit to 5 cards
-                cards = card_db.search_cards(f'id:{card_id}', 1)
-                if cards:
-                    card_names.append(cards[0].name)
-            
-            return ComboResponse(
-                id=combo.id,
-                description=combo.description[:200] + "..." if len(combo.description) > 200 else combo.description,
-                cards=card_names,
-                power_level=combo.power_level,
-                mana_value=combo.mana_value,
-                colors=combo.colors
-            )
-        
-        response = ComboAnalysisResponse(
-            commander=commander.name,
-            total_combos_found=len(commander_combos) + len(related_combos),
-            commander_combos=[format_combo(combo) for combo in commander_combos[:10]],
-            related_combos=[format_combo(combo) for combo in related_combos[:10]],
-            combo_pieces=combo_piece_names,
-            status="success"
+        key = result_key("analyze-combos", data_version(), commander.id, sorted({name.strip().lower() for name in additional_cards}))
+        result, outcome = await result_cache.get_or_compute(
+            key,
+            lambda: _analyze_combos(commander, additional_cards),
+            admit=lambda: _charge_rate_limit(ANALYSIS_RATE_LIMIT, "analyze-combos", request),
         )
-        
-        logger.info(f"Found {len(commander_combos)} commander combos and {len(related_combos)} related combos")
-        
-        return response
+        response.headers["X-Cache"] = outcome
+        return result
         
     except HTTPException:
         raise
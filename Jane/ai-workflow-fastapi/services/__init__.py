@@ -4,7 +4,7 @@
 AI Workflow Services Package
 
 This package contains intelligent services for the AI deck builder:
-- card_database: Interface to Django backend card database
+- card_database: In-memory card index loaded from a local snapshot
 - combo_database: Interface to Django backend combo/variant database  
 - recommendation_engine: Enhanced intelligent card recommendation system with combo detection
 """
@@ -0,0 +1,437 @@
+# ai-workflow-fastapi/services/card_database.py
+
+"""
+Local card database
+Cards are loaded once from a snapshot of the spellbook /cards/ endpoint and
+indexed in memory by id, name, color identity, type, keyword, legality and
+price, so that lookups and searches never leave the process
+"""
+
+import argparse
+import bisect
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import combinations
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_PATH = "/data/cards.json"
+
+COLORS = "WUBRG"
+
+# key:value, key<=value, "quoted words" or bare words
+QUERY_TOKEN = re.compile(r'(\w+)(<=|>=|:|<|>|=)(?:"([^"]*)"|(\S+))|"([^"]*)"|(\S+)')
+
+FIELD_ALIASES = {
+    'n': 'name', 'name': 'name',
+    'o': 'oracle', 'oracle': 'oracle',
+    't': 'type', 'type': 'type',
+    'kw': 'keyword', 'keyword': 'keyword',
+    'f': 'legal', 'format': 'legal', 'legal': 'legal',
+    'ci': 'identity', 'identity': 'identity', 'commander': 'identity',
+    'mv': 'mana_value', 'cmc': 'mana_value', 'manavalue': 'mana_value',
+    'usd': 'price', 'price': 'price',
+    'id': 'id',
+}
+
+
+@dataclass(eq=False)
+class Card:
+    """Card data structure
+
+    Cards are unique within a database, so equality is identity.
+    """
+    id: int
+    name: str
+    type_line: str = ''
+    mana_value: int = 0
+    oracle_text: str = ''
+    price_tcgplayer: float = 0.0
+    identity: str = 'C'
+    keywords: List[str] = field(default_factory=list)
+    legalities: Dict[str, bool] = field(default_factory=dict)
+    variant_count: int = 0
+    oracle_id: Optional[str] = None
+
+    @property
+    def colors(self) -> List[str]:
+        """Get color identity as list"""
+        return [c for c in self.identity if c != 'C']
+
+    @property
+    def can_be_commander(self) -> bool:
+        type_line = self.type_line.lower()
+        return ('legendary' in type_line and 'creature' in type_line) or 'can be your commander' in self.oracle_text.lower()
+
+
+def normalize(text: str) -> str:
+    """Lowercase and strip accents, so that "Lim-Dûl" matches "lim-dul" """
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower().strip()
+
+
+def normalize_identity(identity: str) -> str:
+    identity = identity.upper()
+    return ''.join(c for c in COLORS if c in identity) or 'C'
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", normalize(text))
+
+
+def _field(record: Dict[str, Any], name: str, default=None):
+    """Read a field from either the camelCase API format or snake_case"""
+    if name in record:
+        return record[name]
+    head, *rest = name.split('_')
+    return record.get(head + ''.join(part.capitalize() for part in rest), default)
+
+
+def card_from_record(record: Dict[str, Any]) -> Card:
+    legalities = {
+        normalize(re.sub(r'(?<!^)(?=[A-Z])', '_', name)): bool(legal)
+        for name, legal in (record.get('legalities') or {}).items()
+    }
+    prices = record.get('prices') or {}
+    return Card(
+        id=int(record['id']),
+        name=record['name'],
+        type_line=_field(record, 'type_line', '') or '',
+        mana_value=int(_field(record, 'mana_value', 0) or 0),
+        oracle_text=_field(record, 'oracle_text', '') or '',
+        price_tcgplayer=float(prices.get('tcgplayer') or _field(record, 'price_tcgplayer', 0) or 0),
+        identity=normalize_identity(record.get('identity') or 'C'),
+        keywords=list(record.get('keywords') or []),
+        legalities=legalities,
+        variant_count=int(_field(record, 'variant_count', 0) or 0),
+        oracle_id=_field(record, 'oracle_id'),
+    )
+
+
+def read_snapshot(path: Path) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Read card records and the snapshot version from a JSON (or .json.gz) file
+
+    Accepts a bare list of cards, {"cards": [...]} as written by export_snapshot,
+    or a saved page of the /cards/ endpoint ({"results": [...]}).
+    """
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(path, 'rt', encoding='utf8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return data, None
+    records = data.get('cards', data.get('results', []))
+    return records, data.get('version') or data.get('timestamp')
+
+
+class Query:
+    """A parsed search query, split into indexed terms and per-card filters"""
+
+    def __init__(self, text: str):
+        self.ids: Optional[Set[int]] = None
+        self.identity: Optional[str] = None
+        self.types: List[str] = []
+        self.keywords: List[str] = []
+        self.legal: List[str] = []
+        self.price: List[Tuple[str, float]] = []
+        self.oracle: List[str] = []
+        self.filters: List[Callable[[Card], bool]] = []
+        self.name_words: List[str] = []
+        self.name_phrase: Optional[str] = None
+        name_parts: List[str] = []
+        for match in QUERY_TOKEN.finditer(text):
+            key, op, quoted, value, phrase, word = match.groups()
+            if key is not None and key.lower() in FIELD_ALIASES:
+                try:
+                    self._add_term(FIELD_ALIASES[key.lower()], op, quoted if quoted is not None else value)
+                except ValueError:
+                    # A comparison that is not a number, as in "mv:abc", is name text too
+                    name_parts.append(match.group(0))
+            elif key is not None:
+                # Unknown keys are part of the name, as in "Circle of Protection:Red"
+                name_parts.append(match.group(0))
+            else:
+                name_parts.append(phrase if phrase is not None else word)
+        if name_parts:
+            self.name_phrase = normalize(' '.join(name_parts))
+            self.name_words.extend(_words(self.name_phrase))
+
+    def _add_term(self, key: str, op: str, value: str):
+        if key == 'id':
+            ids = {int(i) for i in re.findall(r'\d+', value)}
+            self.ids = ids if self.ids is None else self.ids & ids
+        elif key == 'name':
+            self.name_phrase = normalize(value)
+            self.name_words.extend(_words(value))
+        elif key == 'oracle':
+            self.oracle.append(normalize(value))
+        elif key == 'type':
+            self.types.extend(_words(value))
+        elif key == 'keyword':
+            self.keywords.append(normalize(value))
+        elif key == 'legal':
+            self.legal.append(normalize(value).replace(' ', '_'))
+        elif key == 'identity':
+            self.identity = normalize_identity(value)
+        elif key == 'price':
+            self.price.append((op, float(value)))
+        elif key == 'mana_value':
+            target = float(value)
+            compare = COMPARISONS[op]
+            self.filters.append(lambda card: compare(card.mana_value, target))
+
+
+COMPARISONS: Dict[str, Callable[[float, float], bool]] = {
+    ':': lambda a, b: a == b,
+    '=': lambda a, b: a == b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+
+
+class CardDatabase:
+    """In-memory card index built from a local snapshot
+
+    Searches take a subset of Scryfall's syntax: bare words match the card name,
+    and name:, oracle:, type:, keyword:, legal:, identity: (cards playable under
+    that color identity), mv and usd comparisons and id: narrow the results.
+    Results are ordered by exact name match first, then by popularity.
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = None, search_cache_size: int = 4096):
+        self.snapshot_path = Path(snapshot_path or os.getenv("CARD_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH))
+        self.version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loaded = False
+        self._search_cache_size = search_cache_size
+        self._index(())
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self.cards)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self) -> int:
+        """(Re)load the snapshot from disk, returning the number of cards"""
+        try:
+            records, version = read_snapshot(self.snapshot_path)
+        except FileNotFoundError:
+            logger.warning(f"Card snapshot {self.snapshot_path} not found, card database is empty")
+            records, version = [], None
+        self.load_records(records, version)
+        logger.info(f"Loaded {len(self.cards)} cards from {self.snapshot_path}")
+        return len(self.cards)
+
+    def load_records(self, records: Iterable[Dict[str, Any]], version: Optional[str] = None):
+        cards = [card_from_record(record) for record in records]
+        with self._lock:
+            self._index(cards)
+            self.version = version
+            self._loaded = True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self.load()
+
+    def _index(self, cards: Iterable[Card]):
+        # Most popular first, so that index order is result order
+        self.cards: List[Card] = sorted(cards, key=lambda card: (-card.variant_count, card.name))
+        self._rank: Dict[int, int] = {}
+        self._by_id: Dict[int, Card] = {}
+        self._by_name: Dict[str, Card] = {}
+        self._by_identity: Dict[str, Set[int]] = {}
+        self._by_type: Dict[str, Set[int]] = {}
+        self._by_keyword: Dict[str, Set[int]] = {}
+        self._by_legality: Dict[str, Set[int]] = {}
+        self._by_name_word: Dict[str, Set[int]] = {}
+        self._by_oracle_word: Dict[str, Set[int]] = {}
+        self._playable: Dict[str, Set[int]] = {}
+        self._oracle_text: Dict[int, str] = {}
+        for rank, card in enumerate(self.cards):
+            self._rank[card.id] = rank
+            self._by_id[card.id] = card
+            self._oracle_text[card.id] = normalize(card.oracle_text)
+            for word in _words(card.name):
+                self._by_name_word.setdefault(word, set()).add(card.id)
+            for word in set(_words(card.oracle_text)):
+                self._by_oracle_word.setdefault(word, set()).add(card.id)
+            self._by_name.setdefault(normalize(card.name), card)
+            if ' // ' in card.name:
+                for face in card.name.split(' // '):
+                    self._by_name.setdefault(normalize(face), card)
+            self._by_identity.setdefault(card.identity, set()).add(card.id)
+            for word in _words(card.type_line):
+                self._by_type.setdefault(word, set()).add(card.id)
+            for keyword in card.keywords:
+                self._by_keyword.setdefault(normalize(keyword), set()).add(card.id)
+            for format_name, legal in card.legalities.items():
+                if legal:
+                    self._by_legality.setdefault(format_name, set()).add(card.id)
+        by_price = sorted((card.price_tcgplayer, card.id) for card in self.cards)
+        self._prices = [price for price, _ in by_price]
+        self._price_ids = [card_id for _, card_id in by_price]
+        self._commanders = [(normalize(card.name), card) for card in self.cards if card.can_be_commander]
+        self._search = lru_cache(maxsize=self._search_cache_size)(self._search_uncached)
+
+    def get(self, card_id: int) -> Optional[Card]:
+        self._ensure_loaded()
+        return self._by_id.get(card_id)
+
+    def find_card(self, name: str) -> Optional[Card]:
+        """Exact, case and accent insensitive name lookup"""
+        self._ensure_loaded()
+        return self._by_name.get(normalize(name))
+
+    def get_cards(self, card_ids: Iterable[int]) -> Dict[int, Card]:
+        """Resolve many ids at once; unknown ids are left out"""
+        self._ensure_loaded()
+        by_id = self._by_id
+        return {card_id: by_id[card_id] for card_id in card_ids if card_id in by_id}
+
+    def find_cards(self, names: Iterable[str]) -> Dict[str, Card]:
+        """Resolve many names at once, keyed by the name asked for
+
+        Names without an exact match resolve to the best partial match, as a
+        name: search would; names matching nothing are left out.
+        """
+        self._ensure_loaded()
+        found: Dict[str, Card] = {}
+        for name in names:
+            card = self._by_name.get(normalize(name))
+            if card is None:
+                matches = self._search(f'name:"{name}"', 1)
+                card = matches[0] if matches else None
+            if card is not None:
+                found[name] = card
+        return found
+
+    def find_commander(self, name: str) -> Optional[Card]:
+        """Find a card that can lead a deck, by exact name or else by name prefix"""
+        self._ensure_loaded()
+        card = self._by_name.get(normalize(name))
+        if card is not None and card.can_be_commander:
+            return card
+        wanted = normalize(name)
+        for card_name, card in self._commanders:
+            if card_name.startswith(wanted):
+                return card
+        for card_name, card in self._commanders:
+            if wanted in card_name:
+                return card
+        return None
+
+    def search_cards(self, query: str, limit: int = 20) -> List[Card]:
+        """Search cards with a Scryfall-like query, most relevant first"""
+        self._ensure_loaded()
+        if limit <= 0:
+            return []
+        return list(self._search(query.strip(), limit))
+
+    def _playable_under(self, identity: str) -> Set[int]:
+        """Cards whose color identity is within the given one, built once per identity"""
+        ids = self._playable.get(identity)
+        if ids is None:
+            colors = identity.replace('C', '')
+            ids = set(self._by_identity.get('C', ()))
+            for size in range(1, len(colors) + 1):
+                for subset in combinations(colors, size):
+                    ids |= self._by_identity.get(''.join(subset), set())
+            self._playable[identity] = ids
+        return ids
+
+    def _in_price_range(self, op: str, value: float) -> Set[int]:
+        if op in ('<', '<='):
+            end = (bisect.bisect_left if op == '<' else bisect.bisect_right)(self._prices, value)
+            return set(self._price_ids[:end])
+        if op in ('>', '>='):
+            start = (bisect.bisect_right if op == '>' else bisect.bisect_left)(self._prices, value)
+            return set(self._price_ids[start:])
+        return set(self._price_ids[bisect.bisect_left(self._prices, value):bisect.bisect_right(self._prices, value)])
+
+    def _search_uncached(self, text: str, limit: int) -> Tuple[Card, ...]:
+        query = Query(text)
+        candidates: List[Set[int]] = []
+        if query.ids is not None:
+            candidates.append(query.ids)
+        if query.identity is not None:
+            candidates.append(self._playable_under(query.identity))
+        candidates.extend(self._by_type.get(word, set()) for word in query.types)
+        candidates.extend(self._by_keyword.get(keyword, set()) for keyword in query.keywords)
+        candidates.extend(self._by_legality.get(format_name, set()) for format_name in query.legal)
+        candidates.extend(self._in_price_range(op, value) for op, value in query.price)
+        candidates.extend(self._by_name_word.get(word, set()) for word in query.name_words)
+        # Words narrow oracle phrases down before the substring check
+        candidates.extend(self._by_oracle_word.get(word, set()) for phrase in query.oracle for word in _words(phrase))
+
+        exact = self._by_name.get(query.name_phrase) if query.name_phrase else None
+        pool: Iterable[Card] = self.cards
+        if candidates:
+            ids = set.intersection(*sorted(candidates, key=len))
+            if len(ids) * 8 < len(self.cards):
+                pool = sorted((self._by_id[i] for i in ids if i in self._by_id), key=lambda card: self._rank[card.id])
+            else:
+                # Cheaper to walk everything in rank order and stop at the limit than to sort
+                pool = (card for card in self.cards if card.id in ids)
+
+        def matches(card: Card) -> bool:
+            oracle_text = self._oracle_text[card.id]
+            return all(phrase in oracle_text for phrase in query.oracle) and all(f(card) for f in query.filters)
+
+        results: List[Card] = []
+        if exact is not None and (not candidates or exact.id in ids) and matches(exact):
+            results.append(exact)
+        for card in pool:
+            if len(results) >= limit:
+                break
+            if card is not exact and matches(card):
+                results.append(card)
+        return tuple(results)
+
+
+def export_snapshot(backend_url: str, path: Path, page_size: int = 100, timeout: float = 30.0) -> int:
+    """Page through the backend's /cards/ endpoint and write a snapshot file"""
+    import requests
+
+    records: List[Dict[str, Any]] = []
+    url: Optional[str] = f"{backend_url.rstrip('/')}/cards/?limit={page_size}"
+    with requests.Session() as session:
+        while url:
+            response = session.get(url, timeout=timeout)
+            response.raise_for_status()
+            page = response.json()
+            records.extend(page['results'])
+            url = page.get('next')
+    path.parent.mkdir(parents=True, exist_ok=True)
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(path, 'wt', encoding='utf8') as f:
+        json.dump({'version': datetime.now(timezone.utc).isoformat(), 'cards': records}, f)
+    return len(records)
+
+
+# Singleton instance, loaded on first use
+card_db = CardDatabase()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a card snapshot from the spellbook backend")
+    parser.add_argument("--backend", default=os.getenv("BACKEND_URL", "http://localhost:8000"))
+    parser.add_argument("--out", type=Path, default=Path(os.getenv("CARD_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)))
+    args = parser.parse_args()
+    print(f"Wrote {export_snapshot(args.backend, args.out)} cards to {args.out}")
@@ -1,10 +1,14 @@
 # ai-workflow-fastapi/services/combo_database.py
 
-import requests
+import httpx
 import logging
-from typing import List, Dict, Optional, Any
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, List, Dict, Optional, Any, Tuple
 from dataclasses import dataclass
-from functools import lru_cache
+
+from .result_cache import Coalescer
 
 logger = logging.getLogger(__name__)
 
@@ -37,29 +41,82 @@ class Variant:
     status: str
     popularity: Optional[int] = None
 
+def normalize_request(endpoint: str, params: Dict = None) -> Tuple:
+    """Cache key of a backend request: the path and its parameters, ignoring
+    parameter order, letter case and repeated whitespace in the query"""
+    normalized = []
+    for name, value in sorted((params or {}).items()):
+        if name == 'q':
+            value = ' '.join(str(value).lower().split())
+        normalized.append((name, str(value)))
+    return ('/' + endpoint.strip('/') + '/', tuple(normalized))
+
+
 class ComboDatabaseService:
-    """Service to interact with Django backend combo database"""
+    """Service to interact with Django backend combo database
+
+    Requests share one pooled async client, successful responses are cached
+    for ttl_seconds, and identical requests in flight share a single call.
+    """
     
-    def __init__(self, backend_url: str = "http://localhost:8000"):
+    def __init__(
+        self,
+        backend_url: str = "http://localhost:8000",
+        timeout_seconds: float = 10.0,
+        max_connections: int = 10,
+        ttl_seconds: float = 300.0,
+        max_entries: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
         self.backend_url = backend_url.rstrip('/')
-        self.session = requests.Session()
-        self.session.headers.update({
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        })
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._client = httpx.AsyncClient(
+            base_url=self.backend_url,
+            headers={
+                'Content-Type': 'application/json',
+                'Accept': 'application/json'
+            },
+            timeout=httpx.Timeout(timeout_seconds),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self._cache: "OrderedDict[Tuple, Tuple[float, Dict]]" = OrderedDict()
+        self._requests = Coalescer()
+    
+    async def _make_request(self, endpoint: str, params: Dict = None) -> Optional[Dict]:
+        """Make a request to the Django backend, answering from the cache when possible"""
+        key = normalize_request(endpoint, params)
+        cached = self._cache.get(key)
+        if cached is not None:
+            if cached[0] > self._clock():
+                self._cache.move_to_end(key)
+                return cached[1]
+            del self._cache[key]
+        return await self._requests.run(key, lambda: self._fetch(key, endpoint, params))
     
-    def _make_request(self, endpoint: str, params: Dict = None) -> Optional[Dict]:
-        """Make a request to the Django backend"""
+    async def _fetch(self, key: Tuple, endpoint: str, params: Dict = None) -> Optional[Dict]:
         try:
-            url = f"{self.backend_url}/{endpoint.lstrip('/')}"
-            response = self.session.get(url, params=params, timeout=10)
+            response = await self._client.get(key[0], params=params)
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error making request to {endpoint}: {e}")
+            data = response.json()
+        except httpx.HTTPError as e:
+            logger.error(f"Error making request to {endpoint}: {e!r}")
             return None
+        if self.ttl_seconds > 0 and self.max_entries > 0:
+            self._cache[key] = (self._clock() + self.ttl_seconds, data)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return data
     
-    def find_combos_for_commander(self, commander_id: int) -> List[Combo]:
+    def clear_cache(self):
+        self._cache.clear()
+    
+    async def aclose(self):
+        await self._client.aclose()
+    
+    async def find_combos_for_commander(self, commander_id: int) -> List[Combo]:
         """Find combos that include this commander"""
         try:
             params = {
@@ -67,7 +124,7 @@ class ComboDatabaseService:
                 'limit': 50
             }
             
-            data = self._make_request('/variants/', params)
+            data = await self._make_request('/variants/', params)
             if not data or not data.get('results'):
                 return []
             
@@ -83,19 +140,18 @@ class ComboDatabaseService:
             logger.error(f"Error finding combos for commander {commander_id}: {e}")
             return []
     
-    def find_combos_with_cards(self, card_ids: List[int]) -> List[Combo]:
-        """Find combos that use these cards"""
+    async def find_combos_with_cards(self, card_ids: List[int]) -> List[Combo]:
+        """Find combos that use any of these cards, those using the most of them first"""
+        if not card_ids:
+            return []
         try:
-            # Build query to find variants with these cards
-            card_queries = [f'card:{card_id}' for card_id in card_ids]
-            query = ' OR '.join(card_queries)
-            
+            # The backend ranks variants by how many of the given cards they use
             params = {
-                'q': query,
+                'cards': ','.join(str(card_id) for card_id in sorted(set(card_ids))),
                 'limit': 100
             }
             
-            data = self._make_request('/variants/', params)
+            data = await self._make_request('/variants/', params)
             if not data or not data.get('results'):
                 return []
             
@@ -111,7 +167,7 @@ class ComboDatabaseService:
             logger.error(f"Error finding combos with cards {card_ids}: {e}")
             return []
     
-    def get_combo_pieces_for_colors(self, colors: List[str]) -> List[int]:
+    async def get_combo_pieces_for_colors(self, colors: List[str]) -> List[int]:
         """Get popular combo pieces for these colors"""
         try:
             color_query = "".join(sorted(colors)) if colors else "C"
@@ -122,7 +178,7 @@ class ComboDatabaseService:
                 'ordering': '-popularity'
             }
             
-            data = self._make_request('/variants/', params)
+            data = await self._make_request('/variants/', params)
             if not data or not data.get('results'):
                 return []
             
@@ -138,7 +194,7 @@ class ComboDatabaseService:
             logger.error(f"Error getting combo pieces for colors {colors}: {e}")
             return []
     
-    def get_meta_staples(self, colors: List[str], power_level: str = "casual") -> List[int]:
+    async def get_meta_staples(self, colors: List[str], power_level: str = "casual") -> List[int]:
         """Get meta staple cards for color identity and power level"""
         try:
             color_query = "".join(sorted(colors)) if colors else "C"
@@ -157,7 +213,7 @@ class ComboDatabaseService:
                     'ordering': '-variant_count'
                 }
             
-            data = self._make_request('/cards/', params)
+            data = await self._make_request('/cards/', params)
             if not data or not data.get('results'):
                 return []
             
@@ -208,4 +264,8 @@ class ComboDatabaseService:
             return 2  # Lower power
 
 # Singleton instance
-combo_db = ComboDatabaseService()
\ No newline at end of file
+combo_db = ComboDatabaseService(
+    backend_url=os.getenv("BACKEND_URL", "http://localhost:8000"),
+    timeout_seconds=float(os.getenv("BACKEND_TIMEOUT_SECONDS", "10")),
+    ttl_seconds=float(os.getenv("COMBO_CACHE_TTL_SECONDS", "300")),
+)
\ No newline at end of file
@@ -1,12 +1,13 @@
 # ai-workflow-fastapi/services/recommendation_engine.py
 
 import logging
-from typing import List, Dict, Set, Tuple, Any
+from typing import List, Dict, Set, Tuple, Any, Optional
 from dataclasses import dataclass
 from collections import defaultdict, Counter
 import re
 
 from .card_database import Card, card_db
+from .combo_database import Combo
 
 logger = logging.getLogger(__name__)
 
@@ -50,8 +51,12 @@ class CardRecommendationEngine:
         }
     
     def recommend_deck_with_combos(self, commander: Card, strategy_focus: str = "balanced", 
-                                   power_level: str = "casual") -> RecommendationResult:
-        """Enhanced recommendation with combo detection - exactly 100 cards"""
+                                   power_level: str = "casual", commander_combos: Optional[List[Combo]] = None) -> RecommendationResult:
+        """Enhanced recommendation with combo detection - exactly 100 cards
+        
+        commander_combos are looked up by the caller, so that the backend is
+        queried asynchronously and only once per build.
+        """
         logger.info(f"Generating 100-card deck for commander: {commander.name}")
         
         # Build deck structure
@@ -61,10 +66,10 @@ class CardRecommendationEngine:
         self._fill_deck_slots_exactly(deck_slots, commander.colors, commander)
         
         # Enhance with combo detection
-        enhanced_result = self._enhance_with_combos(commander, deck_slots, power_level)
+        enhanced_result = self._enhance_with_combos(commander, deck_slots, power_level, commander_combos or [])
         
         # Ensure exactly 99 cards (+ commander = 100)
-        all_cards = self._ensure_exactly_99_cards(enhanced_result.deck_slots)
+        all_cards = self._ensure_exactly_99_cards(enhanced_result.deck_slots, commander.identity)
         
         logger.info(f"Generated exactly {len(all_cards)} cards + 1 commander = 100 total")
         
@@ -186,7 +191,8 @@ class CardRecommendationEngine:
         for search in slot_searches:
             if len(cards) >= limit:
                 break
-            found_cards = card_db.search_cards(search, min(10, limit - len(cards)))
+            # Only cards the commander's color identity allows
+            found_cards = card_db.search_cards(f'{search} identity:{commander.identity}', min(10, limit - len(cards)))
             for card in found_cards:
                 if card not in cards and len(cards) < limit:
                     cards.append(card)
@@ -235,15 +241,16 @@ class CardRecommendationEngine:
         }
         
         searches = filler_searches.get(slot_name, ['legal:commander'])
+        identity = ''.join(colors) or 'C'
         
         for search in searches:
-            cards = card_db.search_cards(search, 1)
+            cards = card_db.search_cards(f'{search} identity:{identity}', 1)
             if cards:
                 return cards[0]
         
         return None
 
-    def _ensure_exactly_99_cards(self, deck_slots: List[DeckSlot]) -> List[Card]:
+    def _ensure_exactly_99_cards(self, deck_slots: List[DeckSlot], identity: str = 'C') -> List[Card]:
         """Ensure we have exactly 99 cards, no more, no less"""
         all_cards = []
         
@@ -264,23 +271,20 @@ class CardRecommendationEngine:
             # Too many cards - remove least important
             unique_cards = unique_cards[:99]
         elif len(unique_cards) < 99:
-            # Too few cards - add filler
-            while len(unique_cards) < 99:
-                filler = card_db.search_cards('legal:commander', 1)
-                if filler and filler[0] not in unique_cards:
-                    unique_cards.append(filler[0])
-                else:
+            # Too few cards - add the most popular legal cards not yet included
+            fillers = card_db.search_cards(f'legal:commander identity:{identity}', 99 + len(unique_cards))
+            for filler in fillers:
+                if len(unique_cards) >= 99:
                     break
+                if filler.name not in seen:
+                    seen.add(filler.name)
+                    unique_cards.append(filler)
         
         return unique_cards[:99]  # Ensure exactly 99
 
-    def _enhance_with_combos(self, commander: Card, deck_slots: List[DeckSlot], power_level: str) -> RecommendationResult:
+    def _enhance_with_combos(self, commander: Card, deck_slots: List[DeckSlot], power_level: str,
+                             commander_combos: List[Combo]) -> RecommendationResult:
         """Enhance with combo detection"""
-        from .combo_database import combo_db
-        
-        # Find combos for this commander
-        commander_combos = combo_db.find_combos_for_commander(commander.id)
-        
         # Generate enhanced analysis
         strategy = f"This deck leverages {commander.name}'s abilities for {power_level} gameplay"
         synergies = [f"Optimized for {len(commander_combos)} potential combo lines" if commander_combos else "Value-focused strategy"]
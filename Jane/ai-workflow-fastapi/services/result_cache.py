@@ -0,0 +1,125 @@
+# ai-workflow-fastapi/services/result_cache.py
+
+"""
+Cache of complete deck builds and combo analyses
+Results are stored in Redis under a key derived from what was asked and the
+version of the card data they were computed from, and identical requests that
+arrive while a result is being computed wait for it instead of recomputing
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HIT = "hit"
+MISS = "miss"
+COALESCED = "coalesced"
+
+
+def result_key(kind: str, version: str, *parts: Any) -> str:
+    material = json.dumps([kind, version, parts], sort_keys=True, default=str)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class Coalescer:
+    """Runs one computation per key, shared by every caller asking while it runs"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def running(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Await the computation in flight for key, starting it with compute if there is none"""
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            inflight = asyncio.ensure_future(compute())
+            self._inflight[key] = inflight
+            inflight.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # The caller that started it may be cancelled, e.g. by a client disconnecting,
+        # while later callers still wait on the same future
+        return await asyncio.shield(inflight)
+
+
+class ResultCache:
+    """Redis-backed result cache with per-process request coalescing
+
+    Without a Redis client every request computes, but concurrent identical
+    requests are still coalesced.
+    """
+
+    def __init__(self, redis=None, ttl_seconds: float = 3600.0, prefix: str = "ai-workflow:result:"):
+        self.redis = redis
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self._computations = Coalescer()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.redis is not None and self.ttl_seconds > 0
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        try:
+            cached = await self.redis.get(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Result cache lookup failed: {e}")
+            return None
+        return json.loads(cached) if cached is not None else None
+
+    async def put(self, key: str, value: Dict[str, Any]):
+        if not self.enabled:
+            return
+        try:
+            await self.redis.setex(self.prefix + key, int(self.ttl_seconds), json.dumps(value))
+        except Exception as e:
+            logger.warning(f"Result cache store failed: {e}")
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+        admit: Optional[Callable[[], None]] = None,
+    ) -> Tuple[Dict[str, Any], str]:
+        """Return the cached result, or compute it once for all concurrent callers
+
+        admit is called only when this caller is about to compute, so that a
+        rate limit can be charged to real work; an exception it raises reaches
+        this caller alone. The second element tells whether the result was a
+        hit, a miss, or coalesced with a computation already in flight.
+        """
+        if not self._computations.running(key):
+            cached = await self.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached, HIT
+        # Another caller may have started while the lookup was awaited
+        if self._computations.running(key):
+            self.coalesced += 1
+            return await self._computations.run(key, compute), COALESCED
+        if admit is not None:
+            admit()
+        self.misses += 1
+        return await self._computations.run(key, lambda: self._compute(key, compute)), MISS
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        value = await compute()
+        await self.put(key, value)
+        return value
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
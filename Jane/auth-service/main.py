@@ -5,16 +5,18 @@ Handles JWT tokens, API keys, and secrets management
 
 import asyncio
 import hashlib
+import json
 import jwt
 import os
 import secrets
+import time
 import uuid
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List
 
 import asyncpg
-import aioredis
 import hvac
+from redis import asyncio as aioredis
 from fastapi import FastAPI, HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
@@ -22,6 +24,11 @@ from passlib.context import CryptContext
 from pydantic import BaseModel, EmailStr, Field
 from loguru import logger
 
+from password_hasher import PasswordHasher, PasswordHasherSaturated
+from principal_cache import PrincipalCache, REVOCATION_CHANNEL, REVOKE_USER_PREFIX, listen_for_revocations
+from timestamp_buffer import TimestampBuffer, flush_periodically
+from vault_secrets import InMemoryVault, VaultSecrets
+
 # Configure logging
 logger.add("logs/auth_service.log", rotation="1 day", retention="7 days", level="INFO")
 
@@ -75,15 +82,42 @@ class AuthService:
         self.db_pool = None
         self.redis_pool = None
         self.vault_client = None
+        self.vault = None
+        self.revocation_listener = None
+        self.timestamp_flusher = None
         
         # JWT settings
         self.jwt_secret = os.getenv("JWT_SECRET_KEY", "fallback-secret-change-me")
         self.jwt_algorithm = "HS256"
         self.access_token_expire_minutes = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
         
+        # Verified principal caching
+        self.principal_cache = PrincipalCache(
+            ttl_seconds=float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30")),
+            max_size=int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", "10000")),
+        )
+        # Changes made through the service drop cached users at once; changes made
+        # directly in the database are seen once the cached row expires
+        self.user_cache_ttl_seconds = int(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+        
+        # API key lookups are cached in Redis, last-seen timestamps are written in batches
+        self.api_key_cache_ttl_seconds = int(os.getenv("API_KEY_CACHE_TTL_SECONDS", "60"))
+        self.last_seen_precision_seconds = float(os.getenv("LAST_SEEN_PRECISION_SECONDS", "60"))
+        self.api_key_last_used = TimestampBuffer("api_keys", "last_used", self.last_seen_precision_seconds)
+        self.user_last_login = TimestampBuffer("users", "last_login", self.last_seen_precision_seconds)
+        
+        # Password hashing runs off the event loop with a concurrency cap
+        self.password_hasher = PasswordHasher(
+            pwd_context,
+            max_concurrency=int(os.getenv("PASSWORD_HASH_CONCURRENCY", "2")),
+            max_queue=int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "16")),
+            queue_timeout_seconds=float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS", "2")),
+        )
+        
         # Vault settings
         self.vault_url = os.getenv("VAULT_URL", "http://vault:8200")
         self.vault_token = os.getenv("VAULT_TOKEN")
+        self.vault_cache_ttl_seconds = float(os.getenv("VAULT_CACHE_TTL_SECONDS", "300"))
         
     async def initialize(self):
         """Initialize all connections and services"""
@@ -95,16 +129,30 @@ class AuthService:
             # Redis for session management
             redis_url = os.getenv("REDIS_URL", "redis://redis:6379")
             self.redis_pool = aioredis.from_url(redis_url, decode_responses=True)
+            self.revocation_listener = asyncio.create_task(
+                listen_for_revocations(self.redis_pool, self.principal_cache)
+            )
             
-            # Vault for secrets management
-            if self.vault_token:
+            # Vault for secrets management, hvac is synchronous so calls run off the event loop
+            if self.vault_url == "memory://":
+                logger.warning("Using the in-memory Vault stand-in, secrets are not persisted")
+                self.vault_client = InMemoryVault()
+            elif self.vault_token:
                 self.vault_client = hvac.Client(url=self.vault_url, token=self.vault_token)
-                if not self.vault_client.is_authenticated():
+            if self.vault_client:
+                self.vault = VaultSecrets(self.vault_client, ttl_seconds=self.vault_cache_ttl_seconds)
+                if not await self.vault.is_authenticated():
                     logger.warning("Vault authentication failed")
                     self.vault_client = None
+                    self.vault = None
             
             await self._create_tables()
             await self._ensure_admin_user()
+            self.timestamp_flusher = asyncio.create_task(flush_periodically(
+                self.db_pool,
+                [self.api_key_last_used, self.user_last_login],
+                self.last_seen_precision_seconds,
+            ))
             
             logger.info("Auth service initialized successfully")
             
@@ -164,7 +212,7 @@ class AuthService:
             
             if not admin_exists:
                 admin_password = os.getenv("ADMIN_PASSWORD", "admin123")
-                password_hash = pwd_context.hash(admin_password)
+                password_hash = await self.password_hasher.hash(admin_password)
                 
                 await conn.execute("""
                     INSERT INTO users (username, email, full_name, password_hash)
@@ -181,9 +229,25 @@ class AuthService:
         """Hash API key for storage"""
         return hashlib.sha256(api_key.encode()).hexdigest()
     
+    def _user_from_row(self, row) -> User:
+        """Build a User from a users row, asyncpg returns ids as UUID objects"""
+        user_data = {k: v for k, v in dict(row).items() if k != 'password_hash'}
+        user_data['id'] = str(user_data['id'])
+        return User(**user_data)
+    
+    def _password_hasher_busy(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, try again shortly",
+            headers={"Retry-After": "1"}
+        )
+    
     async def create_user(self, user_data: UserCreate) -> User:
         """Create a new user"""
-        password_hash = pwd_context.hash(user_data.password)
+        try:
+            password_hash = await self.password_hasher.hash(user_data.password)
+        except PasswordHasherSaturated:
+            raise self._password_hasher_busy()
         
         async with self.db_pool.acquire() as conn:
             try:
@@ -193,7 +257,7 @@ class AuthService:
                     RETURNING id, username, email, full_name, is_active, created_at
                 """, user_data.username, user_data.email, user_data.full_name, password_hash)
                 
-                user = User(**dict(result))
+                user = self._user_from_row(result)
                 logger.info(f"Created user: {user.username}")
                 return user
                 
@@ -213,20 +277,20 @@ class AuthService:
                 FROM users 
                 WHERE username = $1 AND is_active = TRUE
             """, username)
-            
-            if not user_data:
-                return None
-            
-            if not pwd_context.verify(password, user_data['password_hash']):
+        
+        if not user_data:
+            return None
+        
+        try:
+            if not await self.password_hasher.verify(password, user_data['password_hash']):
                 return None
-            
-            # Update last login
-            await conn.execute(
-                "UPDATE users SET last_login = NOW() WHERE id = $1",
-                user_data['id']
-            )
-            
-            return User(**{k: v for k, v in dict(user_data).items() if k != 'password_hash'})
+        except PasswordHasherSaturated:
+            raise self._password_hasher_busy()
+        
+        # Update last login, written with the next batch
+        self.user_last_login.touch(user_data['id'])
+        
+        return self._user_from_row(user_data)
     
     async def create_access_token(self, user: User) -> Token:
         """Create JWT access token"""
@@ -281,6 +345,11 @@ class AuthService:
                     detail="Invalid token"
                 )
             
+            principal = self.principal_cache.get(jti)
+            if principal is not None and principal.id == user_id:
+                return principal
+            generation = self.principal_cache.generation
+            
             # Check if session is still valid in Redis
             cached_user_id = await self.redis_pool.get(f"session:{jti}")
             if not cached_user_id:
@@ -300,32 +369,76 @@ class AuthService:
                     )
             
             # Get user data
-            async with self.db_pool.acquire() as conn:
-                user_data = await conn.fetchrow("""
-                    SELECT id, username, email, full_name, is_active, created_at, last_login
-                    FROM users 
-                    WHERE id = $1 AND is_active = TRUE
-                """, user_id)
-                
-                if not user_data:
-                    raise HTTPException(
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                        detail="User not found or inactive"
-                    )
-                
-                return User(**dict(user_data))
+            user = await self._get_active_user(user_id)
+            if not user:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="User not found or inactive"
+                )
+            
+            self.principal_cache.put(
+                jti,
+                user,
+                generation,
+                ttl_seconds=payload["exp"] - time.time() if "exp" in payload else None
+            )
+            return user
                 
         except jwt.ExpiredSignatureError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token expired"
             )
-        except jwt.JWTError:
+        except jwt.InvalidTokenError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token"
             )
     
+    async def _get_active_user(self, user_id: str) -> Optional[User]:
+        """Load an active user, from Redis when cached there"""
+        cached_user = await self.redis_pool.get(f"user:{user_id}")
+        if cached_user:
+            return User.model_validate_json(cached_user)
+        
+        async with self.db_pool.acquire() as conn:
+            user_data = await conn.fetchrow("""
+                SELECT id, username, email, full_name, is_active, created_at, last_login
+                FROM users 
+                WHERE id = $1 AND is_active = TRUE
+            """, user_id)
+        
+        if not user_data:
+            return None
+        
+        user = self._user_from_row(user_data)
+        await self.redis_pool.setex(f"user:{user_id}", self.user_cache_ttl_seconds, user.model_dump_json())
+        return user
+    
+    async def deactivate_user(self, user_id: str) -> bool:
+        """Deactivate a user, who can no longer authenticate with any token"""
+        async with self.db_pool.acquire() as conn:
+            result = await conn.execute(
+                "UPDATE users SET is_active = FALSE WHERE id = $1",
+                user_id
+            )
+            key_hashes = await conn.fetch(
+                "SELECT key_hash FROM api_keys WHERE user_id = $1",
+                user_id
+            )
+        
+        # Cached API key lookups carry the user's active flag too
+        if key_hashes:
+            await self.redis_pool.delete(*(f"api_key:{row['key_hash']}" for row in key_hashes))
+        await self.invalidate_user(user_id)
+        return result != "UPDATE 0"
+    
+    async def invalidate_user(self, user_id: str):
+        """Drop the cached user and tell every worker to drop its cached principals"""
+        await self.redis_pool.delete(f"user:{user_id}")
+        self.principal_cache.invalidate_user(user_id)
+        await self.redis_pool.publish(REVOCATION_CHANNEL, REVOKE_USER_PREFIX + user_id)
+    
     async def create_api_key(self, user_id: str, api_key_data: APIKeyCreate) -> APIKey:
         """Create API key for user"""
         api_key = self._generate_api_key()
@@ -351,31 +464,63 @@ class AuthService:
                 expires_at=expires_at
             )
     
+    def _api_key_data(self, row) -> Dict[str, Any]:
+        """JSON-friendly view of an api_keys lookup row"""
+        key_data = dict(row)
+        key_data['id'] = str(key_data['id'])
+        key_data['user_id'] = str(key_data['user_id'])
+        if key_data['expires_at']:
+            key_data['expires_at'] = key_data['expires_at'].isoformat()
+        return key_data
+    
     async def verify_api_key(self, api_key: str) -> Optional[Dict[str, Any]]:
         """Verify API key and return user info"""
         key_hash = self._hash_api_key(api_key)
         
-        async with self.db_pool.acquire() as conn:
-            result = await conn.fetchrow("""
-                SELECT ak.id, ak.user_id, ak.name, ak.permissions, ak.expires_at,
-                       u.username, u.email, u.is_active
-                FROM api_keys ak
-                JOIN users u ON ak.user_id = u.id
-                WHERE ak.key_hash = $1 
-                AND u.is_active = TRUE
-                AND (ak.expires_at IS NULL OR ak.expires_at > NOW())
-            """, key_hash)
+        cached_key_data = await self.redis_pool.get(f"api_key:{key_hash}")
+        if cached_key_data:
+            key_data = json.loads(cached_key_data)
+        else:
+            async with self.db_pool.acquire() as conn:
+                result = await conn.fetchrow("""
+                    SELECT ak.id, ak.user_id, ak.name, ak.permissions, ak.expires_at,
+                           u.username, u.email, u.is_active
+                    FROM api_keys ak
+                    JOIN users u ON ak.user_id = u.id
+                    WHERE ak.key_hash = $1 
+                    AND u.is_active = TRUE
+                    AND (ak.expires_at IS NULL OR ak.expires_at > NOW())
+                """, key_hash)
             
-            if result:
-                # Update last used timestamp
-                await conn.execute(
-                    "UPDATE api_keys SET last_used = NOW() WHERE id = $1",
-                    result['id']
-                )
-                
-                return dict(result)
+            if not result:
+                return None
             
-            return None
+            key_data = self._api_key_data(result)
+            ttl = self.api_key_cache_ttl_seconds
+            if result['expires_at']:
+                ttl = min(ttl, int((result['expires_at'] - datetime.now(result['expires_at'].tzinfo)).total_seconds()))
+            if ttl > 0:
+                await self.redis_pool.setex(f"api_key:{key_hash}", ttl, json.dumps(key_data))
+        
+        # Update last used timestamp, written with the next batch
+        self.api_key_last_used.touch(key_data['id'])
+        
+        return key_data
+    
+    async def delete_api_key(self, key_id: str, user_id: str) -> bool:
+        """Delete an API key and drop its cached lookup"""
+        async with self.db_pool.acquire() as conn:
+            key_hash = await conn.fetchval("""
+                DELETE FROM api_keys 
+                WHERE id = $1 AND user_id = $2
+                RETURNING key_hash
+            """, key_id, user_id)
+        
+        if not key_hash:
+            return False
+        
+        await self.redis_pool.delete(f"api_key:{key_hash}")
+        return True
     
     async def revoke_token(self, jti: str):
         """Revoke a JWT token"""
@@ -385,20 +530,19 @@ class AuthService:
                 jti
             )
         
-        # Remove from Redis cache
+        # Remove from Redis cache and tell every worker to drop its cached principal
         await self.redis_pool.delete(f"session:{jti}")
+        self.principal_cache.invalidate(jti)
+        await self.redis_pool.publish(REVOCATION_CHANNEL, jti)
     
     async def store_secret(self, key: str, value: str, path: str = "jane") -> bool:
         """Store secret in Vault"""
-        if not self.vault_client:
+        if not self.vault:
             logger.warning("Vault not available, storing secret in environment")
             return False
         
         try:
-            self.vault_client.secrets.kv.v2.create_or_update_secret(
-                path=path,
-                secret={key: value}
-            )
+            await self.vault.write(path, {key: value})
             logger.info(f"Stored secret: {key} at path: {path}")
             return True
         except Exception as e:
@@ -407,12 +551,12 @@ class AuthService:
     
     async def get_secret(self, key: str, path: str = "jane") -> Optional[str]:
         """Retrieve secret from Vault"""
-        if not self.vault_client:
+        if not self.vault:
             return os.getenv(key.upper())
         
         try:
-            response = self.vault_client.secrets.kv.v2.read_secret_version(path=path)
-            return response['data']['data'].get(key)
+            secret = await self.vault.read(path)
+            return secret.get(key)
         except Exception as e:
             logger.error(f"Failed to retrieve secret from Vault: {e}")
             return os.getenv(key.upper())
@@ -456,6 +600,13 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    if auth_service.revocation_listener:
+        auth_service.revocation_listener.cancel()
+    if auth_service.timestamp_flusher:
+        # Cancelling flushes the buffered timestamps one last time
+        auth_service.timestamp_flusher.cancel()
+        await asyncio.gather(auth_service.timestamp_flusher, return_exceptions=True)
+    auth_service.password_hasher.shutdown()
     if auth_service.db_pool:
         await auth_service.db_pool.close()
     if auth_service.redis_pool:
@@ -484,9 +635,9 @@ async def health_check():
         services["redis"] = "unhealthy"
     
     # Check Vault
-    if auth_service.vault_client:
+    if auth_service.vault:
         try:
-            services["vault"] = "healthy" if auth_service.vault_client.is_authenticated() else "unhealthy"
+            services["vault"] = "healthy" if await auth_service.vault.is_authenticated() else "unhealthy"
         except:
             services["vault"] = "unhealthy"
     else:
@@ -555,16 +706,10 @@ async def delete_api_key(
     current_user: User = Depends(get_current_user)
 ):
     """Delete an API key"""
-    async with auth_service.db_pool.acquire() as conn:
-        deleted = await conn.execute("""
-            DELETE FROM api_keys 
-            WHERE id = $1 AND user_id = $2
-        """, key_id, current_user.id)
-        
-        if deleted == "DELETE 0":
-            raise HTTPException(status_code=404, detail="API key not found")
-        
-        return {"message": "API key deleted successfully"}
+    if not await auth_service.delete_api_key(key_id, current_user.id):
+        raise HTTPException(status_code=404, detail="API key not found")
+    
+    return {"message": "API key deleted successfully"}
 
 # Admin endpoints
 @app.get("/admin/users")
@@ -580,7 +725,18 @@ async def list_users(current_user: User = Depends(get_current_user)):
             ORDER BY created_at DESC
         """)
         
-        return [User(**dict(row)) for row in rows]
+        return [auth_service._user_from_row(row) for row in rows]
+
+@app.post("/admin/users/{user_id}/deactivate")
+async def deactivate_user(user_id: str, current_user: User = Depends(get_current_user)):
+    """Deactivate a user (admin only)"""
+    if current_user.username != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if not await auth_service.deactivate_user(user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    return {"message": "User deactivated successfully"}
 
 # Secrets management endpoints
 @app.post("/secrets/{key}")
@@ -0,0 +1,65 @@
+"""
+Bounded, off-loop password hashing
+bcrypt is deliberately slow, so hashing and verification run in a small thread
+pool and excess work is rejected instead of queueing behind the event loop
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from passlib.context import CryptContext
+
+T = TypeVar("T")
+
+
+class PasswordHasherSaturated(Exception):
+    """Raised when too many password operations are already running or waiting"""
+
+
+class PasswordHasher:
+    """Runs CryptContext hash/verify in a bounded executor
+
+    At most max_concurrency operations run at once, at most max_queue wait for
+    a slot, and none waits longer than queue_timeout_seconds.
+    """
+
+    def __init__(self, context: CryptContext, max_concurrency: int, max_queue: int, queue_timeout_seconds: float):
+        self.context = context
+        self.max_concurrency = max(max_concurrency, 1)
+        self.max_queue = max(max_queue, 0)
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="password-hasher")
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._waiting = 0
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    async def _run(self, function: Callable[..., T], *args) -> T:
+        if self._slots.locked():
+            if self._waiting >= self.max_queue:
+                raise PasswordHasherSaturated()
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout_seconds)
+            except asyncio.TimeoutError:
+                raise PasswordHasherSaturated()
+            finally:
+                self._waiting -= 1
+        else:
+            await self._slots.acquire()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+        finally:
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run(self.context.verify, password, password_hash)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,118 @@
+"""
+In-process cache of verified token principals
+Keeps recently verified (jti -> user) pairs for a short time so that repeated
+requests with the same token skip Redis and PostgreSQL, and drops them as soon
+as a revocation is broadcast on Redis pub/sub
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+from loguru import logger
+
+REVOCATION_CHANNEL = "auth:revocations"
+REVOKE_ALL = "*"
+# Prefix of broadcasts that revoke every token of one user, as in "user:<id>"
+REVOKE_USER_PREFIX = "user:"
+
+
+class PrincipalCache:
+    """Short-TTL, size-bounded LRU cache of verified principals keyed by token jti"""
+
+    def __init__(self, ttl_seconds: float, max_size: int, clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        # Bumped on every invalidation, so that a verification racing with a
+        # revocation never stores the principal it loaded before the revocation
+        self.generation = 0
+        # Entries are only served while revocations can be received
+        self.active = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, jti: str) -> Optional[Any]:
+        """Return the cached principal for a token, if still fresh"""
+        if not self.active:
+            return None
+        entry = self._entries.get(jti)
+        if entry is None:
+            return None
+        expires_at, principal = entry
+        if expires_at <= self._clock():
+            del self._entries[jti]
+            return None
+        self._entries.move_to_end(jti)
+        return principal
+
+    def put(self, jti: str, principal: Any, generation: int, ttl_seconds: Optional[float] = None):
+        """Cache a principal verified while the cache was at the given generation"""
+        if not self.active or generation != self.generation or self.max_size <= 0:
+            return
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        if ttl <= 0:
+            return
+        self._entries[jti] = (self._clock() + ttl, principal)
+        self._entries.move_to_end(jti)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, jti: str):
+        """Forget a single token"""
+        self.generation += 1
+        self._entries.pop(jti, None)
+
+    def invalidate_user(self, user_id: str):
+        """Forget every token of a user"""
+        self.generation += 1
+        for jti in [jti for jti, (_, principal) in self._entries.items() if str(principal.id) == user_id]:
+            del self._entries[jti]
+
+    def clear(self):
+        """Forget every token"""
+        self.generation += 1
+        self._entries.clear()
+
+
+async def listen_for_revocations(redis, cache: PrincipalCache, channel: str = REVOCATION_CHANNEL, retry_seconds: float = 1.0):
+    """Keep the cache in sync with revocations published by any worker
+
+    The cache is disabled whenever the subscription is down, since revocations
+    published meanwhile would be missed.
+    """
+    while True:
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(channel)
+            cache.clear()
+            cache.active = True
+            logger.info(f"Listening for token revocations on {channel}")
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                jti = message.get("data")
+                if isinstance(jti, bytes):
+                    jti = jti.decode()
+                if jti == REVOKE_ALL:
+                    cache.clear()
+                elif jti.startswith(REVOKE_USER_PREFIX):
+                    cache.invalidate_user(jti[len(REVOKE_USER_PREFIX):])
+                else:
+                    cache.invalidate(jti)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Token revocation subscription lost: {e}")
+        finally:
+            cache.active = False
+            cache.clear()
+            try:
+                await pubsub.unsubscribe(channel)
+                await pubsub.close()
+            except Exception:
+                pass
+        await asyncio.sleep(retry_seconds)
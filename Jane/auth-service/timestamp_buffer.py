@@ -0,0 +1,95 @@
+"""
+Coalesced "last seen" timestamp writes
+Hot rows such as api_keys.last_used are touched on every request; instead of
+one UPDATE per request the latest timestamp per row is kept in memory and
+written periodically in a single batched statement
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Callable, Dict
+
+from loguru import logger
+
+
+class TimestampBuffer:
+    """Buffers timestamp updates for one column and flushes them in batches
+
+    A row is recorded at most once per precision_seconds, so the stored value
+    is never more than that behind the real last access.
+    """
+
+    def __init__(self, table: str, column: str, precision_seconds: float, clock: Callable[[], datetime] = lambda: datetime.now(timezone.utc)):
+        self.table = table
+        self.column = column
+        self.precision_seconds = precision_seconds
+        self._clock = clock
+        self._pending: Dict[str, datetime] = {}
+        self._recorded: Dict[str, datetime] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @property
+    def statement(self) -> str:
+        return f"""
+            UPDATE {self.table} AS t
+            SET {self.column} = GREATEST(t.{self.column}, v.touched_at)
+            FROM unnest($1::uuid[], $2::timestamptz[]) AS v(id, touched_at)
+            WHERE t.id = v.id
+        """
+
+    def touch(self, row_id) -> bool:
+        """Record an access, returns whether it will be written"""
+        row_id = str(row_id)
+        now = self._clock()
+        recorded = self._recorded.get(row_id)
+        if recorded is not None and (now - recorded).total_seconds() < self.precision_seconds:
+            return False
+        self._recorded[row_id] = now
+        self._pending[row_id] = now
+        return True
+
+    async def flush(self, db_pool) -> int:
+        """Write every pending timestamp in one statement"""
+        if not self._pending:
+            self._forget_old_records()
+            return 0
+        pending, self._pending = self._pending, {}
+        try:
+            async with db_pool.acquire() as conn:
+                await conn.execute(self.statement, list(pending.keys()), list(pending.values()))
+        except Exception:
+            # Keep the timestamps for the next flush, unless newer ones arrived meanwhile
+            for row_id, touched_at in pending.items():
+                self._pending.setdefault(row_id, touched_at)
+            raise
+        self._forget_old_records()
+        return len(pending)
+
+    def _forget_old_records(self):
+        now = self._clock()
+        self._recorded = {
+            row_id: recorded
+            for row_id, recorded in self._recorded.items()
+            if (now - recorded).total_seconds() < self.precision_seconds
+        }
+
+
+async def flush_periodically(db_pool, buffers, interval_seconds: float):
+    """Flush the given buffers every interval until cancelled, then once more"""
+    try:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            for buffer in buffers:
+                try:
+                    await buffer.flush(db_pool)
+                except Exception as e:
+                    logger.error(f"Failed to flush {buffer.table}.{buffer.column}: {e}")
+    except asyncio.CancelledError:
+        for buffer in buffers:
+            try:
+                await buffer.flush(db_pool)
+            except Exception as e:
+                logger.error(f"Failed to flush {buffer.table}.{buffer.column} on shutdown: {e}")
+        raise
@@ -0,0 +1,108 @@
+"""
+Async-safe access to Vault KV v2 secrets
+The hvac client is synchronous, so every call runs in a worker thread; reads
+are cached per path for a TTL (shortened to the lease when Vault returns one)
+and concurrent reads of the same path share a single request
+"""
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class VaultSecrets:
+    """Cached, coalescing, off-loop reader and writer for a KV v2 mount"""
+
+    def __init__(self, client, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._versions: Dict[str, int] = {}
+
+    async def read(self, path: str) -> Dict[str, Any]:
+        """Return the secret data stored at path"""
+        entry = self._cache.get(path)
+        if entry is not None and entry[0] > self._clock():
+            return dict(entry[1])
+        inflight = self._inflight.get(path)
+        if inflight is None:
+            inflight = asyncio.ensure_future(self._fetch(path))
+            self._inflight[path] = inflight
+            inflight.add_done_callback(lambda _: self._inflight.pop(path, None))
+        # A request that times out while Vault is slow leaves the read running for
+        # the other callers of this path, and its result still fills the cache
+        return dict(await asyncio.shield(inflight))
+
+    async def _fetch(self, path: str) -> Dict[str, Any]:
+        version = self._versions.get(path, 0)
+        response = await asyncio.to_thread(self.client.secrets.kv.v2.read_secret_version, path=path)
+        data = response["data"]["data"]
+        ttl = self.ttl_seconds
+        lease_duration = response.get("lease_duration") or 0
+        if lease_duration > 0:
+            ttl = min(ttl, lease_duration)
+        if ttl > 0 and self._versions.get(path, 0) == version:
+            self._cache[path] = (self._clock() + ttl, data)
+        return data
+
+    async def write(self, path: str, secret: Dict[str, Any]):
+        """Store secret data at path and drop the cached copy"""
+        self.invalidate(path)
+        try:
+            await asyncio.to_thread(self.client.secrets.kv.v2.create_or_update_secret, path=path, secret=secret)
+        finally:
+            self.invalidate(path)
+
+    def invalidate(self, path: Optional[str] = None):
+        """Forget the cached copy of a path, or of every path"""
+        if path is None:
+            for cached_path in list(self._versions) + list(self._cache):
+                self._versions[cached_path] = self._versions.get(cached_path, 0) + 1
+            self._cache.clear()
+        else:
+            self._versions[path] = self._versions.get(path, 0) + 1
+            self._cache.pop(path, None)
+
+    async def is_authenticated(self) -> bool:
+        return await asyncio.to_thread(self.client.is_authenticated)
+
+
+class InMemoryVault:
+    """Local stand-in for hvac.Client exposing the KV v2 calls used by the service
+
+    Enabled with VAULT_URL=memory:// for offline development and tests.
+    """
+
+    class InvalidPath(Exception):
+        pass
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.store: Dict[str, Dict[str, Any]] = {}
+        self.reads = 0
+        self.writes = 0
+        self.secrets = self
+        self.kv = self
+        self.v2 = self
+
+    def _wait(self):
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+    def is_authenticated(self) -> bool:
+        return True
+
+    def read_secret_version(self, path: str, **kwargs) -> Dict[str, Any]:
+        self._wait()
+        self.reads += 1
+        if path not in self.store:
+            raise self.InvalidPath(f"no secret at {path}")
+        return {"data": {"data": dict(self.store[path])}, "lease_duration": 0, "renewable": False}
+
+    def create_or_update_secret(self, path: str, secret: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        self._wait()
+        self.writes += 1
+        self.store[path] = dict(secret)
+        return {"data": {"version": self.writes}}
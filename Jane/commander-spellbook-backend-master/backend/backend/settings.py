@@ -157,6 +157,13 @@ MOXFIELD_USER_AGENT = os.getenv('MOXFIELD_USER_AGENT', None)
 ARCHIDEKT_USER_AGENT = 'CommanderSpellbook'
 
 
+# Deck import settings
+# Decklists imported from a website are served from the cache for DECK_IMPORT_CACHE_TIMEOUT seconds,
+# while the raw responses are kept for DECK_IMPORT_REVALIDATION_TIMEOUT seconds to be revalidated with conditional requests
+DECK_IMPORT_CACHE_TIMEOUT = 60 * 5
+DECK_IMPORT_REVALIDATION_TIMEOUT = 60 * 60 * 24
+
+
 # Python Social Auth
 # https://python-social-auth.readthedocs.io/en/latest/backends/index.html
 SOCIAL_AUTH_DISCORD_KEY = os.getenv('DISCORD_CLIENTID', None)
@@ -21,6 +21,7 @@ from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
 from spellbook.urls import router as spellbook_router
 from website.urls import router as website_router
+from website.views import card_list_from_url_async
 from . import views
 
 admin.site.site_header = f'Spellbook Admin Panel {settings.VERSION}'
@@ -36,6 +37,8 @@ router.register(r'users', views.UserViewSet, basename='users')
 # Additionally, we include login URLs for the browsable API.
 urlpatterns = [
     path('', include(router.urls)),
+    # Async variants of API views
+    path('card-list-from-url-async', card_list_from_url_async, name='card-list-from-url-async'),
     # Authentication
     path('', include('social_django.urls', namespace='social')),
     path('auth/', include('rest_framework.urls', namespace='rest_framework')),
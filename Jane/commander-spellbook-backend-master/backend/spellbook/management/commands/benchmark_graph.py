@@ -0,0 +1,61 @@
+from statistics import mean
+from time import perf_counter
+from django.core.management.base import BaseCommand, CommandParser
+from spellbook.variants.variant_data import Data
+from spellbook.variants.combo_graph import AttributesIndex, Graph
+from spellbook.models.constants import DEFAULT_CARD_LIMIT, DEFAULT_VARIANT_LIMIT
+
+
+class Command(BaseCommand):
+    help = 'Measures how long it takes to build the combo graph on the current database'
+
+    def add_arguments(self, parser: CommandParser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            dest='repeat',
+            default=5,
+            help='Number of measured runs',
+        )
+
+    def report(self, label: str, timings: list[float]):
+        self.stdout.write(f'{label}: min {min(timings) * 1000:.1f} ms, mean {mean(timings) * 1000:.1f} ms over {len(timings)} runs')
+
+    def handle(self, *args, **options):
+        repeat: int = max(options['repeat'], 1)
+        start = perf_counter()
+        data = Data()
+        self.stdout.write(f'Data loaded in {perf_counter() - start:.2f} s')
+        self.stdout.write(f'{len(data.id_to_card)} cards, {len(data.id_to_template)} templates, {len(data.id_to_feature)} features, {len(data.id_to_combo)} combos')
+        graph_timings = list[float]()
+        for _ in range(repeat):
+            start = perf_counter()
+            graph = Graph(data, card_limit=DEFAULT_CARD_LIMIT, variant_limit=DEFAULT_VARIANT_LIMIT)
+            graph_timings.append(perf_counter() - start)
+        self.report('Graph construction', graph_timings)
+        matchers = sum(len(d) for d in graph.famnodes.values())
+        produced = sum(len(d) for d in graph.fanodes.values())
+        self.stdout.write(f'{matchers} feature matchers against {produced} produced features with attributes')
+        scan_timings = list[float]()
+        index_timings = list[float]()
+        for _ in range(repeat):
+            start = perf_counter()
+            scan_matches = 0
+            for feature_id, d in graph.famnodes.items():
+                candidates = graph.fanodes.get(feature_id, {})
+                for fam in d.values():
+                    scan_matches += sum(1 for attributes in candidates if fam.item.matcher.matches(attributes))
+            scan_timings.append(perf_counter() - start)
+            start = perf_counter()
+            index_matches = 0
+            for feature_id, d in graph.famnodes.items():
+                index = AttributesIndex(graph.fanodes.get(feature_id, {}))
+                for fam in d.values():
+                    index_matches += len(index.matching(fam.item.matcher))
+            index_timings.append(perf_counter() - start)
+        self.report('Attribute matching by scan', scan_timings)
+        self.report('Attribute matching by index', index_timings)
+        if scan_matches != index_matches:
+            self.stderr.write(self.style.ERROR(f'Mismatch: {scan_matches} matches by scan, {index_matches} by index'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{index_matches} matches found by both strategies'))
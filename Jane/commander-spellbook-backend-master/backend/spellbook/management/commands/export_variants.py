@@ -9,7 +9,7 @@ from django.db import transaction
 from djangorestframework_camel_case.util import camelize
 from spellbook.models import Variant, Job, VariantAlias
 from spellbook.serializers import VariantSerializer, VariantAliasSerializer
-from spellbook.views.variants import VariantViewSet
+from spellbook.views.variants import VariantViewSet, refresh_representative_variants
 from spellbook.views.variant_aliases import VariantAliasViewSet
 from ..abstract_command import AbstractCommand
 from ..s3_upload import upload_json_to_aws
@@ -55,6 +55,9 @@ class Command(AbstractCommand):
         self.log('Updating variants preserialized representation...')
         Variant.objects.bulk_serialize(objs=variants_source, serializer=VariantSerializer, batch_size=self.batch_size)
         self.log('Updating variants preserialized representation...done', self.style.SUCCESS)
+        self.log('Updating representative variants...')
+        refresh_representative_variants()
+        self.log('Updating representative variants...done', self.style.SUCCESS)
         self.log('Fetching variant aliases from db...')
         with transaction.atomic(durable=True):
             variants_alias_source = list[VariantAlias](VariantAliasSerializer.prefetch_related(VariantAliasViewSet.queryset))
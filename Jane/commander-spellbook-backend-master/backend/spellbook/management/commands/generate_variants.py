@@ -3,6 +3,7 @@ from django.contrib.contenttypes.models import ContentType
 from django.core.management.base import CommandParser
 from spellbook.models import Job
 from spellbook.variants.variants_generator import generate_variants
+from spellbook.views.variants import refresh_representative_variants
 from ..abstract_command import AbstractCommand
 
 
@@ -28,6 +29,9 @@ class Command(AbstractCommand):
             message = f'Generated {added} new variants, restored {restored} variants, removed {removed} variants for'
         message += ' all combos'
         self.log(message, self.style.SUCCESS)
+        self.log('Updating representative variants...')
+        refresh_representative_variants()
+        self.log('Updating representative variants...done', self.style.SUCCESS)
         if self.job is not None and self.job.started_by is not None:
             LogEntry(
                 user=self.job.started_by,
@@ -2,6 +2,7 @@ from spellbook.models import Variant
 from spellbook.models.combo import Combo
 from django.db.models import Q, Subquery, OuterRef, Count
 from django.db.models.functions import Coalesce
+from spellbook.views.variants import refresh_representative_variants
 from ..abstract_command import AbstractCommand
 from ..edhrec import edhrec, update_variants
 
@@ -60,3 +61,6 @@ class Command(AbstractCommand):
             ),
         )
         self.log('Updating combos...done', self.style.SUCCESS)
+        self.log('Updating representative variants...')
+        refresh_representative_variants()
+        self.log('Updating representative variants...done', self.style.SUCCESS)
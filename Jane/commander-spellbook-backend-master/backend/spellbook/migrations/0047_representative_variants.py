@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 21:22
+
+import django.db.models.deletion
+import spellbook.models.variant
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spellbook', '0046_remove_combo_public_notes_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RepresentativeVariantSet',
+            fields=[
+                ('key', models.CharField(editable=False, help_text='Visible statuses and ordering of this set', max_length=255, primary_key=True, serialize=False)),
+                ('valid', models.BooleanField(default=False, editable=False, help_text='Whether the set is in sync with the variants')),
+                ('refreshed', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='variant',
+            managers=[
+                ('objects', spellbook.models.variant.VariantManager()),
+                ('recipes_prefetched', spellbook.models.variant.RecipePrefetchedManager()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RepresentativeVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='representative_of', to='spellbook.variant')),
+                ('representative_set', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='spellbook.representativevariantset')),
+            ],
+            options={
+                'unique_together': {('representative_set', 'variant')},
+            },
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.1 on 2026-10-18 21:30
+
+import re
+import spellbook.models.mixins
+from django.db import migrations, models
+
+# Copied from spellbook.models.feature as of this migration
+EXTRA_TURNS_REGEX = r'(?:near-)?infinite (?:extra )?turns?'
+MASS_LAND_DENIAL_REGEX = r'mass land (?:destruction|denial)'
+SKIP_TURNS_REGEX = r'(?:infinite(?:ly)? )?skip (?:(?:all )?(?:your )|infinite )?(?:future )?turns?'
+
+
+def populate_bracket_flags(apps, schema_editor):
+    Feature = apps.get_model('spellbook', 'Feature')
+    Variant = apps.get_model('spellbook', 'Variant')
+    classifiers = {
+        'extra_turns': lambda name: re.search(EXTRA_TURNS_REGEX, name, re.IGNORECASE) is not None,
+        'mass_land_denial': lambda name: re.search(MASS_LAND_DENIAL_REGEX, name, re.IGNORECASE) is not None,
+        'lock': lambda name: name.lower() == 'lock',
+        'skip_turns': lambda name: re.search(SKIP_TURNS_REGEX, name, re.IGNORECASE) is not None,
+    }
+    features = list(Feature._base_manager.values_list('id', 'name'))
+    for field, classify in classifiers.items():
+        feature_ids = [feature_id for feature_id, name in features if classify(name)]
+        Feature._base_manager.filter(id__in=feature_ids).update(**{field: True})
+        Variant._base_manager.filter(**{f'produces__{field}': True}).update(**{field: True})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spellbook', '0047_representative_variants'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='feature',
+            managers=[
+                ('objects', spellbook.models.mixins.PreSaveManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='feature',
+            name='extra_turns',
+            field=models.BooleanField(default=False, editable=False, help_text='Whether this feature grants infinite or near-infinite extra turns', verbose_name='extra turns feature'),
+        ),
+        migrations.AddField(
+            model_name='feature',
+            name='lock',
+            field=models.BooleanField(default=False, editable=False, help_text='Whether this feature is a lock', verbose_name='lock feature'),
+        ),
+        migrations.AddField(
+            model_name='feature',
+            name='mass_land_denial',
+            field=models.BooleanField(default=False, editable=False, help_text='Whether this feature inhibits or destroys numerous lands', verbose_name='mass land denial feature'),
+        ),
+        migrations.AddField(
+            model_name='feature',
+            name='skip_turns',
+            field=models.BooleanField(default=False, editable=False, help_text='Whether this feature makes players skip their turns', verbose_name='skip turns feature'),
+        ),
+        migrations.AddField(
+            model_name='variant',
+            name='extra_turns',
+            field=models.BooleanField(default=False, editable=False, help_text='Whether this variant produces infinite or near-infinite extra turns'),
+        ),
+        migrations.AddField(
+            model_name='variant',
+            name='lock',
+            field=models.BooleanField(default=False, editable=False, help_text='Whether this variant produces a lock'),
+        ),
+        migrations.AddField(
+            model_name='variant',
+            name='mass_land_denial',
+            field=models.BooleanField(default=False, editable=False, help_text='Whether this variant produces mass land denial'),
+        ),
+        migrations.AddField(
+            model_name='variant',
+            name='skip_turns',
+            field=models.BooleanField(default=False, editable=False, help_text='Whether this variant makes players skip their turns'),
+        ),
+        migrations.RunPython(populate_bracket_flags, reverse_code=migrations.RunPython.noop),
+    ]
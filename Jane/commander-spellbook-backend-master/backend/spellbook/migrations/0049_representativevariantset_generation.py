@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spellbook', '0048_bracket_flags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='representativevariantset',
+            name='generation',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of times the set has been invalidated'),
+        ),
+    ]
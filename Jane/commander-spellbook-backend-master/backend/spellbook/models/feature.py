@@ -1,3 +1,4 @@
+import re
 from django.db import models, connection
 from django.dispatch import receiver
 from django.db.models.signals import post_save
@@ -5,9 +6,15 @@ from django.db.models.functions import Lower, Upper
 from django.contrib.postgres.indexes import GinIndex, OpClass
 from .constants import MAX_FEATURE_NAME_LENGTH
 from .validators import NAME_VALIDATORS
+from .mixins import PreSaveModelMixin
 
 
-class Feature(models.Model):
+EXTRA_TURNS_REGEX = r'(?:near-)?infinite (?:extra )?turns?'
+MASS_LAND_DENIAL_REGEX = r'mass land (?:destruction|denial)'
+SKIP_TURNS_REGEX = r'(?:infinite(?:ly)? )?skip (?:(?:all )?(?:your )|infinite )?(?:future )?turns?'
+
+
+class Feature(PreSaveModelMixin):
     class Status(models.TextChoices):
         UTILITY = 'U'
         HELPER = 'H'
@@ -21,6 +28,10 @@ class Feature(models.Model):
     updated = models.DateTimeField(auto_now=True, editable=False)
     status = models.CharField(choices=Status.choices, default=Status.UTILITY, help_text='Is this feature an utility for variant generation, a helper to be exploited somehow, or a standalone, probably impactful effect?', verbose_name='status', max_length=2)
     uncountable = models.BooleanField(default=False, help_text='Is this an uncountable feature? Uncountable features can only appear in one copy and speed up variant generation.', verbose_name='is uncountable')
+    extra_turns = models.BooleanField(default=False, editable=False, help_text='Whether this feature grants infinite or near-infinite extra turns', verbose_name='extra turns feature')
+    mass_land_denial = models.BooleanField(default=False, editable=False, help_text='Whether this feature inhibits or destroys numerous lands', verbose_name='mass land denial feature')
+    lock = models.BooleanField(default=False, editable=False, help_text='Whether this feature is a lock', verbose_name='lock feature')
+    skip_turns = models.BooleanField(default=False, editable=False, help_text='Whether this feature makes players skip their turns', verbose_name='skip turns feature')
 
     class Meta:
         verbose_name = 'feature'
@@ -43,20 +54,30 @@ class Feature(models.Model):
     def __str__(self):
         return self.name
 
+    def pre_save(self):
+        self.extra_turns = re.search(EXTRA_TURNS_REGEX, self.name, re.IGNORECASE) is not None
+        self.mass_land_denial = re.search(MASS_LAND_DENIAL_REGEX, self.name, re.IGNORECASE) is not None
+        self.lock = self.name.lower() == 'lock'
+        self.skip_turns = re.search(SKIP_TURNS_REGEX, self.name, re.IGNORECASE) is not None
+
 
 @receiver(post_save, sender=Feature, dispatch_uid='update_variant_fields')
 def update_variant_fields(sender, instance, created, raw, **kwargs):
     if raw or created:
         return
     from .variant import Variant
-    variants = Variant.recipes_prefetched.filter(produces=instance)
+    variants = Variant.recipes_prefetched.prefetch_related('uses', 'requires', 'produces').filter(produces=instance)
     variants_to_save = []
     for variant in variants:
+        variant: Variant
+        changed = variant.update_variant()
         new_variant_name = variant._str()
         if new_variant_name != variant.name:
             variant.name = new_variant_name
+            changed = True
+        if changed:
             variants_to_save.append(variant)
-    Variant.objects.bulk_update(variants_to_save, ['name'])
+    Variant.objects.bulk_update(variants_to_save, Variant.computed_fields() + ['name'])
 
 
 @receiver(post_save, sender=Feature, dispatch_uid='update_combo_fields')
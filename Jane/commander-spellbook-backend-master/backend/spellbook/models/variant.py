@@ -1,9 +1,8 @@
 from dataclasses import dataclass
-import re
 from typing import Iterable, Sequence
 from django.db import models, connection
 from django.dispatch import receiver
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.utils.html import format_html
 from django.db.models.functions import Upper
 from django.contrib.postgres.indexes import GinIndex, OpClass
@@ -23,7 +22,23 @@ from .utils import CardType, mana_value, merge_identities
 from .constants import MAX_MANA_NEEDED_LENGTH
 
 
-class RecipePrefetchedManager(PreSaveSerializedManager):
+class VariantQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        result = super().update(**kwargs)
+        RepresentativeVariantSet.invalidate()
+        return result
+
+    def bulk_create(self, objs, *args, **kwargs):
+        result = super().bulk_create(objs, *args, **kwargs)
+        RepresentativeVariantSet.invalidate()
+        return result
+
+
+class VariantManager(PreSaveSerializedManager.from_queryset(VariantQuerySet)):
+    pass
+
+
+class RecipePrefetchedManager(VariantManager):
     def get_queryset(self):
         return super().get_queryset().prefetch_related(
             'cardinvariant_set',
@@ -39,7 +54,7 @@ DEFAULT_VIEW_ORDERING = (models.F('popularity').desc(nulls_last=True), models.F(
 
 
 class Variant(Recipe, Playable, PreSaveSerializedModelMixin, ScryfallLinkMixin):
-    objects: PreSaveSerializedManager
+    objects = VariantManager()
     recipes_prefetched = RecipePrefetchedManager()
 
     class Status(models.TextChoices):
@@ -127,6 +142,10 @@ class Variant(Recipe, Playable, PreSaveSerializedModelMixin, ScryfallLinkMixin):
     variant_count = models.PositiveIntegerField(editable=False, default=0, help_text='Number of variants generated by the same generator combos')
     hulkline = models.BooleanField(editable=False, default=False, help_text='Whether the variant is a Protean Hulk line')
     bracket_tag = models.CharField(choices=BracketTag.choices, default=BracketTag.RUTHLESS, max_length=2, blank=False, editable=False, help_text='Bracket tag for this variant')
+    extra_turns = models.BooleanField(editable=False, default=False, help_text='Whether this variant produces infinite or near-infinite extra turns')
+    mass_land_denial = models.BooleanField(editable=False, default=False, help_text='Whether this variant produces mass land denial')
+    lock = models.BooleanField(editable=False, default=False, help_text='Whether this variant produces a lock')
+    skip_turns = models.BooleanField(editable=False, default=False, help_text='Whether this variant makes players skip their turns')
     bracket_tag_override = models.CharField(choices=BracketTag.choices, max_length=2, blank=True, null=True, help_text='Override bracket tag for this variant')
     bracket = models.GeneratedField(
         db_persist=True,
@@ -153,12 +172,24 @@ class Variant(Recipe, Playable, PreSaveSerializedModelMixin, ScryfallLinkMixin):
         '''
         Returns the fields that are computed from related models.
         '''
-        return Playable.playable_fields() + [
+        return Playable.playable_fields() + cls.bracket_fields() + [
             'hulkline',
             'bracket_tag',
             'mana_value_needed',
         ]
 
+    @classmethod
+    def bracket_fields(cls):
+        '''
+        Returns the fields that classify the features produced by the variant for bracket estimation.
+        '''
+        return [
+            'extra_turns',
+            'mass_land_denial',
+            'lock',
+            'skip_turns',
+        ]
+
     class Meta:
         verbose_name = 'variant'
         verbose_name_plural = 'variants'
@@ -252,6 +283,10 @@ class Variant(Recipe, Playable, PreSaveSerializedModelMixin, ScryfallLinkMixin):
             and (
                 battlefield_mana_value <= 4 or all(name.split(',', 1)[0] not in self.notable_prerequisites for _, card in recipe.cards for name in card.name.split(' // '))
             )
+        self.extra_turns = any(feature.extra_turns for _, feature in recipe.features)
+        self.mass_land_denial = any(feature.mass_land_denial for _, feature in recipe.features)
+        self.lock = any(feature.lock for _, feature in recipe.features)
+        self.skip_turns = any(feature.skip_turns for _, feature in recipe.features)
         self.bracket_tag = estimate_bracket([card for _, card in recipe.cards], [template for _, template in recipe.templates], included_variants=[(self, recipe)]).bracket_tag
         new_values = {field: getattr(self, field) for field in self.computed_fields()}
         return old_values != new_values
@@ -380,6 +415,48 @@ class VariantIncludesCombo(models.Model):
         unique_together = [('variant', 'combo')]
 
 
+class RepresentativeVariantSet(models.Model):
+    '''
+    Precomputed first variant of each generator combo, for a given set of visible
+    statuses and a given ordering, used to group variants by combo without window functions.
+    '''
+    key = models.CharField(max_length=255, primary_key=True, editable=False, help_text='Visible statuses and ordering of this set')
+    valid = models.BooleanField(default=False, editable=False, help_text='Whether the set is in sync with the variants')
+    generation = models.PositiveIntegerField(default=0, editable=False, help_text='Number of times the set has been invalidated')
+    refreshed = models.DateTimeField(auto_now=True, editable=False)
+    variants: models.Manager['RepresentativeVariant']
+
+    def __str__(self):
+        return self.key
+
+    @classmethod
+    def invalidate(cls):
+        # Bumped even on invalid sets, so that a refresh in progress notices it is stale
+        cls.objects.update(valid=False, generation=models.F('generation') + 1)
+
+
+class RepresentativeVariant(models.Model):
+    id: int
+    representative_set = models.ForeignKey(to=RepresentativeVariantSet, on_delete=models.CASCADE, related_name='variants')
+    representative_set_id: str
+    variant = models.ForeignKey(to=Variant, on_delete=models.CASCADE, related_name='representative_of')
+    variant_id: str
+
+    def __str__(self):
+        return f'Variant {self.variant_id} in {self.representative_set_id}'
+
+    class Meta:
+        unique_together = [('representative_set', 'variant')]
+
+
+@receiver(post_save, sender=Variant, dispatch_uid='variant_saved')
+@receiver(post_delete, sender=Variant, dispatch_uid='variant_deleted')
+def invalidate_representative_variants(sender, instance: Variant, raw=False, **kwargs):
+    if raw:
+        return
+    RepresentativeVariantSet.invalidate()
+
+
 @receiver(post_save, sender=Variant.uses.through, dispatch_uid='update_variant_on_cards')
 @receiver(post_save, sender=Variant.requires.through, dispatch_uid='update_variant_on_templates')
 def update_variant_on_ingredient(sender, instance: CardInVariant | TemplateInVariant, raw=False, **kwargs):
@@ -460,38 +537,10 @@ def estimate_bracket(cards: Sequence[Card], templates: Sequence[Template], inclu
             elif borderline_relevant and arguably_two_card and not arguably_early_game:
                 borderline_late_game_two_card_combos.append(variant)
 
-        extra_turns_combos = [
-            v
-            for v, recipe in included_variants
-            if any(
-                re.search(r'(?:near-)?infinite (?:extra )?turns?', feature.name, re.IGNORECASE)
-                for _, feature in recipe.features
-            )
-        ]
-        mass_land_denial_combos = [
-            v
-            for v, recipe in included_variants
-            if any(
-                re.search(r'mass land (?:destruction|denial)', feature.name, re.IGNORECASE)
-                for _, feature in recipe.features
-            )
-        ]
-        lock_combos = [
-            v
-            for v, recipe in included_variants
-            if any(
-                feature.name.lower() == 'lock'
-                for _, feature in recipe.features
-            )
-        ]
-        skip_turns_combos = [
-            v
-            for v, recipe in included_variants
-            if any(
-                re.search(r'(?:infinite(?:ly)? )?skip (?:(?:all )?(?:your )|infinite )?(?:future )?turns?', feature.name, re.IGNORECASE)
-                for _, feature in recipe.features
-            )
-        ]
+        extra_turns_combos = [v for v, _ in included_variants if v.extra_turns]
+        mass_land_denial_combos = [v for v, _ in included_variants if v.mass_land_denial]
+        lock_combos = [v for v, _ in included_variants if v.lock]
+        skip_turns_combos = [v for v, _ in included_variants if v.skip_turns]
         return BracketEstimateData(
             game_changer_cards=[c for c in cards if c.game_changer],
             mass_land_denial_cards=[c for c in cards if c.mass_land_denial],
@@ -18,5 +18,26 @@ class FeatureTests(TestCaseMixinWithSeeding, TestCase):
         f = Feature.objects.get(id=self.f5_id)
         self.assertTrue(f.uncountable)
 
+    def test_bracket_fields(self):
+        for name, expected in {
+            'Infinite turns': (True, False, False, False),
+            'Near-infinite extra turns': (True, False, False, False),
+            'infinite extra turn': (True, False, False, False),
+            'Mass land destruction': (False, True, False, False),
+            'Mass Land Denial': (False, True, False, False),
+            'Lock': (False, False, True, False),
+            'Lock pieces': (False, False, False, False),
+            'Skip all your future turns': (False, False, False, True),
+            'Infinitely skip turns': (False, False, False, True),
+            'Infinite mana': (False, False, False, False),
+        }.items():
+            with self.subTest(name):
+                f = Feature.objects.create(name=name)
+                self.assertEqual((f.extra_turns, f.mass_land_denial, f.lock, f.skip_turns), expected)
+                f.name = f'{name} (renamed)' if name != 'Lock' else 'Unlock'
+                f.save()
+                f.refresh_from_db()
+                self.assertFalse(f.lock)
+
     def test_method_count(self):
-        self.assertEqual(count_methods(Feature), 1)
+        self.assertEqual(count_methods(Feature), 2)
@@ -1,15 +1,17 @@
 import json
 import random
+from unittest.mock import patch
 from django.test import TestCase
-from django.db import models
+from django.db import connection, models
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from common.inspection import json_to_python_lambda
-from spellbook.models import Card, Template, Feature, Variant, CardInVariant, TemplateInVariant, Combo
+from spellbook.models import Card, Template, Feature, Variant, CardInVariant, TemplateInVariant, Combo, RepresentativeVariantSet
 from spellbook.models.utils import SORTED_COLORS
 from spellbook.views import VariantViewSet
 from spellbook.serializers import VariantSerializer
-from spellbook.views.variants import VariantGroupedByComboFilter
+from spellbook.views.variants import VariantGroupedByComboFilter, refresh_representative_variants
 from website.models import WebsiteProperty, FEATURED_SET_CODES
 from ..testing import TestCaseMixinWithSeeding
 
@@ -951,6 +953,81 @@ class VariantViewsTests(TestCaseMixinWithSeeding, TestCase):
             result_id_set = {v.id for v in result.results}
             self.assertSetEqual(result_id_set, best_variants_ids)
 
+    def test_variants_list_view_grouping_by_combo_with_representative_variants(self):
+        parameter = VariantGroupedByComboFilter.query_param
+        variants = self.seed_popularity()
+        for variant in variants:
+            variant.price_tcgplayer = random.randint(0, 10)
+            variant.price_cardkingdom = random.randint(0, 10)
+        self.bulk_serialize_variants(q=variants, extra_fields=['price_tcgplayer', 'price_cardkingdom'])
+        Variant.objects.filter(id__in=random.sample([v.id for v in variants], 2)).update(status=Variant.Status.DRAFT)
+        orderings = [None] + [prefix + field for field in VariantViewSet.ordering_fields if field != '?' for prefix in ('', '-')]
+        users = [None, self.user, self.admin]
+
+        def grouped_variant_ids(user, ordering, **extra) -> list[str]:
+            if user is None:
+                self.client.logout()
+            else:
+                self.client.force_login(user)
+            query_params = {parameter: 'true', 'limit': 100, **extra}
+            if ordering is not None:
+                query_params['ordering'] = ordering
+            response = self.client.get(reverse('variants-list'), query_params=query_params, follow=True)  # type: ignore
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            result = json.loads(response.content, object_hook=json_to_python_lambda)
+            return [v.id for v in result.results]
+        self.assertFalse(RepresentativeVariantSet.objects.filter(valid=True).exists())
+        expected = {
+            (user, ordering): grouped_variant_ids(user, ordering)
+            for user in users
+            for ordering in orderings
+        }
+        refresh_representative_variants()
+        self.assertFalse(RepresentativeVariantSet.objects.filter(valid=False).exists())
+        with patch.object(VariantGroupedByComboFilter, '_filter_queryset', side_effect=AssertionError('window function used')):
+            for (user, ordering), expected_ids in expected.items():
+                with self.subTest(f'user {user} ordering {ordering}'):
+                    self.assertGreater(len(expected_ids), 0)
+                    result_ids = grouped_variant_ids(user, ordering)
+                    if ordering is None:
+                        self.assertListEqual(result_ids, expected_ids)
+                    else:
+                        self.assertCountEqual(result_ids, expected_ids)
+        with self.subTest('with search query'):
+            with patch.object(VariantGroupedByComboFilter, '_filter_queryset', autospec=True, side_effect=VariantGroupedByComboFilter._filter_queryset) as window:
+                result_ids = grouped_variant_ids(None, None, q='card:"F F"')
+                self.assertTrue(window.called)
+            self.assertGreater(len(result_ids), 0)
+            self.assertTrue(set(result_ids).isdisjoint(set(expected[(None, None)]) - set(Variant.objects.filter(uses__name='F F').values_list('id', flat=True))))
+        with self.subTest('invalidation'):
+            Variant.objects.filter(id=expected[(None, None)][0]).update(popularity=None)
+            self.assertFalse(RepresentativeVariantSet.objects.filter(valid=True).exists())
+            variant = Variant.objects.get(id=expected[(None, None)][0])
+            refresh_representative_variants()
+            variant.save()
+            self.assertFalse(RepresentativeVariantSet.objects.filter(valid=True).exists())
+            refresh_representative_variants()
+            variant.delete()
+            self.assertFalse(RepresentativeVariantSet.objects.filter(valid=True).exists())
+        with self.subTest('invalidation during a refresh'):
+            def invalidating_filter_queryset(grouping_filter, queryset):
+                RepresentativeVariantSet.invalidate()
+                return original_filter_queryset(grouping_filter, queryset)
+            original_filter_queryset = VariantGroupedByComboFilter._filter_queryset
+            with patch.object(VariantGroupedByComboFilter, '_filter_queryset', autospec=True, side_effect=invalidating_filter_queryset):
+                refresh_representative_variants()
+            self.assertTrue(RepresentativeVariantSet.objects.exists())
+            self.assertFalse(RepresentativeVariantSet.objects.filter(valid=True).exists())
+        with self.subTest('one invalidation per write'):
+            def invalidations(write) -> int:
+                with CaptureQueriesContext(connection) as context:
+                    write()
+                return sum(1 for query in context.captured_queries if query['sql'].startswith('UPDATE "spellbook_representativevariantset"'))
+            variants = list(Variant.objects.all()[:3])
+            self.assertEqual(invalidations(lambda: variants[0].save()), 1)
+            self.assertEqual(invalidations(lambda: Variant.objects.filter(id=variants[0].id).update(popularity=1)), 1)
+            self.assertEqual(invalidations(lambda: Variant.objects.bulk_update(variants, ['popularity'])), 1)
+
     def test_variants_list_view_variant_filter(self):
         for variant_id in Variant.objects.values_list('pk', flat=True):
             with self.subTest(f'combo {variant_id}'):
@@ -961,3 +1038,22 @@ class VariantViewsTests(TestCaseMixinWithSeeding, TestCase):
                 result_id_set = {v.id for v in result.results}
                 correct_id_set = {v.id for v in Variant.objects.filter(of__variants=variant_id)}
                 self.assertSetEqual(result_id_set, correct_id_set)
+
+    def test_variants_list_view_cards_filter(self):
+        card_ids = list(Card.objects.order_by('pk').values_list('pk', flat=True))
+        for card_subset in (card_ids[:1], card_ids[:2], card_ids[1:4], card_ids):
+            with self.subTest(f'cards {card_subset}'):
+                response = self.client.get(reverse('variants-list'), query_params={'cards': ','.join(str(c) for c in card_subset)}, follow=True)  # type: ignore
+                self.assertEqual(response.status_code, status.HTTP_200_OK, response.content.decode())
+                self.assertEqual(response.get('Content-Type'), 'application/json')
+                result = json.loads(response.content, object_hook=json_to_python_lambda)
+                matched_counts = {
+                    v.id: CardInVariant.objects.filter(variant=v, card_id__in=card_subset).count()
+                    for v in self.public_variants.all()
+                }
+                result_ids = [v.id for v in result.results]
+                self.assertSetEqual(set(result_ids), {variant_id for variant_id, count in matched_counts.items() if count > 0})
+                result_counts = [matched_counts[variant_id] for variant_id in result_ids]
+                self.assertEqual(result_counts, sorted(result_counts, reverse=True))
+        response = self.client.get(reverse('variants-list'), query_params={'cards': 'a,b'}, follow=True)  # type: ignore
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -194,6 +194,42 @@ def satisfies(produced: Iterable[FeatureWithAttributes], needed: Iterable[Featur
     return True
 
 
+class AttributesIndex(Generic[T]):
+    '''
+    Indexes items by their attribute sets, keeping for each attribute the bitset of the items having it,
+    so that matching an AttributesMatcher is a handful of bitwise operations instead of a scan.
+    '''
+
+    def __init__(self, items: Mapping[frozenset[int], T]):
+        self.items = list(items.values())
+        self.all = (1 << len(self.items)) - 1
+        self.attribute_to_bitset = defaultdict[int, int](int)
+        for i, attributes in enumerate(items.keys()):
+            for attribute in attributes:
+                self.attribute_to_bitset[attribute] |= 1 << i
+
+    def _bitset(self, attribute: int) -> int:
+        return self.attribute_to_bitset.get(attribute, 0)
+
+    def matching(self, matcher: AttributesMatcher) -> list[T]:
+        if matcher.any_of:
+            bitset = 0
+            for attribute in matcher.any_of:
+                bitset |= self._bitset(attribute)
+        else:
+            bitset = self.all
+        for attribute in matcher.all_of:
+            bitset &= self._bitset(attribute)
+        for attribute in matcher.none_of:
+            bitset &= ~self._bitset(attribute)
+        result = list[T]()
+        while bitset:
+            lowest = bitset & -bitset
+            result.append(self.items[lowest.bit_length() - 1])
+            bitset ^= lowest
+        return result
+
+
 class Graph:
     class GraphError(Exception):
         pass
@@ -288,12 +324,11 @@ class Graph:
                         b.features_needed.setdefault(fam.item.feature, {})[fam] = b.features_needed.get(fam.item.feature, {}).get(fam, 0) + feature_needed_by_combo.quantity
         # Find matching feature with attributes nodes
         for feature_id, d in self.famnodes.items():
-            candidates = self.fanodes.get(feature_id, {})
+            candidates = AttributesIndex(self.fanodes.get(feature_id, {}))
             for fam in d.values():
-                for attributes, matching_node in candidates.items():
-                    if fam.item.matcher.matches(attributes):
-                        fam.matches.add(matching_node)
-                        matching_node.matches.append(fam)
+                for matching_node in candidates.matching(fam.item.matcher):
+                    fam.matches.add(matching_node)
+                    matching_node.matches.append(fam)
         self._to_reset_nodes_state = set[Node]()
         self._to_reset_nodes_filtered_state = set[Node]()
         self._to_reset_nodes_filtered_variant_set = set[Node]()
@@ -176,6 +176,10 @@ class Data:
             return variant_set
         self.utility_features_ids = frozenset(f.id for f in self.id_to_feature.values() if f.status == Feature.Status.UTILITY)
         self.not_working_variants = fetch_not_working_variants(self.id_to_variant.values()).variants()
+        # Lookups memoized while rendering the variants' texts
+        self.card_to_replacement_name = dict[int, str]()
+        self.combos_to_needed_features_by_feature = dict[frozenset[int], dict[int, list[FeatureNeededInCombo]]]()
+        self.combos_feature_attributes_to_replacement_applies = dict[tuple[frozenset[int], int, frozenset[int]], bool]()
 
 
 count = 0
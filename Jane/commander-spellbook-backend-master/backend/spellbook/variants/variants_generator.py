@@ -10,7 +10,7 @@ from django.utils.functional import cached_property
 from .utils import includes_any
 from .variant_data import Data, debug_queries
 from .combo_graph import FeatureWithAttributes, Graph, VariantSet, cardid, templateid, featureid
-from spellbook.models import Combo, Feature, Job, Variant, CardInVariant, TemplateInVariant, id_from_cards_and_templates_ids, Playable, Card, Template, VariantAlias, Ingredient, FeatureProducedByVariant, VariantOfCombo, VariantIncludesCombo, ZoneLocation, CardType
+from spellbook.models import Combo, Feature, Job, Variant, CardInVariant, TemplateInVariant, id_from_cards_and_templates_ids, Playable, Card, VariantAlias, Ingredient, FeatureProducedByVariant, VariantOfCombo, VariantIncludesCombo, FeatureNeededInCombo, ZoneLocation, CardType
 from spellbook.utils import log_into_job
 from spellbook.models.constants import DEFAULT_CARD_LIMIT, DEFAULT_VARIANT_LIMIT, HIGHER_CARD_LIMIT, LOWER_VARIANT_LIMIT
 
@@ -191,31 +191,72 @@ def update_state(dst: Ingredient, src: Ingredient, overwrite=False):
         dst.must_be_commander = dst.must_be_commander or src.must_be_commander
 
 
-def apply_replacements(
+REPLACEMENT_REGEX = re.compile(r'\[\[(?P<key>.+?)\]\]')
+
+
+def card_replacement_name(data: Data, card_id: cardid) -> str:
+    name = data.card_to_replacement_name.get(card_id)
+    if name is None:
+        c = data.id_to_card[card_id]
+        if ',' in c.name and '//' not in c.name and c.is_of_type(CardType.LEGENDARY) and c.is_of_type(CardType.CREATURE):
+            name = c.name.split(',', 2)[0]
+        else:
+            name = c.name
+        data.card_to_replacement_name[card_id] = name
+    return name
+
+
+def replacement_applies(data: Data, feature: FeatureWithAttributes, included_combos: frozenset[int]) -> bool:
+    key = (included_combos, feature.feature.id, feature.attributes)
+    result = data.combos_feature_attributes_to_replacement_applies.get(key)
+    if result is None:
+        needed_features_by_feature = data.combos_to_needed_features_by_feature.get(included_combos)
+        if needed_features_by_feature is None:
+            needed_features_by_feature = defaultdict[int, list[FeatureNeededInCombo]](list)
+            for included_combo_id in included_combos:
+                for feature_needed in data.combo_to_needed_features[included_combo_id]:
+                    needed_features_by_feature[feature_needed.feature_id].append(feature_needed)
+            data.combos_to_needed_features_by_feature[included_combos] = needed_features_by_feature
+        corresponding_needed_features = needed_features_by_feature.get(feature.feature.id)
+        # if all combos needing that feature don't find a match with attributes the replacement is not applied
+        result = not corresponding_needed_features or any(
+            data.feature_needed_in_combo_to_attributes_matcher[corresponding_needed_feature.id].matches(feature.attributes)
+            for corresponding_needed_feature in corresponding_needed_features
+        )
+        data.combos_feature_attributes_to_replacement_applies[key] = result
+    return result
+
+
+def get_replacements_strings(
     data: Data,
-    text: str,
-    replacements: dict[FeatureWithAttributes, list[tuple[list[Card], list[Template]]]],
+    replacements: dict[FeatureWithAttributes, list[VariantRecipeDefinition]],
     included_combos: set[int],
-) -> str:
-    replacements_strings = defaultdict[str, list[str]](list)
-    features_needed_by_included_combos = [feature_needed for included_combo_id in included_combos for feature_needed in data.combo_to_needed_features[included_combo_id]]
+) -> dict[str, list[str]]:
+    replacements_strings = dict[str, list[str]]()
+    included_combos_key = frozenset(included_combos)
     for feature, replacement_list in replacements.items():
-        corresponding_needed_features = [feature_needed for feature_needed in features_needed_by_included_combos if feature_needed.feature_id == feature.feature.id]
-        if corresponding_needed_features and not any(data.feature_needed_in_combo_to_attributes_matcher[corresponding_needed_feature.id].matches(feature.attributes) for corresponding_needed_feature in corresponding_needed_features):
-            # if all combos needing that feature don't find a match with attributes the replacement is not applied
+        if not replacement_applies(data, feature, included_combos_key):
             continue
-        for cards, templates in replacement_list:
+        strings = replacements_strings.setdefault(feature.feature.name, [])
+        for recipe in replacement_list:
             names = [
-                c.name.split(',', 2)[0]
-                if ',' in c.name and '//' not in c.name and c.is_of_type(CardType.LEGENDARY) and c.is_of_type(CardType.CREATURE)
-                else c.name
-                for c in cards
+                card_replacement_name(data, i)
+                for i in recipe.card_ids
             ] + [
-                t.name
-                for t in templates
+                data.id_to_template[i].name
+                for i in recipe.template_ids
             ]
-            replacement = ' + '.join(names)
-            replacements_strings[feature.feature.name].append(replacement)
+            strings.append(' + '.join(names))
+    return replacements_strings
+
+
+def apply_replacements(
+    text: str,
+    replacements: dict[str, list[str]],
+) -> str:
+    if '[[' not in text:
+        return text
+    replacements_strings = defaultdict[str, list[str]](list, {key: strings.copy() for key, strings in replacements.items()})
 
     def replacement_alias_strategy(key: str) -> list[str]:
         alias = ''
@@ -257,8 +298,7 @@ def apply_replacements(
             replacements_strings[alias].append(result)
         return result
 
-    return re.sub(
-        r'\[\[(?P<key>.+?)\]\]',
+    return REPLACEMENT_REGEX.sub(
         lambda m: replacement_with_fallback(m.group('key'), m.group(0)),
         text,
     )
@@ -323,19 +363,13 @@ def restore_variant(
         # update the variant status
         variant.status = Variant.Status.NEW
         # re-generate the text fields
-        replacements = {
-            feature_wth_attributes: [
-                ([data.id_to_card[i] for i in recipe.card_ids], [data.id_to_template[i] for i in recipe.template_ids])
-                for recipe in recipes
-            ]
-            for feature_wth_attributes, recipes in variant_def.feature_replacements.items()
-        }
-        variant.easy_prerequisites = apply_replacements(data, '\n'.join(c.easy_prerequisites for c in combos_included_for_a_reason if len(c.easy_prerequisites) > 0), replacements, variant_def.needed_combos)
-        variant.notable_prerequisites = apply_replacements(data, '\n'.join(c.notable_prerequisites for c in combos_included_for_a_reason if len(c.notable_prerequisites) > 0), replacements, variant_def.needed_combos)
-        variant.mana_needed = apply_replacements(data, ' '.join(c.mana_needed for c in combos_included_for_a_reason if len(c.mana_needed) > 0), replacements, variant_def.needed_combos)
-        variant.description = apply_replacements(data, '\n'.join(c.description for c in combos_included_for_a_reason if len(c.description) > 0), replacements, variant_def.needed_combos)
-        variant.notes = apply_replacements(data, '\n'.join(c.notes for c in combos_included_for_a_reason if len(c.notes) > 0), replacements, variant_def.needed_combos)
-        variant.comment = apply_replacements(data, '\n'.join(c.comment for c in combos_included_for_a_reason if len(c.comment) > 0), replacements, variant_def.needed_combos)
+        replacements = get_replacements_strings(data, variant_def.feature_replacements, variant_def.needed_combos)
+        variant.easy_prerequisites = apply_replacements('\n'.join(c.easy_prerequisites for c in combos_included_for_a_reason if len(c.easy_prerequisites) > 0), replacements)
+        variant.notable_prerequisites = apply_replacements('\n'.join(c.notable_prerequisites for c in combos_included_for_a_reason if len(c.notable_prerequisites) > 0), replacements)
+        variant.mana_needed = apply_replacements(' '.join(c.mana_needed for c in combos_included_for_a_reason if len(c.mana_needed) > 0), replacements)
+        variant.description = apply_replacements('\n'.join(c.description for c in combos_included_for_a_reason if len(c.description) > 0), replacements)
+        variant.notes = apply_replacements('\n'.join(c.notes for c in combos_included_for_a_reason if len(c.notes) > 0), replacements)
+        variant.comment = apply_replacements('\n'.join(c.comment for c in combos_included_for_a_reason if len(c.comment) > 0), replacements)
         for card_in_variant in used_cards:
             update_state_with_default(data, card_in_variant)
         for template_in_variant in required_templates:
@@ -357,9 +391,9 @@ def restore_variant(
                     if feature_of_card.notable_prerequisites:
                         additional_notable_prerequisites.append(feature_of_card.notable_prerequisites)
         if additional_easy_prerequisites:
-            variant.easy_prerequisites = apply_replacements(data, '\n'.join(additional_easy_prerequisites), replacements, variant_def.needed_combos) + '\n' + variant.easy_prerequisites
+            variant.easy_prerequisites = apply_replacements('\n'.join(additional_easy_prerequisites), replacements) + '\n' + variant.easy_prerequisites
         if additional_notable_prerequisites:
-            variant.notable_prerequisites = apply_replacements(data, '\n'.join(additional_notable_prerequisites), replacements, variant_def.needed_combos) + '\n' + variant.notable_prerequisites
+            variant.notable_prerequisites = apply_replacements('\n'.join(additional_notable_prerequisites), replacements) + '\n' + variant.notable_prerequisites
         card_zone_locations_overrides = defaultdict[int, defaultdict[str, int]](lambda: defaultdict(int))
         template_zone_locations_overrides = defaultdict[int, defaultdict[str, int]](lambda: defaultdict(int))
         for combo in combos_included_for_a_reason:
@@ -395,10 +429,10 @@ def restore_variant(
                                     for location in feature_in_combo.zone_locations_override:
                                         template_zone_locations_overrides[template][location] += 1
         for used_card in used_cards:
-            used_card.battlefield_card_state = apply_replacements(data, used_card.battlefield_card_state, replacements, variant_def.needed_combos)
-            used_card.exile_card_state = apply_replacements(data, used_card.exile_card_state, replacements, variant_def.needed_combos)
-            used_card.graveyard_card_state = apply_replacements(data, used_card.graveyard_card_state, replacements, variant_def.needed_combos)
-            used_card.library_card_state = apply_replacements(data, used_card.library_card_state, replacements, variant_def.needed_combos)
+            used_card.battlefield_card_state = apply_replacements(used_card.battlefield_card_state, replacements)
+            used_card.exile_card_state = apply_replacements(used_card.exile_card_state, replacements)
+            used_card.graveyard_card_state = apply_replacements(used_card.graveyard_card_state, replacements)
+            used_card.library_card_state = apply_replacements(used_card.library_card_state, replacements)
             override_score = max(card_zone_locations_overrides[used_card.card_id].values(), default=0)
             if override_score > 0:
                 used_card.zone_locations = ''.join(
@@ -407,10 +441,10 @@ def restore_variant(
                     if count == override_score
                 )
         for required_template in required_templates:
-            required_template.battlefield_card_state = apply_replacements(data, required_template.battlefield_card_state, replacements, variant_def.needed_combos)
-            required_template.exile_card_state = apply_replacements(data, required_template.exile_card_state, replacements, variant_def.needed_combos)
-            required_template.graveyard_card_state = apply_replacements(data, required_template.graveyard_card_state, replacements, variant_def.needed_combos)
-            required_template.library_card_state = apply_replacements(data, required_template.library_card_state, replacements, variant_def.needed_combos)
+            required_template.battlefield_card_state = apply_replacements(required_template.battlefield_card_state, replacements)
+            required_template.exile_card_state = apply_replacements(required_template.exile_card_state, replacements)
+            required_template.graveyard_card_state = apply_replacements(required_template.graveyard_card_state, replacements)
+            required_template.library_card_state = apply_replacements(required_template.library_card_state, replacements)
             override_score = max(template_zone_locations_overrides[required_template.template_id].values(), default=0)
             if override_score > 0:
                 required_template.zone_locations = ''.join(
@@ -527,7 +561,7 @@ BATCH_SIZE = 5000
 
 def perform_bulk_saves(data: Data, to_create: list[VariantBulkSaveItem], to_update: list[VariantBulkSaveItem]):
     Variant.objects.bulk_create([v.variant for v in to_create], batch_size=BATCH_SIZE)
-    update_fields = ['name', 'status', 'mana_needed', 'easy_prerequisites', 'notable_prerequisites', 'description', 'notes', 'comment', 'result_count', 'generated_by'] + Playable.playable_fields()
+    update_fields = ['name', 'status', 'mana_needed', 'easy_prerequisites', 'notable_prerequisites', 'description', 'notes', 'comment', 'result_count', 'generated_by'] + Playable.playable_fields() + Variant.bracket_fields()
     Variant.objects.bulk_update([v.variant for v in to_update if v.should_update], fields=update_fields, batch_size=BATCH_SIZE)
     CardInVariant.objects.bulk_create([c for v in to_create for c in v.uses], batch_size=BATCH_SIZE)
     update_fields = ['zone_locations', 'battlefield_card_state', 'exile_card_state', 'library_card_state', 'graveyard_card_state', 'must_be_commander', 'order', 'quantity']
@@ -7,4 +7,4 @@ from .variant_suggestions import VariantSuggestionViewSet
 from .variant_update_suggestions import VariantUpdateSuggestionViewSet
 from .variant_aliases import VariantAliasViewSet
 from .estimate_bracket import EstimateBracketView
-from .ai_deck_builder import ai_deck_builder
\ No newline at end of file
+from .ai_deck_builder import ai_build_deck as ai_deck_builder
\ No newline at end of file
@@ -1,4 +1,4 @@
-from django.db.models import QuerySet, Case, Value, When, Q, F
+from django.db.models import Model, QuerySet, Case, Value, When, Q, F, OrderBy
 from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
 from django.template import loader
 from rest_framework import filters
@@ -98,26 +98,25 @@ class OrderingFilterWithNullsLast(filters.OrderingFilter):
         ordering = self.get_ordering(request, queryset, view)
 
         if ordering:
-            ordering_with_nulls = []
-            for field in ordering:
-                if isinstance(field, str):
-                    field_name = field.lstrip('-')
-                    if field_name == '?':
-                        ordering_with_nulls.append('?')
-                        continue
-                    nulls_last = True
-                    try:
-                        if not queryset.model._meta.get_field(field_name).null:
-                            nulls_last = None
-                    except FieldDoesNotExist:
-                        pass
-                    f = F(field_name)
-                    if field.startswith('-'):
-                        f = f.desc(nulls_last=nulls_last)
-                    else:
-                        f = f.asc(nulls_last=nulls_last)
-                    ordering_with_nulls.append(f)
-                else:
-                    ordering_with_nulls.append(field)
+            ordering_with_nulls = [
+                self.ordering_with_nulls_last(queryset.model, field) if isinstance(field, str) else field
+                for field in ordering
+            ]
             return queryset.order_by(*ordering_with_nulls)
         return queryset
+
+    @staticmethod
+    def ordering_with_nulls_last(model: type[Model], field: str) -> str | OrderBy:
+        field_name = field.lstrip('-')
+        if field_name == '?':
+            return '?'
+        nulls_last = True
+        try:
+            if not model._meta.get_field(field_name).null:
+                nulls_last = None
+        except FieldDoesNotExist:
+            pass
+        f = F(field_name)
+        if field.startswith('-'):
+            return f.desc(nulls_last=nulls_last)
+        return f.asc(nulls_last=nulls_last)
@@ -1,12 +1,15 @@
-from django.db.models import QuerySet, F, Window
+from typing import Iterable, Sequence
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import QuerySet, F, Window, OrderBy, OuterRef, Subquery, Count
 from django.db.models.functions import FirstValue
 from django.http import HttpRequest
 from django.template import loader
 from rest_framework import viewsets, serializers, filters
 from django_filters.rest_framework import DjangoFilterBackend, FilterSet
-from django_filters.filters import CharFilter
+from django_filters.filters import CharFilter, BaseInFilter, NumberFilter
 from drf_spectacular.utils import extend_schema, inline_serializer
-from spellbook.models import Variant, PreSerializedSerializer
+from spellbook.models import Variant, CardInVariant, RepresentativeVariantSet, RepresentativeVariant, PreSerializedSerializer
 from spellbook.models.utils import remove_duplicates_in_order_by
 from spellbook.models.variant import DEFAULT_VIEW_ORDERING
 from spellbook.serializers import VariantSerializer
@@ -23,12 +26,45 @@ class VariantGroupedByComboFilter(filters.BaseFilterBackend):
     def filter_queryset(self, request: HttpRequest, queryset: QuerySet[Variant], view):
         group_by_params = self.get_current_value(request)
         if group_by_params in ('true', 'True', '1', ''):
+            if not self._is_narrowed(request, view):
+                key = self.representative_set_key(EditorOrOnlyPublicVariantsFilters.visible_statuses(request), self._order_by(queryset))
+                if key is not None and RepresentativeVariantSet.objects.filter(key=key, valid=True).exists():
+                    return queryset.filter(representative_of__representative_set_id=key)
             return self._filter_queryset(queryset)
         return queryset
 
-    def _filter_queryset(self, queryset: QuerySet[Variant]) -> QuerySet[Variant]:
+    @staticmethod
+    def _is_narrowed(request: HttpRequest, view) -> bool:
+        '''Whether the variants were filtered by anything other than their visibility.'''
+        if SpellbookQueryFilter().get_search_terms(request).strip():
+            return True
+        filterset_class = getattr(view, 'filterset_class', None)
+        if filterset_class is not None:
+            return any(request.query_params.get(name) for name in filterset_class.base_filters)  # type: ignore
+        return False
+
+    @staticmethod
+    def _order_by(queryset: QuerySet[Variant]) -> list[F | OrderBy]:
         order_by = queryset.query.order_by + DEFAULT_VIEW_ORDERING
-        order_by = list(remove_duplicates_in_order_by(order_by))
+        return list(remove_duplicates_in_order_by(order_by))
+
+    @staticmethod
+    def representative_set_key(statuses: Iterable[str], order_by: Sequence[F | OrderBy]) -> str | None:
+        ordering = []
+        for o in order_by:
+            if isinstance(o, F):
+                o = o.asc()
+            if not isinstance(o, OrderBy) or not isinstance(o.expression, F):
+                return None
+            nulls = ' nulls first' if o.nulls_first else ' nulls last' if o.nulls_last else ''
+            ordering.append(f'{"-" if o.descending else ""}{o.expression.name}{nulls}')
+        key = f'{",".join(statuses)}:{",".join(ordering)}'
+        if len(key) > RepresentativeVariantSet._meta.get_field('key').max_length:  # type: ignore
+            return None
+        return key
+
+    def _filter_queryset(self, queryset: QuerySet[Variant]) -> QuerySet[Variant]:
+        order_by = self._order_by(queryset)
         top_variants_for_each_combo = queryset.alias(
             top_variant=Window(
                 expression=FirstValue('pk'),
@@ -68,16 +104,36 @@ class VariantGroupedByComboFilter(filters.BaseFilterBackend):
 
 
 class EditorOrOnlyPublicVariantsFilters(filters.BaseFilterBackend):
-    def filter_queryset(self, request: HttpRequest, queryset: QuerySet[Variant], view):
+    @staticmethod
+    def visible_statuses(request: HttpRequest) -> tuple[str, ...]:
         if hasattr(request, 'user') and request.user.is_authenticated:
             user = request.user
             if user.has_perm('spellbook.change_variant'):  # type: ignore
-                return queryset.filter(status__in=Variant.public_statuses() + Variant.preview_statuses())
-        return queryset.filter(status__in=Variant.public_statuses())
+                return Variant.public_statuses() + Variant.preview_statuses()
+        return Variant.public_statuses()
+
+    def filter_queryset(self, request: HttpRequest, queryset: QuerySet[Variant], view):
+        return queryset.filter(status__in=self.visible_statuses(request))
+
+
+class NumberInFilter(BaseInFilter, NumberFilter):
+    pass
 
 
 class VariantFilterSet(FilterSet):
     variant = CharFilter(field_name='of__variants', label='Filters for variants of the same combos that generated the given variant id.', distinct=True)
+    cards = NumberInFilter(method='filter_cards', label='Filters for variants using any of the given comma separated card ids, ranked by how many of them they use.')
+
+    def filter_cards(self, queryset: QuerySet[Variant], name: str, value: list) -> QuerySet[Variant]:
+        card_ids = [int(card_id) for card_id in value]
+        if not card_ids:
+            return queryset
+        matching_uses = CardInVariant.objects.filter(card_id__in=card_ids)
+        matched_card_count = matching_uses.filter(variant=OuterRef('pk')).order_by().values('variant').annotate(count=Count('*')).values('count')
+        return queryset \
+            .filter(pk__in=matching_uses.values('variant_id')) \
+            .alias(matched_card_count=Subquery(matched_card_count)) \
+            .order_by(F('matched_card_count').desc(), *queryset.query.order_by)
 
 
 @extend_schema(responses={
@@ -109,3 +165,40 @@ class VariantViewSet(viewsets.ReadOnlyModelViewSet):
         'updated',
         '?'
     ]
+
+
+def refresh_representative_variants():
+    '''
+    Recomputes the first variant of each generator combo for every visibility and every
+    single-field ordering supported by the variants view, so that grouping by combo
+    can be answered with a join instead of a window function.
+    '''
+    grouping_filter = VariantGroupedByComboFilter()
+    orderings: list[Sequence[str | F | OrderBy]] = [DEFAULT_VIEW_ORDERING] + [
+        [OrderingFilterWithNullsLast.ordering_with_nulls_last(Variant, prefix + field)]
+        for field in VariantViewSet.ordering_fields
+        if field != '?'
+        for prefix in ('', '-')
+    ]
+    refreshed_keys = set[str]()
+    for statuses in (Variant.public_statuses(), Variant.public_statuses() + Variant.preview_statuses()):
+        visible_variants = VariantViewSet.queryset.filter(status__in=statuses)
+        for ordering in orderings:
+            queryset = visible_variants.order_by(*ordering)
+            key = grouping_filter.representative_set_key(statuses, grouping_filter._order_by(queryset))
+            if key is None or key in refreshed_keys:
+                continue
+            refreshed_keys.add(key)
+            with transaction.atomic():
+                representative_set, _ = RepresentativeVariantSet.objects.update_or_create(key=key, defaults={'valid': False})
+                representative_set.variants.all().delete()
+                RepresentativeVariant.objects.bulk_create(
+                    RepresentativeVariant(representative_set=representative_set, variant_id=variant_id)
+                    for variant_id in grouping_filter._filter_queryset(queryset).values_list('pk', flat=True)
+                )
+                # Variants changed while the set was computed leave it invalid until the next refresh
+                RepresentativeVariantSet.objects.filter(
+                    key=key,
+                    generation=representative_set.generation,
+                ).update(valid=True, refreshed=timezone.now())
+    RepresentativeVariantSet.objects.exclude(key__in=refreshed_keys).delete()
@@ -0,0 +1,119 @@
+import hashlib
+import threading
+from dataclasses import dataclass
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from .useragent import FAKE_USERAGENT
+
+
+@dataclass(frozen=True)
+class HostPolicy:
+    connect_timeout: float = 3.05
+    read_timeout: float = 10.0
+    max_connections: int = 4
+    queue_timeout: float = 5.0
+
+
+DEFAULT_HOST_POLICY = HostPolicy()
+
+HOST_POLICIES: dict[str, HostPolicy] = {
+    'api.moxfield.com': HostPolicy(read_timeout=10.0, max_connections=4),
+    'archidekt.com': HostPolicy(read_timeout=10.0, max_connections=4),
+    'deckstats.net': HostPolicy(read_timeout=10.0, max_connections=2),
+    'tappedout.net': HostPolicy(read_timeout=15.0, max_connections=2),
+    'api.scryfall.com': HostPolicy(read_timeout=10.0, max_connections=4),
+}
+
+RESPONSE_CACHE_KEY_PREFIX = 'website:response:'
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+_host_semaphores: dict[str, threading.BoundedSemaphore] = {}
+_host_semaphores_lock = threading.Lock()
+
+
+def host_policy(hostname: str) -> HostPolicy:
+    return HOST_POLICIES.get(hostname, DEFAULT_HOST_POLICY)
+
+
+def session() -> requests.Session:
+    '''Returns the process-wide session, which keeps connections to the websites alive between requests.'''
+    global _session
+    with _session_lock:
+        if _session is None:
+            adapter = HTTPAdapter(
+                pool_connections=len(HOST_POLICIES) + 1,
+                pool_maxsize=max(policy.max_connections for policy in [DEFAULT_HOST_POLICY, *HOST_POLICIES.values()]),
+                max_retries=0,
+            )
+            _session = requests.Session()
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+
+def host_semaphore(hostname: str) -> threading.BoundedSemaphore:
+    with _host_semaphores_lock:
+        semaphore = _host_semaphores.get(hostname)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(host_policy(hostname).max_connections)
+            _host_semaphores[hostname] = semaphore
+        return semaphore
+
+
+def cache_key(prefix: str, value: str) -> str:
+    return prefix + hashlib.sha256(value.encode()).hexdigest()
+
+
+def fetch(url: str, accept: str, user_agent: str | None = None) -> bytes | None:
+    '''
+    Fetches the body of the given url, or None if the resource does not exist.
+    Responses carrying an ETag or a Last-Modified header are stored and revalidated with a conditional request,
+    so that unchanged resources are not downloaded again.
+    Raises a ValidationError if the website is unreachable, too slow or answers with an error.
+    '''
+    hostname = (urlparse(url).hostname or '').lower()
+    policy = host_policy(hostname)
+    key = cache_key(RESPONSE_CACHE_KEY_PREFIX, url)
+    cached: dict | None = cache.get(key)
+    headers = {
+        'Accept': accept,
+        'User-Agent': user_agent or FAKE_USERAGENT,
+    }
+    if cached is not None:
+        if cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached['last_modified']:
+            headers['If-Modified-Since'] = cached['last_modified']
+    semaphore = host_semaphore(hostname)
+    if not semaphore.acquire(timeout=policy.queue_timeout):
+        raise ValidationError('The website is busy, try again later')
+    try:
+        response = session().get(url, headers=headers, timeout=(policy.connect_timeout, policy.read_timeout))
+    except requests.Timeout:
+        raise ValidationError('The website took too long to respond')
+    except requests.RequestException:
+        raise ValidationError('Could not reach the website')
+    finally:
+        semaphore.release()
+    if response.status_code == 304 and cached is not None:
+        cache.touch(key, settings.DECK_IMPORT_REVALIDATION_TIMEOUT)
+        return cached['body']
+    if response.status_code == 404:
+        cache.delete(key)
+        return None
+    if response.status_code != 200:
+        raise ValidationError('Error response from the website')
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if etag or last_modified:
+        cache.set(key, {
+            'body': response.content,
+            'etag': etag,
+            'last_modified': last_modified,
+        }, settings.DECK_IMPORT_REVALIDATION_TIMEOUT)
+    return response.content
@@ -1,21 +1,13 @@
 import json
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError
 from django.core.exceptions import ValidationError
-from .useragent import FAKE_USERAGENT
+from .http_client import fetch
 
 
 def get(url: str, user_agent: str | None = None) -> dict | None:
-    req = Request(url)
-    req.add_header('Accept', 'application/json')
-    req.add_header('User-Agent', user_agent or FAKE_USERAGENT)
+    body = fetch(url, 'application/json', user_agent)
+    if body is None:
+        return None
     try:
-        with urlopen(req) as res:
-            data = json.load(res)
-            return data
-    except HTTPError as e:
-        if e.code == 404:
-            return None
-        raise ValidationError('Error response from the website')
-    except json.JSONDecodeError:
-        ValidationError('Invalid response from the website')
+        return json.loads(body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise ValidationError('Invalid response from the website')
@@ -0,0 +1,144 @@
+import csv
+import hashlib
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class DeckWebsiteFixtureServer:
+    '''
+    A local HTTP server standing in for a deckbuilding website API.
+    It serves fixed documents by path, honours conditional requests through ETags
+    and records every request it receives, so that deck imports can be tested offline.
+    '''
+
+    def __init__(self, routes: dict[str, tuple[str, bytes]], delay: float = 0.0):
+        self.routes = routes
+        self.delay = delay
+        self.requests: list[tuple[str, int]] = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if server.delay:
+                    time.sleep(server.delay)
+                route = server.routes.get(self.path)
+                headers = {}
+                body = b''
+                if route is None:
+                    status = 404
+                else:
+                    content_type, document = route
+                    etag = f'"{hashlib.sha256(document).hexdigest()}"'
+                    headers['ETag'] = etag
+                    if self.headers.get('If-None-Match') == etag:
+                        status = 304
+                    else:
+                        status = 200
+                        headers['Content-Type'] = content_type
+                        headers['Content-Length'] = str(len(document))
+                        body = document
+                # Recorded before answering, since the client may check the requests as soon as it has its response
+                server.requests.append((self.path, status))
+                try:
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up waiting, as in slow website tests
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+
+def json_route(data: object) -> tuple[str, bytes]:
+    return 'application/json', json.dumps(data).encode()
+
+
+def csv_route(rows: list[list[str]]) -> tuple[str, bytes]:
+    output = io.StringIO()
+    csv.writer(output).writerows(rows)
+    return 'text/csv', output.getvalue().encode()
+
+
+MOXFIELD_DECK = json_route({
+    'mainboard': {
+        'Sol Ring': {'quantity': 1},
+        'Island': {'quantity': 2},
+    },
+    'commanders': {
+        'Bruvac, the Grandiloquent': {'quantity': 1},
+    },
+})
+
+ARCHIDEKT_DECK = json_route({
+    'cards': [
+        {'quantity': 1, 'categories': ['Ramp'], 'card': {'oracleCard': {'name': 'Sol Ring'}}},
+        {'quantity': 2, 'categories': None, 'card': {'oracleCard': {'name': 'Island'}}},
+        {'quantity': 1, 'categories': ['Maybeboard'], 'card': {'oracleCard': {'name': 'Mana Crypt'}}},
+        {'quantity': 1, 'categories': ['Commander'], 'card': {'oracleCard': {'name': 'Bruvac, the Grandiloquent'}}},
+    ],
+})
+
+DECKSTATS_DECK = json_route({
+    'sections': [
+        {'name': 'Commander', 'cards': [
+            {'name': 'Bruvac, the Grandiloquent', 'amount': 1, 'valid': True},
+        ]},
+        {'name': 'Main', 'cards': [
+            {'name': 'Sol Ring', 'amount': None, 'valid': True},
+            {'name': 'Island', 'amount': 2, 'valid': True},
+            {'name': 'Not A Card', 'amount': 1, 'valid': False},
+        ]},
+    ],
+})
+
+TAPPEDOUT_DECK = csv_route([
+    ['Board', 'Qty', 'Name', 'Commander'],
+    ['main', '1', 'Sol Ring', 'False'],
+    ['main', '2', 'Island', 'False'],
+    ['main', '1', 'Bruvac, the Grandiloquent', 'True'],
+    ['side', '1', 'Mana Crypt', 'False'],
+])
+
+SCRYFALL_DECK = json_route({
+    'entries': {
+        'commanders': [
+            {'count': 1, 'card_digest': {'name': 'Bruvac, the Grandiloquent'}},
+        ],
+        'nonlands': [
+            {'count': 1, 'card_digest': {'name': 'Sol Ring'}},
+            {'count': 1, 'card_digest': None},
+        ],
+        'lands': [
+            {'count': 2, 'card_digest': {'name': 'Island'}},
+        ],
+    },
+})
+
+EXPECTED_DECK = {
+    'main': [{'card': 'Sol Ring', 'quantity': 1}, {'card': 'Island', 'quantity': 2}],
+    'commanders': [{'card': 'Bruvac, the Grandiloquent', 'quantity': 1}],
+}
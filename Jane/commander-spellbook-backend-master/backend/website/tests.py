@@ -1,4 +1,6 @@
 import json
+from unittest.mock import patch
+from django.core.cache import cache
 from django.test import TestCase
 from rest_framework import status
 from common.abstractions import Deck
@@ -6,6 +8,9 @@ from common.inspection import json_to_python_lambda
 from common.serializers import MAX_DECKLIST_LINES
 from common.testing import TestCaseMixin
 from .models import PROPERTY_KEYS
+from .services import http_client
+from .services.http_client import HostPolicy
+from .testing import DeckWebsiteFixtureServer, MOXFIELD_DECK, ARCHIDEKT_DECK, DECKSTATS_DECK, TAPPEDOUT_DECK, SCRYFALL_DECK, EXPECTED_DECK
 
 
 class WebsitePropertiesViewTests(TestCaseMixin, TestCase):
@@ -57,3 +62,87 @@ class CardListFromTextTests(TestCase):
         self.assertEqual(len(result.main), 1)
         self.assertEqual(result.main[0].card, 'Sol Ring')
         self.assertEqual(result.main[0].quantity, 3)
+
+
+class CardListFromUrlTests(TestCase):
+    providers = [
+        ('https://www.moxfield.com/decks/abc-123', 'website.services.moxfield.moxfield_id_to_api', '/moxfield/abc-123', MOXFIELD_DECK),
+        ('https://archidekt.com/decks/123/my-deck', 'website.services.archidekt.archidekt_id_to_api', '/archidekt/123', ARCHIDEKT_DECK),
+        ('https://deckstats.net/decks/1/2-my-deck', 'website.services.deckstats.deckstats_to_api', '/deckstats/1/2', DECKSTATS_DECK),
+        ('https://tappedout.net/mtg-decks/my-deck/', 'website.services.tappedout.tappedout_id_to_api', '/tappedout/my-deck', TAPPEDOUT_DECK),
+        ('https://scryfall.com/@user/decks/abc-123', 'website.services.scryfall.scryfall_id_to_api', '/scryfall/abc-123', SCRYFALL_DECK),
+    ]
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def _redirect(self, target: str, server: DeckWebsiteFixtureServer, path: str):
+        return patch(target, lambda *args: server.base_url + path)
+
+    def test_invalid_url(self):
+        for endpoint in ('/card-list-from-url', '/card-list-from-url-async'):
+            response = self.client.get(endpoint, data={'url': 'not a url'})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(json.loads(response.content)['detail'], 'Invalid URL')
+            response = self.client.get(endpoint, data={'url': 'https://example.com/decks/1'})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(json.loads(response.content)['detail'], 'Unsupported website')
+
+    def test_providers(self):
+        for url, target, path, route in self.providers:
+            with self.subTest(url=url), DeckWebsiteFixtureServer({path: route}) as server, self._redirect(target, server, path):
+                response = self.client.get('/card-list-from-url', data={'url': url})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(json.loads(response.content), EXPECTED_DECK)
+                self.assertEqual(server.requests, [(path, 200)])
+
+    def test_async_view(self):
+        url, target, path, route = self.providers[0]
+        with DeckWebsiteFixtureServer({path: route}) as server, self._redirect(target, server, path):
+            response = self.client.get('/card-list-from-url-async', data={'url': url})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.get('Content-Type'), 'application/json')
+            self.assertEqual(json.loads(response.content), EXPECTED_DECK)
+            self.assertEqual(self.client.post('/card-list-from-url-async', data={'url': url}).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_missing_deck(self):
+        url, target, path, _ = self.providers[0]
+        with DeckWebsiteFixtureServer({}) as server, self._redirect(target, server, path):
+            response = self.client.get('/card-list-from-url', data={'url': url})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(json.loads(response.content)['detail'], 'Decklist not available')
+            self.assertEqual(server.requests, [(path, 404)])
+
+    def test_cache_by_normalized_url(self):
+        url, target, path, route = self.providers[0]
+        with DeckWebsiteFixtureServer({path: route}) as server, self._redirect(target, server, path):
+            for variant in (url, url + '/', url.replace('www.', '') + '?tab=main', url.replace('moxfield', 'MOXFIELD')):
+                response = self.client.get('/card-list-from-url', data={'url': variant})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(json.loads(response.content), EXPECTED_DECK)
+            response = self.client.get('/card-list-from-url-async', data={'url': url})
+            self.assertEqual(json.loads(response.content), EXPECTED_DECK)
+            self.assertEqual(server.requests, [(path, 200)])
+
+    def test_conditional_revalidation(self):
+        url, target, path, route = self.providers[0]
+        with DeckWebsiteFixtureServer({path: route}) as server, self._redirect(target, server, path):
+            with self.settings(DECK_IMPORT_CACHE_TIMEOUT=0):
+                for _ in range(2):
+                    response = self.client.get('/card-list-from-url', data={'url': url})
+                    self.assertEqual(response.status_code, status.HTTP_200_OK)
+                    self.assertEqual(json.loads(response.content), EXPECTED_DECK)
+                self.assertEqual(server.requests, [(path, 200), (path, 304)])
+                server.routes[path] = 'application/json', MOXFIELD_DECK[1].replace(b'"Island"', b'"Forest"')
+                response = self.client.get('/card-list-from-url', data={'url': url})
+                self.assertEqual(json.loads(response.content)['main'][1]['card'], 'Forest')
+                self.assertEqual(server.requests[-1], (path, 200))
+
+    def test_slow_website(self):
+        url, target, path, route = self.providers[0]
+        with DeckWebsiteFixtureServer({path: route}, delay=0.5) as server, self._redirect(target, server, path):
+            with patch.object(http_client, 'DEFAULT_HOST_POLICY', HostPolicy(read_timeout=0.1)):
+                response = self.client.get('/card-list-from-url', data={'url': url})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn('The website took too long to respond', json.loads(response.content)['detail'])
@@ -1,6 +1,11 @@
 from urllib.parse import urlparse
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
 from django.core.validators import URLValidator
 from django.core.exceptions import ValidationError
+from django.http import HttpRequest, JsonResponse
+from django.views.decorators.http import require_GET
 from rest_framework import viewsets, serializers, parsers, status
 from rest_framework.decorators import api_view, permission_classes, parser_classes
 from rest_framework.response import Response
@@ -16,6 +21,7 @@ from .services.archidekt import archidekt, ARCHIDEKT_HOSTNAME
 from .services.deckstats import deckstats, DECKSTATS_HOSTNAME
 from .services.tappedout import tappedout, TAPPEDOUT_HOSTNAME
 from .services.scryfall import scryfall, SCRYFALL_HOSTNAME
+from .services.http_client import cache_key
 
 
 class WebsitePropertyViewSet(viewsets.ReadOnlyModelViewSet):
@@ -56,6 +62,38 @@ class SomethingWentWrong(APIException):
     default_code = 'something_went_wrong'
 
 
+DECK_CACHE_KEY_PREFIX = 'website:deck:'
+
+
+def normalize_deck_url(url: str) -> str:
+    parsed_url = urlparse(url)
+    hostname = (parsed_url.hostname or '').lower().removeprefix('www.')
+    return f'{hostname}{parsed_url.path.rstrip("/")}'
+
+
+def deck_from_url(url: str) -> Deck:
+    try:
+        URLValidator()(url)
+    except ValidationError:
+        raise InvalidUrl()
+    parsed_url = urlparse(url)
+    hostname = (parsed_url.hostname or '').lower().removeprefix('www.')
+    if hostname not in SUPPORTED_DECKBUILDING_WEBSITES:
+        raise UnsupportedWebsite()
+    key = cache_key(DECK_CACHE_KEY_PREFIX, normalize_deck_url(url))
+    deck: Deck | None = cache.get(key)
+    if deck is not None:
+        return deck
+    try:
+        deck = SUPPORTED_DECKBUILDING_WEBSITES[hostname](url)
+        if deck is None:
+            raise DecklistNotAvailable()
+    except ValidationError as e:
+        raise SomethingWentWrong(detail=str(e))
+    cache.set(key, deck, settings.DECK_IMPORT_CACHE_TIMEOUT)
+    return deck
+
+
 @extend_schema(
     parameters=[OpenApiParameter(name='url', type=str)],
     responses={
@@ -71,24 +109,20 @@ class SomethingWentWrong(APIException):
 @api_view(['GET'])
 @permission_classes([])
 def card_list_from_url(request: Request) -> Response:
-    url = request.query_params.get('url', '')
-    try:
-        URLValidator()(url)
-    except ValidationError:
-        raise InvalidUrl()
-    parsed_url = urlparse(url)
-    hostname = (parsed_url.hostname or '').lower().removeprefix('www.')
-    if hostname not in SUPPORTED_DECKBUILDING_WEBSITES:
-        raise UnsupportedWebsite()
-    try:
-        deck = SUPPORTED_DECKBUILDING_WEBSITES[hostname](url)
-        if deck is None:
-            raise DecklistNotAvailable()
-    except ValidationError as e:
-        raise SomethingWentWrong(detail=str(e))
+    deck = deck_from_url(request.query_params.get('url', ''))
     return Response(DeckSerializer(deck).data)
 
 
+@require_GET
+async def card_list_from_url_async(request: HttpRequest) -> JsonResponse:
+    '''Same as card_list_from_url, but waits for the website without holding a worker when served through ASGI.'''
+    try:
+        deck = await sync_to_async(deck_from_url, thread_sensitive=False)(request.GET.get('url', ''))
+    except APIException as e:
+        return JsonResponse({'detail': e.detail}, status=e.status_code)
+    return JsonResponse(DeckSerializer(deck).data)
+
+
 class PlainTextDeckListParser(parsers.BaseParser):
     media_type = 'text/plain'
 
@@ -0,0 +1,215 @@
+"""
+Background analysis jobs
+Analyses are submitted to a bounded pool of workers and answered with their id
+at once; clients then poll or stream each job's progress stage by stage and
+fetch its result when it is done, and a submission identical to one still queued
+or running joins that job instead of starting another
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+FINISHED = (COMPLETED, FAILED)
+
+
+class JobQueueFull(Exception):
+    """Raised when a job cannot be queued, with a retry hint in seconds"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("analysis queue is full")
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+def job_key(kind: str, request: Dict[str, Any]) -> str:
+    material = json.dumps([kind, request], sort_keys=True, default=str)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+@asynccontextmanager
+async def untracked_stage(name: str):
+    """Stage reporting for analyses that run outside a job"""
+    yield
+
+
+class AnalysisJob:
+    """One submitted analysis, its progress through named stages, and its outcome"""
+
+    def __init__(self, kind: str, key: str, run: Callable[["AnalysisJob"], Awaitable[Dict[str, Any]]], clock: Callable[[], float]):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.key = key
+        self.status = QUEUED
+        self.stages: List[Dict[str, Any]] = []
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self._run = run
+        self._clock = clock
+        self.submitted_at = clock()
+        self.finished_at: Optional[float] = None
+        self._version = 0
+        self._changed = asyncio.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    async def _update(self, **changes):
+        for name, value in changes.items():
+            setattr(self, name, value)
+        async with self._changed:
+            self._version += 1
+            self._changed.notify_all()
+
+    @asynccontextmanager
+    async def stage(self, name: str):
+        """Report a stage of the analysis as running, then completed or failed"""
+        stage = {"name": name, "status": RUNNING, "seconds": None}
+        started = self._clock()
+        self.stages.append(stage)
+        await self._update()
+        try:
+            yield
+        except BaseException:
+            stage.update(status=FAILED, seconds=round(self._clock() - started, 3))
+            await self._update()
+            raise
+        stage.update(status=COMPLETED, seconds=round(self._clock() - started, 3))
+        await self._update()
+
+    async def execute(self):
+        await self._update(status=RUNNING)
+        try:
+            result = await self._run(self)
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e) or type(e).__name__
+            await self._update(status=FAILED, error=str(detail), finished_at=self._clock())
+        else:
+            await self._update(status=COMPLETED, result=result, finished_at=self._clock())
+
+    def snapshot(self, include_result: bool = True) -> Dict[str, Any]:
+        snapshot = {
+            "analysis_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stages": [dict(stage) for stage in self.stages],
+            "error": self.error,
+        }
+        if include_result and self.status == COMPLETED:
+            snapshot["result"] = self.result
+        return snapshot
+
+    async def wait(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.finished)
+
+    async def events(self) -> AsyncIterator[Dict[str, Any]]:
+        """Yield a snapshot now and after every change, until the job finishes"""
+        seen = -1
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self._version != seen)
+                seen = self._version
+            yield self.snapshot()
+            if self.finished:
+                return
+
+
+class AnalysisJobQueue:
+    """Runs jobs on at most max_workers workers, keeping the latest max_stored_jobs
+
+    At most max_queued jobs wait for a worker; finished jobs are forgotten oldest
+    first once more than max_stored_jobs are kept.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_queued: int = 100,
+        max_stored_jobs: int = 1000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_workers = max(max_workers, 1)
+        self.max_queued = max(max_queued, 0)
+        self.max_stored_jobs = max_stored_jobs
+        self._clock = clock
+        self._queue: "asyncio.Queue[AnalysisJob]" = asyncio.Queue()
+        self._jobs: "OrderedDict[str, AnalysisJob]" = OrderedDict()
+        self._active: Dict[str, AnalysisJob] = {}
+        self._workers: List[asyncio.Task] = []
+        self._job_seconds: Optional[float] = None
+        self.deduplicated = 0
+        self.rejected = 0
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.ensure_future(self._work()) for _ in range(self.max_workers)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, kind: str, request: Dict[str, Any], run: Callable[[AnalysisJob], Awaitable[Dict[str, Any]]]) -> AnalysisJob:
+        """Queue an analysis, or return the queued or running job for the same request"""
+        key = job_key(kind, request)
+        active = self._active.get(key)
+        if active is not None:
+            self.deduplicated += 1
+            return active
+        if self._queue.qsize() >= self.max_queued:
+            self.rejected += 1
+            raise JobQueueFull(self._estimated_wait())
+        job = AnalysisJob(kind, key, run, self._clock)
+        self._active[key] = job
+        self._jobs[job.id] = job
+        self._forget_finished()
+        self._queue.put_nowait(job)
+        self.start()
+        return job
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        return self._jobs.get(job_id)
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            started = self._clock()
+            try:
+                await job.execute()
+            finally:
+                self._active.pop(job.key, None)
+                self._queue.task_done()
+                seconds = self._clock() - started
+                self._job_seconds = seconds if self._job_seconds is None else 0.8 * self._job_seconds + 0.2 * seconds
+
+    def _estimated_wait(self) -> float:
+        return (self._job_seconds or 1.0) * (self._queue.qsize() + 1) / self.max_workers
+
+    def _forget_finished(self):
+        excess = len(self._jobs) - self.max_stored_jobs
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished][:max(excess, 0)]:
+            del self._jobs[job_id]
+
+    def metrics(self) -> dict:
+        statuses = [job.status for job in self._jobs.values()]
+        return {
+            "workers": self.max_workers,
+            "queued": self._queue.qsize(),
+            "running": statuses.count(RUNNING),
+            "stored": len(self._jobs),
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,364 @@
+"""
+Source code parsing with Tree-sitter
+Grammars vendored into the image are compiled into one library, every worker
+process of a pool keeps its own parser per language, and parse results are
+cached on a hash of the source, giving function, class, import and cyclomatic
+complexity metrics from syntax trees rather than text patterns
+"""
+
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+try:
+    from tree_sitter import Language, Parser
+except ImportError:
+    Language = Parser = None
+
+GRAMMARS_DIR = os.getenv("TREE_SITTER_GRAMMARS_DIR", "/opt/tree-sitter/grammars")
+LIBRARY_PATH = os.getenv("TREE_SITTER_LIBRARY", "/opt/tree-sitter/languages.so")
+
+# Grammar name -> source directory below GRAMMARS_DIR
+GRAMMAR_SOURCES = {
+    "python": "tree-sitter-python",
+    "go": "tree-sitter-go",
+    "javascript": "tree-sitter-javascript",
+    "typescript": "tree-sitter-typescript/typescript",
+    "c": "tree-sitter-c",
+    "cpp": "tree-sitter-cpp",
+    "rust": "tree-sitter-rust",
+}
+
+EXTENSION_GRAMMARS = {
+    ".py": "python",
+    ".go": "go",
+    ".js": "javascript",
+    ".ts": "typescript",
+    ".c": "c",
+    ".h": "c",
+    ".cpp": "cpp",
+    ".hpp": "cpp",
+    ".cc": "cpp",
+    ".cxx": "cpp",
+    ".rs": "rust",
+}
+
+FUNCTION_NODES = {
+    "python": {"function_definition", "lambda"},
+    "go": {"function_declaration", "method_declaration", "func_literal"},
+    "javascript": {"function_declaration", "function", "function_expression", "arrow_function", "method_definition", "generator_function_declaration", "generator_function"},
+    "c": {"function_definition"},
+    "cpp": {"function_definition", "lambda_expression"},
+    "rust": {"function_item", "closure_expression"},
+}
+FUNCTION_NODES["typescript"] = FUNCTION_NODES["javascript"]
+
+CLASS_NODES = {
+    "python": {"class_definition"},
+    "go": {"type_spec"},
+    "javascript": {"class_declaration", "class"},
+    "typescript": {"class_declaration", "class", "abstract_class_declaration", "interface_declaration"},
+    "c": {"struct_specifier"},
+    "cpp": {"class_specifier", "struct_specifier"},
+    "rust": {"struct_item", "enum_item", "trait_item"},
+}
+
+# Nodes that add a path through the code, for cyclomatic complexity
+DECISION_NODES = {
+    "python": {"if_statement", "elif_clause", "for_statement", "while_statement", "except_clause", "conditional_expression", "boolean_operator", "for_in_clause", "if_clause", "case_clause"},
+    "go": {"if_statement", "for_statement", "expression_case", "type_case", "communication_case"},
+    "javascript": {"if_statement", "for_statement", "for_in_statement", "while_statement", "do_statement", "switch_case", "catch_clause", "ternary_expression"},
+    "c": {"if_statement", "for_statement", "while_statement", "do_statement", "case_statement", "conditional_expression"},
+    "cpp": {"if_statement", "for_statement", "for_range_loop", "while_statement", "do_statement", "case_statement", "conditional_expression", "catch_clause"},
+    "rust": {"if_expression", "while_expression", "for_expression", "match_arm", "try_expression"},
+}
+DECISION_NODES["typescript"] = DECISION_NODES["javascript"]
+
+IMPORT_NODES = {
+    "python": {"import_statement", "import_from_statement"},
+    "go": {"import_spec"},
+    "javascript": {"import_statement"},
+    "typescript": {"import_statement"},
+    "c": {"preproc_include"},
+    "cpp": {"preproc_include", "using_declaration"},
+    "rust": {"use_declaration"},
+}
+
+SHORT_CIRCUIT_OPERATORS = {"&&", "||", "??"}
+NAME_NODES = {"identifier", "field_identifier", "type_identifier", "property_identifier", "qualified_identifier", "destructor_name", "operator_name"}
+
+
+def build_library(grammars_dir: str = GRAMMARS_DIR, library_path: str = LIBRARY_PATH) -> List[str]:
+    """Compile every vendored grammar into one shared library, returning the languages built"""
+    sources = {name: Path(grammars_dir) / directory for name, directory in GRAMMAR_SOURCES.items()}
+    available = {name: path for name, path in sources.items() if (path / "src" / "parser.c").exists()}
+    for name in sorted(set(sources) - set(available)):
+        logger.warning(f"No vendored grammar for {name} in {sources[name]}")
+    if available:
+        Language.build_library(library_path, [str(path) for path in available.values()])
+    return sorted(available)
+
+
+def _text(node) -> str:
+    return node.text.decode("utf-8", errors="replace") if node.text is not None else ""
+
+
+def _name(node) -> str:
+    """The declared name of a function or class node, following C declarators"""
+    name = node.child_by_field_name("name")
+    if name is not None:
+        return _text(name)
+    declarator = node.child_by_field_name("declarator")
+    while declarator is not None and declarator.type not in NAME_NODES:
+        declarator = declarator.child_by_field_name("declarator")
+    if declarator is not None:
+        return _text(declarator)
+    # Anonymous functions assigned to a variable take its name
+    parent = node.parent
+    if parent is not None and parent.type in ("variable_declarator", "assignment", "pair"):
+        target = parent.child_by_field_name("name") or parent.child_by_field_name("left") or parent.child_by_field_name("key")
+        if target is not None:
+            return _text(target)
+    return "<anonymous>"
+
+
+def _is_class(node, language: str) -> bool:
+    if language == "go":
+        return node.child_by_field_name("type") is not None and node.child_by_field_name("type").type in ("struct_type", "interface_type")
+    if node.type in ("struct_specifier", "class_specifier"):
+        # Only definitions, not declarations or every mention of struct foo
+        return node.child_by_field_name("body") is not None
+    return True
+
+
+def _is_decision(node, language: str) -> bool:
+    if node.type in DECISION_NODES[language]:
+        return True
+    if node.type == "binary_expression":
+        operator = node.child_by_field_name("operator")
+        return operator is not None and operator.type in SHORT_CIRCUIT_OPERATORS
+    return False
+
+
+def tree_metrics(root, language: str) -> Dict[str, Any]:
+    """Functions with their cyclomatic complexity, classes and imports of a syntax tree"""
+    functions: List[Dict[str, Any]] = []
+    classes: List[Dict[str, Any]] = []
+    imports: List[str] = []
+    module = {"complexity": 1}
+    function_nodes = FUNCTION_NODES[language]
+    class_nodes = CLASS_NODES[language]
+    import_nodes = IMPORT_NODES[language]
+
+    # Decisions count towards the innermost enclosing function, or the module
+    stack: List[Tuple[Any, Dict[str, Any]]] = [(root, module)]
+    while stack:
+        node, scope = stack.pop()
+        if node.type in function_nodes:
+            scope = {
+                "name": _name(node),
+                "line": node.start_point[0] + 1,
+                "end_line": node.end_point[0] + 1,
+                "complexity": 1,
+            }
+            functions.append(scope)
+        elif node.type in class_nodes and _is_class(node, language):
+            classes.append({"name": _name(node), "line": node.start_point[0] + 1})
+        elif node.type in import_nodes:
+            imports.append(_text(node).strip())
+        elif _is_decision(node, language):
+            scope["complexity"] += 1
+        stack.extend((child, scope) for child in reversed(node.children))
+
+    functions.sort(key=lambda function: function["line"])
+    return {
+        "functions": functions,
+        "classes": classes,
+        "imports": imports,
+        "complexity": module["complexity"] + sum(function["complexity"] - 1 for function in functions),
+        "has_errors": root.has_error,
+    }
+
+
+def complexity_rating(functions: List[Dict[str, Any]]) -> str:
+    if not functions:
+        return "low"
+    average = sum(function["complexity"] for function in functions) / len(functions)
+    return "low" if average < 5 else "medium" if average < 10 else "high"
+
+
+# Per worker process state, set up by _init_worker
+_worker_languages: Dict[str, Any] = {}
+_worker_parsers: Dict[str, Any] = {}
+
+
+def _init_worker(library_path: str, languages: List[str]):
+    for name in languages:
+        _worker_languages[name] = Language(library_path, name)
+
+
+def _parser(language: str):
+    parser = _worker_parsers.get(language)
+    if parser is None:
+        parser = Parser()
+        parser.set_language(_worker_languages[language])
+        _worker_parsers[language] = parser
+    return parser
+
+
+def parse_source(source: bytes, language: str) -> Dict[str, Any]:
+    """Parse source in a worker process and measure it"""
+    metrics = tree_metrics(_parser(language).parse(source).root_node, language)
+    metrics["lines"] = len(source.splitlines())
+    return metrics
+
+
+def measure_file(path: str) -> Dict[str, Any]:
+    """Line, function, class and complexity counts of a file, in a worker process
+
+    A file that cannot be read is reported with an error rather than failing
+    the other files measured with it.
+    """
+    try:
+        with open(path, "rb") as f:
+            source = f.read()
+    except OSError as e:
+        return {"error": str(e)}
+    language = EXTENSION_GRAMMARS.get(os.path.splitext(path)[1].lower())
+    if language not in _worker_languages:
+        return {"lines": len(source.splitlines())}
+    metrics = parse_source(source, language)
+    return {
+        "lines": metrics["lines"],
+        "functions": len(metrics["functions"]),
+        "classes": len(metrics["classes"]),
+        "complexity": metrics["complexity"],
+    }
+
+
+class CodeParser:
+    """Parses code on a pool of worker processes, caching results by content hash
+
+    Without the tree_sitter package or a compiled grammar library no language
+    is available, and callers fall back to counting lines.
+    """
+
+    def __init__(self, library_path: str = LIBRARY_PATH, max_workers: Optional[int] = None, max_cached: int = 1024):
+        self.library_path = library_path
+        self.max_workers = max_workers or int(os.getenv("PARSER_WORKERS", "0")) or os.cpu_count() or 1
+        self.max_cached = max_cached
+        self.languages = self._available_languages()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _available_languages(self) -> List[str]:
+        if Language is None:
+            logger.warning("tree_sitter is not installed, code will not be parsed")
+            return []
+        if not os.path.exists(self.library_path):
+            logger.warning(f"No Tree-sitter grammar library at {self.library_path}, code will not be parsed")
+            return []
+        languages = []
+        for name in GRAMMAR_SOURCES:
+            try:
+                Language(self.library_path, name)
+                languages.append(name)
+                logger.info(f"Initialized parser for {name}")
+            except Exception as e:
+                logger.warning(f"Could not initialize parser for {name}: {e}")
+        return languages
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    # Spawned rather than forked, since the server runs threads
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.library_path, self.languages),
+                )
+            return self._executor
+
+    def _discard(self, executor: ProcessPoolExecutor):
+        """Drop a pool broken by a dying worker so that the next use starts a new one"""
+        with self._executor_lock:
+            if self._executor is executor:
+                logger.warning("A code parser worker died, restarting the pool")
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+    def grammar_for(self, language: str) -> Optional[str]:
+        grammar = {"js": "javascript", "ts": "typescript", "c++": "cpp", "golang": "go"}.get(language, language)
+        return grammar if grammar in self.languages else None
+
+    async def parse(self, code: str, language: str) -> Optional[Dict[str, Any]]:
+        """Metrics of a piece of code, or None if its language cannot be parsed"""
+        grammar = self.grammar_for(language)
+        if grammar is None:
+            return None
+        source = code.encode()
+        key = hashlib.sha256(grammar.encode() + b"\0" + source).hexdigest()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached
+        self.misses += 1
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        try:
+            metrics = await loop.run_in_executor(executor, parse_source, source, grammar)
+        except BrokenProcessPool:
+            self._discard(executor)
+            metrics = await loop.run_in_executor(self.executor, parse_source, source, grammar)
+        self._cache[key] = metrics
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+        return metrics
+
+    def measure_files(self, paths: Iterable[str]) -> List[Dict[str, Any]]:
+        """Measure files in parallel across the pool, blocking until all are done"""
+        paths = list(paths)
+        chunksize = max(1, len(paths) // (self.max_workers * 4))
+        executor = self.executor
+        try:
+            return list(executor.map(measure_file, paths, chunksize=chunksize))
+        except BrokenProcessPool:
+            self._discard(executor)
+            return list(self.executor.map(measure_file, paths, chunksize=chunksize))
+
+    def metrics(self) -> dict:
+        return {
+            "languages": self.languages,
+            "workers": self.max_workers,
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+if __name__ == "__main__":
+    # python code_parser.py [grammars_dir] [library_path]
+    built = build_library(*sys.argv[1:3])
+    print(f"Built Tree-sitter grammars: {', '.join(built) or 'none'}")
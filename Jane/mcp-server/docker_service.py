@@ -0,0 +1,155 @@
+"""
+Docker access for tool containers
+The client is created and tool images are pulled when the server starts rather
+than during requests, Docker's health is checked in the background and served
+from the last check, and containers run in a bounded number of slots
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from loguru import logger
+
+STARTING = "starting"
+HEALTHY = "healthy"
+UNHEALTHY = "unhealthy"
+
+PULLING = "pulling"
+READY = "ready"
+FAILED = "failed"
+
+
+class DockerUnavailable(Exception):
+    """Raised when a container cannot be run, without waiting on Docker"""
+
+
+class DockerService:
+    """Owns the Docker client, the pre-pulled tool images and the container slots
+
+    Only the given images are run. One whose pre-pull is still in progress is
+    waited for; one whose pull failed is retried by the background refresh,
+    never by a request.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        images: Iterable[str],
+        max_containers: int = 2,
+        health_interval_seconds: float = 30.0,
+        ping_timeout_seconds: float = 5.0,
+    ):
+        self._client_factory = client_factory
+        self.client = None
+        self.images: Dict[str, str] = {image: PULLING for image in images}
+        self._image_errors: Dict[str, str] = {}
+        self._pulls: Dict[str, asyncio.Future] = {}
+        self.max_containers = max(max_containers, 1)
+        self._slots = asyncio.Semaphore(self.max_containers)
+        self.running = 0
+        self.health_interval_seconds = health_interval_seconds
+        self.ping_timeout_seconds = ping_timeout_seconds
+        self._health: Dict[str, Any] = {"status": STARTING, "checked_at": None, "error": None}
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Connect, start pulling every tool image and keep health checks running"""
+        await self.check_health()
+        for image in self.images:
+            self._start_pull(image)
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.ensure_future(self._refresh())
+
+    async def stop(self):
+        tasks = [task for task in [self._refresh_task, *self._pulls.values()] if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._refresh_task = None
+        if self.client is not None:
+            await asyncio.to_thread(self.client.close)
+            self.client = None
+
+    async def _connect(self):
+        if self.client is None:
+            self.client = await asyncio.to_thread(self._client_factory)
+        return self.client
+
+    def _start_pull(self, image: str):
+        self.images[image] = PULLING
+        self._pulls[image] = asyncio.ensure_future(self._pull(image))
+
+    async def _pull(self, image: str):
+        try:
+            client = await self._connect()
+            try:
+                await asyncio.to_thread(client.images.get, image)
+            except Exception:
+                repository, _, tag = image.partition(":")
+                logger.info(f"Pulling tool image {image}")
+                await asyncio.to_thread(client.images.pull, repository, tag=tag or "latest")
+        except Exception as e:
+            logger.warning(f"Could not pull tool image {image}: {e}")
+            self.images[image] = FAILED
+            self._image_errors[image] = str(e) or type(e).__name__
+        else:
+            self.images[image] = READY
+            self._image_errors.pop(image, None)
+
+    async def ensure_image(self, image: str):
+        """Wait for an image's pre-pull, raising DockerUnavailable if it is not there"""
+        pull = self._pulls.get(image)
+        if pull is None:
+            raise DockerUnavailable(f"{image} is not a pre-pulled tool image")
+        await asyncio.shield(pull)
+        if self.images[image] != READY:
+            raise DockerUnavailable(f"{image} could not be pulled: {self._image_errors.get(image)}")
+
+    @asynccontextmanager
+    async def container_slot(self):
+        """Hold one of the container slots, yielding the client to run with"""
+        async with self._slots:
+            if self.client is None:
+                raise DockerUnavailable(f"Docker is {self._health['status']}: {self._health['error']}")
+            self.running += 1
+            try:
+                yield self.client
+            finally:
+                self.running -= 1
+
+    @asynccontextmanager
+    async def container_for(self, image: str):
+        """Wait for an image and then for a container slot, yielding the client to run it with"""
+        await self.ensure_image(image)
+        async with self.container_slot() as client:
+            yield client
+
+    async def check_health(self):
+        try:
+            client = await self._connect()
+            await asyncio.wait_for(asyncio.to_thread(client.ping), self.ping_timeout_seconds)
+        except Exception as e:
+            status, error = UNHEALTHY, str(e) or type(e).__name__
+        else:
+            status, error = HEALTHY, None
+        if status != self._health["status"]:
+            logger.info(f"Docker is {status}" + (f": {error}" if error else ""))
+        self._health = {"status": status, "checked_at": datetime.utcnow().isoformat(), "error": error}
+
+    async def _refresh(self):
+        while True:
+            await asyncio.sleep(self.health_interval_seconds)
+            await self.check_health()
+            for image, status in self.images.items():
+                if status == FAILED:
+                    self._start_pull(image)
+
+    def status(self) -> dict:
+        """The last health check, image pulls and container slots, without touching Docker"""
+        return {
+            **self._health,
+            "images": dict(self.images),
+            "containers": {"slots": self.max_containers, "running": self.running},
+        }
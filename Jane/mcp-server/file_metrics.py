@@ -0,0 +1,178 @@
+"""
+Incremental file structure analysis
+Repositories are walked off the event loop, skipping version control, dependency
+and vendored directories, and per-file metrics are cached on path, size and
+modification time so that re-analysing an unchanged repository costs one stat
+per file
+"""
+
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+# File extensions analysed for each language
+LANGUAGE_EXTENSIONS = {
+    "python": [".py"],
+    "go": [".go"],
+    "javascript": [".js", ".ts"],
+    "c": [".c", ".h"],
+    "cpp": [".cpp", ".hpp", ".cc", ".cxx"],
+    "rust": [".rs"]
+}
+
+IGNORED_DIRECTORIES = frozenset({
+    ".git", ".hg", ".svn",
+    "node_modules", "vendor", "third_party",
+    "__pycache__", ".venv", "venv", ".tox", ".mypy_cache", ".pytest_cache",
+})
+
+READ_CHUNK_BYTES = 1 << 20
+
+
+def walk_files(root: Path) -> Iterator[Tuple[str, os.stat_result]]:
+    """Yield every regular file below root with its stat, pruning ignored directories"""
+    pending = [str(root)]
+    while pending:
+        directory = pending.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in IGNORED_DIRECTORIES:
+                        pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry.path, entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+
+
+def count_lines(path: str) -> int:
+    """Count lines without holding the whole file in memory"""
+    lines = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            lines += chunk.count(b"\n")
+            last = chunk[-1:]
+    # A final line without a trailing newline still counts
+    return lines + (last != b"\n")
+
+
+class FileMetricsCache:
+    """Per-file metrics keyed on (path, size, mtime), least recently used evicted first
+
+    Files whose metrics are missing or stale are measured together, by the code
+    parser's worker pool when one is given so that functions, classes and
+    complexity are counted too, and by counting lines otherwise.
+    """
+
+    def __init__(self, max_entries: int = 200000, parser=None):
+        self.max_entries = max_entries
+        self.parser = parser
+        self._entries: "OrderedDict[str, Tuple[int, int, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _cached(self, path: str, stat: os.stat_result) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != stat.st_size or entry[1] != stat.st_mtime_ns:
+                return None
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry[2]
+
+    def _store(self, path: str, stat: os.stat_result, metrics: Dict[str, Any]):
+        with self._lock:
+            self.misses += 1
+            self._entries[path] = (stat.st_size, stat.st_mtime_ns, metrics)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _measure(self, paths: List[str]) -> List[Dict[str, Any]]:
+        if self.parser is not None and self.parser.languages:
+            return self.parser.measure_files(paths)
+        measured = []
+        for path in paths:
+            try:
+                measured.append({"lines": count_lines(path)})
+            except OSError as e:
+                measured.append({"error": str(e)})
+        return measured
+
+    def scan(self, repo_path: Path, language: str) -> Dict[str, Any]:
+        """Analyse repository file structure and basic metrics, blocking
+
+        complexity_score is the total cyclomatic complexity of the source files.
+        """
+
+        metrics = {
+            "total_files": 0,
+            "source_files": 0,
+            "lines_of_code": 0,
+            "function_count": 0,
+            "class_count": 0,
+            "complexity_score": 0,
+            "file_types": {},
+            "largest_files": []
+        }
+        target_extensions = LANGUAGE_EXTENSIONS.get(language, [])
+        sources: List[Tuple[str, os.stat_result]] = []
+
+        for path, stat in walk_files(repo_path):
+            metrics["total_files"] += 1
+
+            suffix = os.path.splitext(path)[1].lower()
+            metrics["file_types"][suffix] = metrics["file_types"].get(suffix, 0) + 1
+
+            if suffix in target_extensions:
+                metrics["source_files"] += 1
+                sources.append((path, stat))
+
+        file_metrics = {path: self._cached(path, stat) for path, stat in sources}
+        stale = [(path, stat) for path, stat in sources if file_metrics[path] is None]
+        if stale:
+            for (path, stat), measured in zip(stale, self._measure([path for path, _ in stale])):
+                if "error" in measured:
+                    logger.warning(f"Could not analyze file {path}: {measured['error']}")
+                    continue
+                file_metrics[path] = {**measured, "size_bytes": stat.st_size}
+                self._store(path, stat, file_metrics[path])
+
+        source_files: List[Dict[str, Any]] = []
+        for path, _ in sources:
+            measured = file_metrics[path]
+            if measured is None:
+                continue
+            metrics["lines_of_code"] += measured["lines"]
+            metrics["function_count"] += measured.get("functions", 0)
+            metrics["class_count"] += measured.get("classes", 0)
+            metrics["complexity_score"] += measured.get("complexity", 0)
+            source_files.append({"path": os.path.relpath(path, repo_path), "lines": measured["lines"], "size_bytes": measured["size_bytes"]})
+
+        metrics["largest_files"] = sorted(source_files, key=lambda x: x["lines"], reverse=True)[:10]
+        return metrics
+
+    async def analyze(self, repo_path: Path, language: str) -> Dict[str, Any]:
+        """Analyse repository file structure without blocking the event loop"""
+        return await asyncio.to_thread(self.scan, repo_path, language)
+
+    def metrics(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
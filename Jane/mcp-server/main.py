@@ -12,17 +12,25 @@ import tempfile
 import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-import tree_sitter
-from tree_sitter import Language, Parser
 import docker
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 import httpx
 from loguru import logger
 
+from analysis_jobs import FAILED, AnalysisJob, AnalysisJobQueue, JobQueueFull, untracked_stage
+from code_parser import CodeParser, complexity_rating
+from docker_service import DockerService
+from file_metrics import FileMetricsCache
+from tool_runner import OK, ToolRunner
+
+# Security tools that run as containers rather than local executables
+CONTAINER_TOOLS = ("semgrep", "trivy")
+
 # Configure logging
 logger.add("logs/mcp_server.log", rotation="1 day", retention="7 days", level="INFO")
 
@@ -60,13 +68,22 @@ class MCPServer:
     """Model Context Protocol Server for code analysis and cybersecurity tools"""
     
     def __init__(self):
-        self.docker_client = docker.from_env()
         self.motoko_client = httpx.AsyncClient()
         self.motoko_url = os.getenv("MOTOKO_LLM_URL", "http://192.168.1.12:8000")
         
-        # Initialize parsers for different languages
-        self.parsers = {}
-        self._init_tree_sitter_parsers()
+        # Tree-sitter parsers for the vendored grammars, run on a pool of worker processes
+        self.code_parser = CodeParser()
+        self.parsers = self.code_parser.languages
+        
+        # Per-file metrics survive between analyses of the same repository
+        self.file_metrics = FileMetricsCache(parser=self.code_parser)
+        
+        # Security tools run concurrently, bounded globally and timed out per tool
+        self.tool_runner = ToolRunner(
+            max_concurrency=int(os.getenv("SECURITY_TOOL_CONCURRENCY", "4")),
+            default_timeout_seconds=float(os.getenv("SECURITY_TOOL_TIMEOUT_SECONDS", "300")),
+            timeouts={"bandit": 120, "gosec": 120},
+        )
         
         # Tool containers for security analysis
         self.security_tools = {
@@ -83,6 +100,14 @@ class MCPServer:
             "nikto": "sullo/nikto"
         }
         
+        # Docker is connected and the images of containerized tools pulled at startup
+        self.docker = DockerService(
+            client_factory=docker.from_env,
+            images=[self.security_tools[tool] for tool in CONTAINER_TOOLS],
+            max_containers=int(os.getenv("CONTAINER_SLOTS", "2")),
+            health_interval_seconds=float(os.getenv("DOCKER_HEALTH_INTERVAL_SECONDS", "30"))
+        )
+        
         # Transpiler tools for code conversion
         self.transpiler_tools = {
             "c2go": "elliotchance/c2go",
@@ -91,32 +116,17 @@ class MCPServer:
             "python_ast": "python:3.11-alpine"  # Built-in AST tools
         }
     
-    def _init_tree_sitter_parsers(self):
-        """Initialize Tree-sitter parsers for code analysis"""
-        try:
-            # Common languages for cybersecurity tools
-            languages = ["python", "go", "javascript", "c", "cpp", "rust"]
-            
-            for lang in languages:
-                try:
-                    # This would normally require pre-built language files
-                    # For demo purposes, we'll simulate parser availability
-                    self.parsers[lang] = f"parser_{lang}"
-                    logger.info(f"Initialized parser for {lang}")
-                except Exception as e:
-                    logger.warning(f"Could not initialize parser for {lang}: {e}")
-                    
-        except Exception as e:
-            logger.error(f"Failed to initialize parsers: {e}")
-    
-    async def analyze_codebase(self, request: AnalysisRequest) -> Dict[str, Any]:
-        """Analyze a codebase for structure, security, and conversion potential"""
+    async def analyze_codebase(self, request: AnalysisRequest, analysis_id: Optional[str] = None, stage=untracked_stage) -> Dict[str, Any]:
+        """Analyze a codebase for structure, security, and conversion potential
+        
+        stage is entered around each step so that a job can report its progress.
+        """
         
         repo_path = Path(request.repository_path)
         if not repo_path.exists():
             raise HTTPException(status_code=404, detail="Repository path not found")
         
-        analysis_id = str(uuid.uuid4())
+        analysis_id = analysis_id or str(uuid.uuid4())
         logger.info(f"Starting codebase analysis {analysis_id} for {repo_path}")
         
         results = {
@@ -127,26 +137,31 @@ class MCPServer:
             "analysis_type": request.analysis_type,
             "metrics": {},
             "security_findings": [],
+            "security_tools": [],
             "conversion_assessment": {},
             "recommendations": []
         }
         
         try:
             # Basic file analysis
-            results["metrics"] = await self._analyze_file_structure(repo_path, request.language)
+            async with stage("file_structure"):
+                results["metrics"] = await self._analyze_file_structure(repo_path, request.language)
             
             # Security analysis if requested
             if request.analysis_type in ["full", "security"]:
-                results["security_findings"] = await self._run_security_analysis(repo_path, request.language)
+                async with stage("security"):
+                    results["security_findings"], results["security_tools"] = await self._run_security_analysis(repo_path, request.language)
             
             # Conversion assessment if target language specified
             if request.target_language:
-                results["conversion_assessment"] = await self._assess_conversion_feasibility(
-                    repo_path, request.language, request.target_language
-                )
+                async with stage("conversion"):
+                    results["conversion_assessment"] = await self._assess_conversion_feasibility(
+                        repo_path, request.language, request.target_language
+                    )
             
             # Generate AI-powered recommendations
-            results["recommendations"] = await self._generate_recommendations(results)
+            async with stage("recommendations"):
+                results["recommendations"] = await self._generate_recommendations(results)
             
             logger.info(f"Completed analysis {analysis_id}")
             return results
@@ -155,334 +170,277 @@ class MCPServer:
             logger.error(f"Analysis {analysis_id} failed: {e}")
             raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
     
-    async def _analyze_file_structure(self, repo_path: Path, language: str) -> Dict[str, Any]:
-        """Analyze repository file structure and basic metrics"""
+    async def security_scan(self, request: SecurityAnalysisRequest, scan_id: Optional[str] = None, stage=untracked_stage) -> Dict[str, Any]:
+        """Run focused security analysis on code"""
         
-        metrics = {
-            "total_files": 0,
-            "source_files": 0,
-            "lines_of_code": 0,
-            "function_count": 0,
-            "class_count": 0,
-            "complexity_score": 0,
-            "file_types": {},
-            "largest_files": []
-        }
+        repo_path = Path(request.code_path)
+        if not repo_path.exists():
+            raise HTTPException(status_code=404, detail="Code path not found")
         
-        # File extension mapping
-        extensions = {
-            "python": [".py"],
-            "go": [".go"],
-            "javascript": [".js", ".ts"],
-            "c": [".c", ".h"],
-            "cpp": [".cpp", ".hpp", ".cc", ".cxx"],
-            "rust": [".rs"]
-        }
+        findings = []
+        tools = []
         
-        target_extensions = extensions.get(language, [])
+        if "static" in request.scan_types:
+            async with stage("static"):
+                findings, tools = await self._run_security_analysis(repo_path, "auto")
         
-        for file_path in repo_path.rglob("*"):
-            if file_path.is_file():
-                metrics["total_files"] += 1
-                
-                suffix = file_path.suffix.lower()
-                metrics["file_types"][suffix] = metrics["file_types"].get(suffix, 0) + 1
-                
-                if suffix in target_extensions:
-                    metrics["source_files"] += 1
-                    
-                    try:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            content = f.read()
-                            lines = len(content.splitlines())
-                            metrics["lines_of_code"] += lines
-                            
-                            # Track largest files
-                            metrics["largest_files"].append({
-                                "path": str(file_path.relative_to(repo_path)),
-                                "lines": lines,
-                                "size_bytes": file_path.stat().st_size
-                            })
-                            
-                    except Exception as e:
-                        logger.warning(f"Could not analyze file {file_path}: {e}")
-        
-        # Sort and limit largest files
-        metrics["largest_files"] = sorted(
-            metrics["largest_files"], 
-            key=lambda x: x["lines"], 
-            reverse=True
-        )[:10]
-        
-        return metrics
+        return {
+            "scan_id": scan_id or str(uuid.uuid4()),
+            "timestamp": datetime.utcnow().isoformat(),
+            "scan_types": request.scan_types,
+            "tools": tools,
+            "findings": findings,
+            "summary": {
+                "total_findings": len(findings),
+                "critical": len([f for f in findings if f.get("severity") == "critical"]),
+                "high": len([f for f in findings if f.get("severity") == "high"]),
+                "medium": len([f for f in findings if f.get("severity") == "medium"]),
+                "low": len([f for f in findings if f.get("severity") == "low"])
+            }
+        }
+    
+    async def _analyze_file_structure(self, repo_path: Path, language: str) -> Dict[str, Any]:
+        """Analyze repository file structure and basic metrics"""
+        return await self.file_metrics.analyze(repo_path, language)
     
-    async def _run_security_analysis(self, repo_path: Path, language: str) -> List[Dict[str, Any]]:
-        """Run security analysis using containerized tools"""
+    async def _run_security_analysis(self, repo_path: Path, language: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Run every applicable security tool concurrently
+
+        Returns the findings of the tools that completed and a report of how
+        each tool went, so that one failing or slow tool does not hide the rest.
+        """
+        
+        jobs = {
+            "semgrep": lambda docker_client: self._run_semgrep(repo_path, language, docker_client),
+            "trivy": lambda docker_client: self._run_trivy(repo_path, docker_client),
+            "nuclei": lambda: self._nuclei_findings(str(repo_path)),
+            "gobuster": lambda: self._gobuster_findings(str(repo_path)),
+        }
         
-        findings = []
+        # Language-specific tools
+        if language == "python":
+            jobs["bandit"] = lambda: self._run_bandit(repo_path)
+        elif language == "go":
+            jobs["gosec"] = lambda: self._run_gosec(repo_path)
         
-        try:
-            # Run Semgrep for general security analysis
-            semgrep_results = await self._run_semgrep(repo_path, language)
-            findings.extend(semgrep_results)
-            
-            # Language-specific tools
-            if language == "python":
-                bandit_results = await self._run_bandit(repo_path)
-                findings.extend(bandit_results)
-            elif language == "go":
-                gosec_results = await self._run_gosec(repo_path)
-                findings.extend(gosec_results)
-            
-            # Dependency analysis with Trivy
-            trivy_results = await self._run_trivy(repo_path)
-            findings.extend(trivy_results)
-            
-            # Enhanced tools: Nuclei and Gobuster
-            nuclei_results = await self.run_nuclei_scan(str(repo_path))
-            findings.extend(nuclei_results.get("findings", []))
-            
-            gobuster_results = await self.run_gobuster_scan(str(repo_path))
-            findings.extend(gobuster_results.get("findings", []))
-            
-        except Exception as e:
-            logger.error(f"Security analysis failed: {e}")
-            findings.append({
-                "tool": "error",
-                "severity": "info",
-                "message": f"Security analysis partially failed: {str(e)}"
-            })
+        # Containerized tools get their image and a container slot before their timeout starts
+        acquire = {
+            tool: lambda tool=tool: self.docker.container_for(self.security_tools[tool])
+            for tool in CONTAINER_TOOLS
+        }
         
-        return findings
+        findings = []
+        reports = []
+        for result in await self.tool_runner.run_all(jobs, acquire):
+            findings.extend(result.findings)
+            reports.append(result.report())
+            if result.status != OK:
+                logger.warning(f"{result.tool} {result.status}: {result.error}")
+                findings.append({
+                    "tool": result.tool,
+                    "severity": "info",
+                    "message": f"{result.tool} did not complete ({result.status}): {result.error}"
+                })
+        
+        return findings, reports
     
-    async def _run_semgrep(self, repo_path: Path, language: str) -> List[Dict[str, Any]]:
-        """Run Semgrep static analysis"""
+    async def _run_container_tool(
+        self, tool: str, command: str, repo_path: Path, docker_client, exit_codes: Sequence[int] = (0,)
+    ) -> Dict[str, Any]:
+        """Run a containerized tool over the repository and return its JSON output
+
+        Raises if the container exits with a status outside exit_codes or
+        writes no output, so that neither is reported as a clean scan.
+        """
         
-        findings = []
+        with tempfile.NamedTemporaryFile(mode='w+', suffix='.json', delete=False) as temp_file:
+            output_file = temp_file.name
         
         try:
-            # Create temporary output file
-            with tempfile.NamedTemporaryFile(mode='w+', suffix='.json', delete=False) as temp_file:
-                output_file = temp_file.name
-            
-            # Run Semgrep container
-            container = self.docker_client.containers.run(
-                self.security_tools["semgrep"],
-                command=f"semgrep --config=auto --json --output=/output.json /src",
+            await self.tool_runner.run_container(
+                docker_client,
+                self.security_tools[tool],
+                exit_codes=exit_codes,
+                command=command,
                 volumes={
                     str(repo_path): {"bind": "/src", "mode": "ro"},
                     output_file: {"bind": "/output.json", "mode": "rw"}
                 },
-                detach=True,
                 remove=True
             )
             
-            # Wait for completion (with timeout)
-            container.wait(timeout=300)  # 5 minutes
-            
-            # Read results
-            if os.path.exists(output_file):
-                with open(output_file, 'r') as f:
-                    semgrep_data = json.load(f)
-                    
-                for result in semgrep_data.get("results", []):
-                    findings.append({
-                        "tool": "semgrep",
-                        "rule_id": result.get("check_id"),
-                        "severity": result.get("extra", {}).get("severity", "info"),
-                        "message": result.get("extra", {}).get("message", ""),
-                        "file": result.get("path", ""),
-                        "line": result.get("start", {}).get("line", 0)
-                    })
-                
-                os.unlink(output_file)
-                
-        except docker.errors.ContainerError as e:
-            logger.warning(f"Semgrep container failed: {e}")
-        except Exception as e:
-            logger.error(f"Semgrep analysis failed: {e}")
+            with open(output_file, 'r') as f:
+                content = f.read()
+            if not content.strip():
+                raise RuntimeError(f"{tool} produced no output")
+            return json.loads(content)
+        finally:
+            os.unlink(output_file)
+    
+    async def _run_semgrep(self, repo_path: Path, language: str, docker_client) -> List[Dict[str, Any]]:
+        """Run Semgrep static analysis"""
         
-        return findings
+        # Semgrep exits 1 when it finds issues
+        semgrep_data = await self._run_container_tool(
+            "semgrep", "semgrep --config=auto --json --output=/output.json /src", repo_path, docker_client, exit_codes=(0, 1)
+        )
+        
+        return [
+            {
+                "tool": "semgrep",
+                "rule_id": result.get("check_id"),
+                "severity": result.get("extra", {}).get("severity", "info"),
+                "message": result.get("extra", {}).get("message", ""),
+                "file": result.get("path", ""),
+                "line": result.get("start", {}).get("line", 0)
+            }
+            for result in semgrep_data.get("results", [])
+        ]
     
-    async def _run_trivy(self, repo_path: Path) -> List[Dict[str, Any]]:
+    async def _run_trivy(self, repo_path: Path, docker_client) -> List[Dict[str, Any]]:
         """Run Trivy for vulnerability and secret scanning"""
         
-        findings = []
-        
-        try:
-            with tempfile.NamedTemporaryFile(mode='w+', suffix='.json', delete=False) as temp_file:
-                output_file = temp_file.name
-            
-            container = self.docker_client.containers.run(
-                self.security_tools["trivy"],
-                command=f"trivy fs --format json --output /output.json /src",
-                volumes={
-                    str(repo_path): {"bind": "/src", "mode": "ro"},
-                    output_file: {"bind": "/output.json", "mode": "rw"}
-                },
-                detach=True,
-                remove=True
-            )
-            
-            container.wait(timeout=300)
-            
-            if os.path.exists(output_file):
-                with open(output_file, 'r') as f:
-                    trivy_data = json.load(f)
-                    
-                for result in trivy_data.get("Results", []):
-                    for vuln in result.get("Vulnerabilities", []):
-                        findings.append({
-                            "tool": "trivy",
-                            "vulnerability_id": vuln.get("VulnerabilityID"),
-                            "severity": vuln.get("Severity", "unknown").lower(),
-                            "message": vuln.get("Description", ""),
-                            "package": vuln.get("PkgName", ""),
-                            "version": vuln.get("InstalledVersion", "")
-                        })
-                
-                os.unlink(output_file)
-                
-        except Exception as e:
-            logger.error(f"Trivy analysis failed: {e}")
-        
-        return findings
+        trivy_data = await self._run_container_tool(
+            "trivy", "trivy fs --format json --output /output.json /src", repo_path, docker_client
+        )
+        
+        return [
+            {
+                "tool": "trivy",
+                "vulnerability_id": vuln.get("VulnerabilityID"),
+                "severity": vuln.get("Severity", "unknown").lower(),
+                "message": vuln.get("Description", ""),
+                "package": vuln.get("PkgName", ""),
+                "version": vuln.get("InstalledVersion", "")
+            }
+            for result in trivy_data.get("Results", [])
+            for vuln in result.get("Vulnerabilities") or []
+        ]
     
     async def _run_bandit(self, repo_path: Path) -> List[Dict[str, Any]]:
         """Run Bandit for Python security analysis"""
         
-        findings = []
-        
-        try:
-            result = subprocess.run([
-                "python", "-m", "bandit", "-r", str(repo_path), "-f", "json"
-            ], capture_output=True, text=True, timeout=120)
-            
-            if result.stdout:
-                bandit_data = json.loads(result.stdout)
-                
-                for result in bandit_data.get("results", []):
-                    findings.append({
-                        "tool": "bandit",
-                        "test_id": result.get("test_id"),
-                        "severity": result.get("issue_severity", "info").lower(),
-                        "confidence": result.get("issue_confidence", "medium").lower(),
-                        "message": result.get("issue_text", ""),
-                        "file": result.get("filename", ""),
-                        "line": result.get("line_number", 0)
-                    })
-                    
-        except subprocess.TimeoutExpired:
-            logger.warning("Bandit analysis timed out")
-        except Exception as e:
-            logger.error(f"Bandit analysis failed: {e}")
-        
-        return findings
+        # Bandit exits non-zero when it finds issues, so only its output tells failure apart
+        _, stdout, stderr = await self.tool_runner.run_command([
+            "python", "-m", "bandit", "-r", str(repo_path), "-f", "json"
+        ])
+        if not stdout:
+            raise RuntimeError(stderr.strip() or "bandit produced no output")
+        
+        bandit_data = json.loads(stdout)
+        
+        return [
+            {
+                "tool": "bandit",
+                "test_id": result.get("test_id"),
+                "severity": result.get("issue_severity", "info").lower(),
+                "confidence": result.get("issue_confidence", "medium").lower(),
+                "message": result.get("issue_text", ""),
+                "file": result.get("filename", ""),
+                "line": result.get("line_number", 0)
+            }
+            for result in bandit_data.get("results", [])
+        ]
     
     async def _run_gosec(self, repo_path: Path) -> List[Dict[str, Any]]:
         """Run Gosec for Go security analysis"""
         
-        findings = []
+        _, stdout, stderr = await self.tool_runner.run_command([
+            "gosec", "-fmt", "json", str(repo_path) + "/..."
+        ])
+        if not stdout:
+            raise RuntimeError(stderr.strip() or "gosec produced no output")
+        
+        gosec_data = json.loads(stdout)
+        
+        return [
+            {
+                "tool": "gosec",
+                "rule_id": issue.get("rule_id"),
+                "severity": issue.get("severity", "info").lower(),
+                "confidence": issue.get("confidence", "medium").lower(),
+                "message": issue.get("details", ""),
+                "file": issue.get("file", ""),
+                "line": issue.get("line", "0")
+            }
+            for issue in gosec_data.get("Issues", [])
+        ]
+    
+    async def _nuclei_findings(self, target: str, templates: List[str] = None) -> List[Dict[str, Any]]:
+        cmd = ["nuclei", "-target", target, "-json"]
+        if templates:
+            cmd.extend(["-t", ",".join(templates)])
+        else:
+            cmd.extend(["-t", "cves,vulnerabilities,exposed-panels"])
         
-        try:
-            result = subprocess.run([
-                "gosec", "-fmt", "json", str(repo_path) + "/..."
-            ], capture_output=True, text=True, timeout=120)
-            
-            if result.stdout:
-                gosec_data = json.loads(result.stdout)
-                
-                for issue in gosec_data.get("Issues", []):
-                    findings.append({
-                        "tool": "gosec",
-                        "rule_id": issue.get("rule_id"),
-                        "severity": issue.get("severity", "info").lower(),
-                        "confidence": issue.get("confidence", "medium").lower(),
-                        "message": issue.get("details", ""),
-                        "file": issue.get("file", ""),
-                        "line": issue.get("line", "0")
-                    })
-                    
-        except subprocess.TimeoutExpired:
-            logger.warning("Gosec analysis timed out")
-        except Exception as e:
-            logger.error(f"Gosec analysis failed: {e}")
+        _, stdout, _ = await self.tool_runner.run_command(cmd)
+        
+        findings = []
+        for line in stdout.strip().split('\n'):
+            if line.strip():
+                nuclei_data = json.loads(line)
+                findings.append({
+                    "tool": "nuclei",
+                    "template": nuclei_data.get("template"),
+                    "severity": nuclei_data.get("info", {}).get("severity", "info").lower(),
+                    "name": nuclei_data.get("info", {}).get("name", ""),
+                    "matched_at": nuclei_data.get("matched-at", ""),
+                    "extracted_results": nuclei_data.get("extracted-results", [])
+                })
         
         return findings
     
     async def run_nuclei_scan(self, target: str, templates: List[str] = None) -> Dict[str, Any]:
         """Run Nuclei vulnerability scanner against a target"""
         
-        findings = []
-        
-        try:
-            cmd = ["nuclei", "-target", target, "-json"]
-            if templates:
-                cmd.extend(["-t", ",".join(templates)])
-            else:
-                cmd.extend(["-t", "cves,vulnerabilities,exposed-panels"])
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-            
-            if result.stdout:
-                for line in result.stdout.strip().split('\n'):
-                    if line.strip():
-                        nuclei_data = json.loads(line)
-                        findings.append({
-                            "tool": "nuclei",
-                            "template": nuclei_data.get("template"),
-                            "severity": nuclei_data.get("info", {}).get("severity", "info").lower(),
-                            "name": nuclei_data.get("info", {}).get("name", ""),
-                            "matched_at": nuclei_data.get("matched-at", ""),
-                            "extracted_results": nuclei_data.get("extracted-results", [])
-                        })
-                        
-        except subprocess.TimeoutExpired:
-            logger.warning("Nuclei scan timed out")
-        except Exception as e:
-            logger.error(f"Nuclei scan failed: {e}")
+        result = await self.tool_runner.run("nuclei", lambda: self._nuclei_findings(target, templates))
+        if result.status != OK:
+            logger.warning(f"Nuclei scan {result.status}: {result.error}")
         
         return {
             "tool": "nuclei",
             "target": target,
-            "findings": findings,
+            "status": result.status,
+            "error": result.error,
+            "findings": result.findings,
             "timestamp": datetime.utcnow().isoformat()
         }
     
-    async def run_gobuster_scan(self, target_url: str, wordlist: str = None) -> Dict[str, Any]:
-        """Run Gobuster directory enumeration"""
+    async def _gobuster_findings(self, target_url: str, wordlist: str = None) -> List[Dict[str, Any]]:
+        cmd = ["gobuster", "dir", "-u", target_url, "-q"]
+        if wordlist:
+            cmd.extend(["-w", wordlist])
+        else:
+            cmd.extend(["-w", "/usr/share/wordlists/dirb/common.txt"])
+        
+        _, stdout, _ = await self.tool_runner.run_command(cmd)
         
         findings = []
+        for line in stdout.strip().split('\n'):
+            if line.strip() and not line.startswith('='):
+                parts = line.split()
+                if len(parts) >= 2:
+                    findings.append({
+                        "path": parts[0],
+                        "status": parts[1] if len(parts) > 1 else "200",
+                        "size": parts[2] if len(parts) > 2 else "0"
+                    })
         
-        try:
-            cmd = ["gobuster", "dir", "-u", target_url, "-q"]
-            if wordlist:
-                cmd.extend(["-w", wordlist])
-            else:
-                cmd.extend(["-w", "/usr/share/wordlists/dirb/common.txt"])
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-            
-            if result.stdout:
-                for line in result.stdout.strip().split('\n'):
-                    if line.strip() and not line.startswith('='):
-                        parts = line.split()
-                        if len(parts) >= 2:
-                            findings.append({
-                                "path": parts[0],
-                                "status": parts[1] if len(parts) > 1 else "200",
-                                "size": parts[2] if len(parts) > 2 else "0"
-                            })
-                        
-        except subprocess.TimeoutExpired:
-            logger.warning("Gobuster scan timed out")
-        except Exception as e:
-            logger.error(f"Gobuster scan failed: {e}")
+        return findings
+    
+    async def run_gobuster_scan(self, target_url: str, wordlist: str = None) -> Dict[str, Any]:
+        """Run Gobuster directory enumeration"""
+        
+        result = await self.tool_runner.run("gobuster", lambda: self._gobuster_findings(target_url, wordlist))
+        if result.status != OK:
+            logger.warning(f"Gobuster scan {result.status}: {result.error}")
         
         return {
             "tool": "gobuster",
             "target": target_url,
-            "findings": findings,
+            "status": result.status,
+            "error": result.error,
+            "findings": result.findings,
             "timestamp": datetime.utcnow().isoformat()
         }
     
@@ -524,18 +482,20 @@ class MCPServer:
         """Enhanced code analysis using Tree-sitter"""
         
         try:
-            if language not in self.parsers:
+            parsed = await self.code_parser.parse(code, language)
+            if parsed is None:
                 return {"error": f"Parser not available for {language}"}
             
-            # Simulate Tree-sitter analysis (would need actual implementation)
             analysis = {
                 "language": language,
-                "lines_of_code": len(code.split('\n')),
-                "functions": [],  # Would extract function definitions
-                "classes": [],   # Would extract class definitions
-                "imports": [],   # Would extract import statements
-                "complexity": "medium",  # Would calculate cyclomatic complexity
-                "security_patterns": []  # Would identify security-relevant patterns
+                "lines_of_code": parsed["lines"],
+                "functions": parsed["functions"],
+                "classes": parsed["classes"],
+                "imports": parsed["imports"],
+                "complexity": complexity_rating(parsed["functions"]),
+                "cyclomatic_complexity": parsed["complexity"],
+                "syntax_errors": parsed["has_errors"],
+                "security_patterns": []
             }
             
             # Basic pattern matching for demonstration
@@ -578,6 +538,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Analyses run as background jobs on a bounded pool of workers
+analysis_jobs = AnalysisJobQueue(
+    max_workers=int(os.getenv("ANALYSIS_WORKERS", "2")),
+    max_queued=int(os.getenv("ANALYSIS_MAX_QUEUED", "100")),
+    max_stored_jobs=int(os.getenv("ANALYSIS_MAX_STORED", "1000"))
+)
+
+@app.on_event("startup")
+async def start_background_services():
+    await mcp_server.docker.start()
+    analysis_jobs.start()
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    await analysis_jobs.stop()
+    await mcp_server.docker.stop()
+    mcp_server.code_parser.shutdown()
+
+def submit_analysis(kind: str, request: BaseModel, run) -> AnalysisJob:
+    try:
+        return analysis_jobs.submit(kind, request.model_dump(), run)
+    except JobQueueFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many analyses queued, retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+async def job_response(job: AnalysisJob, response: Response, wait: bool) -> Dict[str, Any]:
+    """The job's id and where to follow it, or its result once done if the caller waits"""
+    if wait:
+        await job.wait()
+        if job.status == FAILED:
+            raise HTTPException(status_code=500, detail=job.error)
+        return job.result
+    response.status_code = 202
+    return {
+        "analysis_id": job.id,
+        "status": job.status,
+        "status_url": f"/analyses/{job.id}",
+        "events_url": f"/analyses/{job.id}/events"
+    }
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -585,42 +588,52 @@ async def health_check():
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
         "services": {
-            "docker": "healthy" if mcp_server.docker_client.ping() else "unhealthy",
+            "docker": mcp_server.docker.status()["status"],
             "parsers": len(mcp_server.parsers)
-        }
+        },
+        "docker": mcp_server.docker.status(),
+        "security_tools": mcp_server.tool_runner.metrics(),
+        "file_metrics_cache": mcp_server.file_metrics.metrics(),
+        "code_parser": mcp_server.code_parser.metrics(),
+        "analysis_jobs": analysis_jobs.metrics()
     }
 
 @app.post("/analyze/codebase")
-async def analyze_codebase(request: AnalysisRequest):
-    """Analyze a codebase for structure, security, and conversion potential"""
-    return await mcp_server.analyze_codebase(request)
+async def analyze_codebase(request: AnalysisRequest, response: Response, wait: bool = False):
+    """Queue a codebase analysis for structure, security, and conversion potential"""
+    if not Path(request.repository_path).exists():
+        raise HTTPException(status_code=404, detail="Repository path not found")
+    job = submit_analysis("codebase", request, lambda job: mcp_server.analyze_codebase(request, job.id, job.stage))
+    return await job_response(job, response, wait)
 
 @app.post("/analyze/security")
-async def security_analysis(request: SecurityAnalysisRequest):
-    """Run focused security analysis on code"""
-    
-    repo_path = Path(request.code_path)
-    if not repo_path.exists():
+async def security_analysis(request: SecurityAnalysisRequest, response: Response, wait: bool = False):
+    """Queue a focused security analysis on code"""
+    if not Path(request.code_path).exists():
         raise HTTPException(status_code=404, detail="Code path not found")
+    job = submit_analysis("security", request, lambda job: mcp_server.security_scan(request, job.id, job.stage))
+    return await job_response(job, response, wait)
+
+@app.get("/analyses/{analysis_id}")
+async def get_analysis(analysis_id: str):
+    """Status and per-stage progress of an analysis, with its result once completed"""
+    job = analysis_jobs.get(analysis_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return job.snapshot()
+
+@app.get("/analyses/{analysis_id}/events")
+async def stream_analysis(analysis_id: str):
+    """Stream the analysis as newline-delimited JSON snapshots, one per change, until it finishes"""
+    job = analysis_jobs.get(analysis_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
     
-    findings = []
-    
-    if "static" in request.scan_types:
-        findings.extend(await mcp_server._run_security_analysis(repo_path, "auto"))
+    async def events():
+        async for snapshot in job.events():
+            yield json.dumps(snapshot) + "\n"
     
-    return {
-        "scan_id": str(uuid.uuid4()),
-        "timestamp": datetime.utcnow().isoformat(),
-        "scan_types": request.scan_types,
-        "findings": findings,
-        "summary": {
-            "total_findings": len(findings),
-            "critical": len([f for f in findings if f.get("severity") == "critical"]),
-            "high": len([f for f in findings if f.get("severity") == "high"]),
-            "medium": len([f for f in findings if f.get("severity") == "medium"]),
-            "low": len([f for f in findings if f.get("severity") == "low"])
-        }
-    }
+    return StreamingResponse(events(), media_type="application/x-ndjson")
 
 @app.get("/tools")
 async def list_tools():
@@ -0,0 +1,161 @@
+"""
+Concurrent execution of security analysis tools
+Tools run as asynchronous subprocesses or container tasks under a shared limit on
+how many run at once, each with its own timeout, and a tool that fails or times
+out is reported next to the findings of the others instead of aborting them
+"""
+
+import asyncio
+import time
+from contextlib import AsyncExitStack
+from typing import Any, AsyncContextManager, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+OK = "ok"
+FAILED = "failed"
+TIMED_OUT = "timed_out"
+
+Findings = List[Dict[str, Any]]
+Acquire = Callable[[], AsyncContextManager[Any]]
+
+
+class ToolResult:
+    """Outcome of one tool run"""
+
+    def __init__(self, tool: str, status: str, findings: Findings, duration_seconds: float, error: Optional[str] = None):
+        self.tool = tool
+        self.status = status
+        self.findings = findings
+        self.duration_seconds = duration_seconds
+        self.error = error
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "tool": self.tool,
+            "status": self.status,
+            "findings": len(self.findings),
+            "duration_seconds": round(self.duration_seconds, 3),
+            "error": self.error,
+        }
+
+
+class ToolRunner:
+    """Runs analysis tools concurrently, at most max_concurrency at a time
+
+    A tool's timeout covers only the time it runs, not the time it waits for a
+    slot or for what it needs to start, such as its image being pulled, and a
+    tool waits for the latter without holding a slot. Subprocesses and
+    containers still running when their tool times out are killed.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        default_timeout_seconds: float = 300.0,
+        timeouts: Optional[Dict[str, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_concurrency = max(max_concurrency, 1)
+        self.default_timeout_seconds = default_timeout_seconds
+        self.timeouts = dict(timeouts or {})
+        self._clock = clock
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+
+    def timeout_for(self, tool: str) -> float:
+        return self.timeouts.get(tool, self.default_timeout_seconds)
+
+    async def run(self, tool: str, job: Callable[..., Awaitable[Findings]], acquire: Optional[Acquire] = None) -> ToolResult:
+        """Run one tool's job in a slot; never raises for the job's own failures
+
+        When acquire is given, the context manager it returns is entered before
+        the tool takes a slot, so that a tool waiting for what it needs does not
+        hold up the others, and is held until the job is done. The job is called
+        with the value it yields.
+        """
+        started = self._clock()
+        try:
+            async with AsyncExitStack() as stack:
+                args = () if acquire is None else (await stack.enter_async_context(acquire()),)
+                async with self._slots:
+                    self.running += 1
+                    started = self._clock()
+                    try:
+                        findings = await asyncio.wait_for(job(*args), self.timeout_for(tool))
+                    finally:
+                        self.running -= 1
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            return ToolResult(tool, TIMED_OUT, [], self._clock() - started, f"timed out after {self.timeout_for(tool):g}s")
+        except Exception as e:
+            self.failed += 1
+            return ToolResult(tool, FAILED, [], self._clock() - started, str(e) or type(e).__name__)
+        self.completed += 1
+        return ToolResult(tool, OK, findings, self._clock() - started)
+
+    async def run_all(
+        self,
+        jobs: Dict[str, Callable[..., Awaitable[Findings]]],
+        acquire: Optional[Dict[str, Acquire]] = None,
+    ) -> List[ToolResult]:
+        """Run every tool concurrently, returning results in the order given"""
+        acquire = acquire or {}
+        return list(await asyncio.gather(*(self.run(tool, job, acquire.get(tool)) for tool, job in jobs.items())))
+
+    async def run_command(self, argv: Sequence[str]) -> Tuple[int, str, str]:
+        """Run a command and return its exit code, stdout and stderr
+
+        The process is killed if the caller is cancelled, which is how a tool
+        timeout reaches it.
+        """
+        process = await asyncio.create_subprocess_exec(
+            *argv,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+        return process.returncode, stdout.decode(errors="replace"), stderr.decode(errors="replace")
+
+    async def run_container(self, docker_client, image: str, exit_codes: Sequence[int] = (0,), **kwargs) -> Dict[str, Any]:
+        """Run a detached container and wait for it off the event loop
+
+        The container is killed if the caller is cancelled, and RuntimeError is
+        raised if it exits with a status outside exit_codes, as a crashed or
+        OOM-killed tool does.
+        """
+        container = await asyncio.to_thread(docker_client.containers.run, image, detach=True, **kwargs)
+        try:
+            exited = await asyncio.to_thread(container.wait)
+        except asyncio.CancelledError:
+            await asyncio.to_thread(_kill_quietly, container)
+            raise
+        status_code = exited.get("StatusCode")
+        if status_code not in exit_codes:
+            error = (exited.get("Error") or {}).get("Message")
+            raise RuntimeError(f"{image} exited with status {status_code}" + (f": {error}" if error else ""))
+        return exited
+
+    def metrics(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+        }
+
+
+def _kill_quietly(container):
+    try:
+        container.kill()
+    except Exception:
+        # The container may already have exited and been removed
+        pass
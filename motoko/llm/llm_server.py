@@ -1,12 +1,20 @@
 from fastapi import FastAPI, HTTPException, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, validator
+import hashlib
+import json
 import os
 import ollama
 import secrets
 import logging
-from typing import Optional
+from typing import AsyncIterator, Optional
+
+from response_cache import BYPASS, ResponseCache, cache_key
+from scheduler import GenerationScheduler, SchedulerFull, Ticket
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,6 +27,32 @@ app = FastAPI(
     redoc_url=None  # Disable redoc in production
 )
 
+# Streaming generations use the async client, so that a request only holds the
+# event loop between tokens instead of a threadpool slot for the whole completion
+ollama_client = ollama.AsyncClient()
+
+# Generations wait here for a free slot on their model, API keys taking turns
+scheduler = GenerationScheduler(
+    max_in_flight_per_model=int(os.getenv("MAX_IN_FLIGHT_PER_MODEL", "1")),
+    max_queue=int(os.getenv("MAX_QUEUE", "32")),
+    max_queue_wait_seconds=float(os.getenv("MAX_QUEUE_WAIT_SECONDS", "20")),
+)
+
+# Deterministic generations are answered from here when the caller opts in
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024")),
+    ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")),
+)
+
+@app.on_event("startup")
+async def connect_response_cache():
+    # Optional: share cached responses between workers and restarts
+    redis_url = os.getenv("RESPONSE_CACHE_REDIS_URL")
+    if redis_url:
+        from redis import asyncio as aioredis
+        response_cache.redis = aioredis.from_url(redis_url, decode_responses=True)
+        logger.info("Response cache backed by Redis")
+
 # Security: API Key authentication
 security = HTTPBearer()
 API_KEY = os.getenv("LLM_API_KEY", "")
@@ -35,6 +69,18 @@ def verify_api_key(credentials: HTTPAuthorizationCredentials = Depends(security)
         )
     return True
 
+def client_key(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    """Identify the caller for fair scheduling without keeping the raw key around"""
+    return hashlib.sha256(credentials.credentials.encode()).hexdigest()[:16]
+
+def server_busy(e: SchedulerFull) -> HTTPException:
+    logger.warning(f"Rejected generate request: {e.reason}")
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server busy, please retry",
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
 # Restrictive CORS - only allow specific Jane server IPs
 ALLOWED_ORIGINS = [
     "http://192.168.1.17:3001",  # Jane production
@@ -60,6 +106,7 @@ class GenerateRequest(BaseModel):
     prompt: str
     model: str = "llama2"
     options: dict = {}
+    cache: bool = False  # Allow a cached answer even when temperature is not 0
     
     @validator('prompt')
     def validate_prompt(cls, v):
@@ -80,29 +127,45 @@ class GenerateResponse(BaseModel):
     response: str
     model_used: str
     tokens_generated: Optional[int] = None
+    cache: str = BYPASS  # hit, miss, coalesced or bypass
+
+def safe_options(options: dict) -> dict:
+    """Security: Limit options to safe parameters"""
+    return {
+        "temperature": options.get("temperature", 0.7),
+        "top_p": options.get("top_p", 0.9),
+        "max_tokens": min(options.get("max_tokens", 1000), 2000)  # Cap at 2000
+    }
+
+async def run_generation(req: GenerateRequest, options: dict, key: str) -> dict:
+    # Call Ollama API (assumes Ollama is running locally or in Docker)
+    async with scheduler.slot(req.model, key):
+        result = await run_in_threadpool(ollama.generate, model=req.model, prompt=req.prompt, options=options)
+    
+    logger.info("Successfully generated response from Ollama")
+    return {
+        "response": result["response"],
+        "model_used": req.model,
+        "tokens_generated": result.get("eval_count")
+    }
 
 @app.post("/generate", response_model=GenerateResponse)
-def generate_text(req: GenerateRequest, authenticated: bool = Depends(verify_api_key)):
+async def generate_text(req: GenerateRequest, authenticated: bool = Depends(verify_api_key), key: str = Depends(client_key)):
     try:
         logger.info(f"Received generate request for model: {req.model}")
         logger.info(f"Prompt length: {len(req.prompt)} characters")
         
-        # Security: Limit options to safe parameters
-        safe_options = {
-            "temperature": req.options.get("temperature", 0.7),
-            "top_p": req.options.get("top_p", 0.9),
-            "max_tokens": min(req.options.get("max_tokens", 1000), 2000)  # Cap at 2000
-        }
-        
-        # Call Ollama API (assumes Ollama is running locally or in Docker)
-        result = ollama.generate(model=req.model, prompt=req.prompt, options=safe_options)
-        
-        logger.info("Successfully generated response from Ollama")
-        return {
-            "response": result["response"],
-            "model_used": req.model,
-            "tokens_generated": result.get("eval_count")
-        }
+        options = safe_options(req.options)
+        if response_cache.enabled and (options["temperature"] == 0 or req.cache):
+            result, outcome = await response_cache.get_or_generate(
+                cache_key(req.model, req.prompt, options),
+                lambda: run_generation(req, options, key)
+            )
+            logger.info(f"Response cache {outcome}")
+            return {**result, "cache": outcome}
+        return await run_generation(req, options, key)
+    except SchedulerFull as e:
+        raise server_busy(e)
     except ollama.ResponseError as e:
         logger.error(f"Ollama API error: {e}")
         raise HTTPException(status_code=502, detail="Ollama service error")
@@ -110,6 +173,62 @@ def generate_text(req: GenerateRequest, authenticated: bool = Depends(verify_api
         logger.error(f"Unexpected error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+async def release_slot(ticket: Ticket):
+    # A coroutine, so that Starlette runs it on the event loop rather than in a thread
+    scheduler.release(ticket)
+
+async def stream_tokens(req: GenerateRequest, ticket: Ticket) -> AsyncIterator[str]:
+    """Yield NDJSON lines with each token as Ollama produces it, then a summary line"""
+    tokens = 0
+    stream = None
+    try:
+        stream = await ollama_client.generate(
+            model=req.model, prompt=req.prompt, options=safe_options(req.options), stream=True
+        )
+        async for chunk in stream:
+            token = chunk["response"]
+            if token:
+                tokens += 1
+                yield json.dumps({"token": token}) + "\n"
+            if chunk.get("done"):
+                yield json.dumps({
+                    "done": True,
+                    "model_used": req.model,
+                    "tokens_generated": chunk.get("eval_count") or tokens
+                }) + "\n"
+    except ollama.ResponseError as e:
+        logger.error(f"Ollama API error: {e}")
+        yield json.dumps({"error": "Ollama service error"}) + "\n"
+    finally:
+        # Runs when the client disconnects too, since the response task is then
+        # cancelled; closing the Ollama stream stops the generation upstream
+        if stream is not None:
+            await stream.aclose()
+        scheduler.release(ticket)
+        logger.info(f"Streamed {tokens} tokens from Ollama")
+
+@app.post("/generate/stream")
+async def generate_stream(req: GenerateRequest, authenticated: bool = Depends(verify_api_key), key: str = Depends(client_key)):
+    """Stream a completion as newline-delimited JSON while it is generated"""
+    logger.info(f"Received streaming generate request for model: {req.model}")
+    logger.info(f"Prompt length: {len(req.prompt)} characters")
+    try:
+        ticket = await scheduler.acquire(req.model, key)
+    except SchedulerFull as e:
+        raise server_busy(e)
+    # The slot is released when the stream ends; the background task covers a
+    # client that disconnects before the stream has started
+    return StreamingResponse(
+        stream_tokens(req, ticket),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(release_slot, ticket)
+    )
+
+@app.get("/metrics/queue")
+async def queue_metrics(authenticated: bool = Depends(verify_api_key)):
+    """Queue depth, in-flight generations, queue wait times and response cache use"""
+    return {**scheduler.metrics(), "response_cache": response_cache.metrics()}
+
 @app.get("/health")
 def health():
     try:
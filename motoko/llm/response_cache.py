@@ -0,0 +1,131 @@
+"""
+Cache of deterministic generations
+Responses are keyed on the model, the normalized prompt and the effective
+options, kept in a size and TTL bounded local store and optionally shared
+through Redis; identical requests in flight share a single generation
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HIT = "hit"
+MISS = "miss"
+COALESCED = "coalesced"
+BYPASS = "bypass"
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Ignore differences in line endings and surrounding whitespace only"""
+    return "\n".join(line.rstrip() for line in prompt.strip().splitlines())
+
+
+def cache_key(model: str, prompt: str, options: dict) -> str:
+    material = json.dumps([model, normalize_prompt(prompt), options], sort_keys=True)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class ResponseCache:
+    """LRU cache with expiry, backed by Redis when a client is given"""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        redis=None,
+        prefix: str = "motoko:response:",
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.redis = redis
+        self.prefix = prefix
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and (self.max_entries > 0 or self.redis is not None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > self._clock():
+                self._entries.move_to_end(key)
+                return entry[1]
+            del self._entries[key]
+        if self.redis is not None:
+            try:
+                cached = await self.redis.get(self.prefix + key)
+            except Exception as e:
+                logger.warning(f"Response cache lookup in Redis failed: {e}")
+                return None
+            if cached is not None:
+                value = json.loads(cached)
+                self._store_locally(key, value)
+                return value
+        return None
+
+    async def put(self, key: str, value: Dict[str, Any]):
+        self._store_locally(key, value)
+        if self.redis is not None:
+            try:
+                await self.redis.setex(self.prefix + key, int(self.ttl_seconds), json.dumps(value))
+            except Exception as e:
+                logger.warning(f"Response cache store in Redis failed: {e}")
+
+    def _store_locally(self, key: str, value: Dict[str, Any]):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (self._clock() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_generate(self, key: str, generate: Callable[[], Awaitable[Dict[str, Any]]]) -> Tuple[Dict[str, Any], str]:
+        """Return the cached response, or generate it once for all concurrent callers
+
+        The second element tells whether the response was a hit, a miss, or
+        coalesced with a generation already in flight.
+        """
+        cached = await self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached, HIT
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight), COALESCED
+        self.misses += 1
+        inflight = asyncio.ensure_future(self._generate(key, generate))
+        self._inflight[key] = inflight
+        inflight.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A client that disconnects mid-generation must not cancel the model run
+        # that the identical prompts coalesced onto it are still waiting for
+        return await asyncio.shield(inflight), MISS
+
+    async def _generate(self, key: str, generate: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        value = await generate()
+        await self.put(key, value)
+        return value
+
+    def metrics(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,190 @@
+"""
+Admission control and fair scheduling for generations
+Every model gets a fixed number of concurrent generations; requests beyond that
+wait in a bounded queue where API keys are served round-robin, and requests that
+would wait longer than callers are willing to are rejected up front
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Callable, Deque, Dict, Optional
+
+
+class SchedulerFull(Exception):
+    """Raised when a request cannot be admitted, with a retry hint in seconds"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class Ticket:
+    """A granted generation slot"""
+
+    def __init__(self, model: str, started_at: float):
+        self.model = model
+        self.started_at = started_at
+        self.released = False
+
+
+class _Waiter:
+    def __init__(self, model: str, key: str, future: asyncio.Future):
+        self.model = model
+        self.key = key
+        self.future = future
+
+
+class GenerationScheduler:
+    """Grants generation slots per model, fairly across API keys
+
+    At most max_in_flight_per_model generations of a model run at once, at most
+    max_queue requests wait in total, and none waits longer than
+    max_queue_wait_seconds. Once generation times are known, a request whose
+    estimated wait exceeds that limit is rejected without queueing.
+    """
+
+    def __init__(
+        self,
+        max_in_flight_per_model: int,
+        max_queue: int,
+        max_queue_wait_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_in_flight_per_model = max(max_in_flight_per_model, 1)
+        self.max_queue = max(max_queue, 0)
+        self.max_queue_wait_seconds = max_queue_wait_seconds
+        self._clock = clock
+        self._in_flight: Dict[str, int] = {}
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Waiter]]"] = {}
+        self._queued = 0
+        self._generation_seconds: Dict[str, float] = {}
+        self._waits: Deque[float] = deque(maxlen=1000)
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+
+    def queued(self, model: Optional[str] = None) -> int:
+        if model is None:
+            return self._queued
+        return sum(len(waiters) for waiters in self._queues.get(model, {}).values())
+
+    def in_flight(self, model: str) -> int:
+        return self._in_flight.get(model, 0)
+
+    def estimated_wait(self, model: str) -> float:
+        """Expected seconds before a request queued now would start"""
+        duration = self._generation_seconds.get(model)
+        if duration is None or self.in_flight(model) < self.max_in_flight_per_model:
+            return 0.0
+        rounds = self.queued(model) // self.max_in_flight_per_model + 1
+        return rounds * duration
+
+    def _reject(self, reason: str, retry_after: float):
+        self.rejected += 1
+        raise SchedulerFull(reason, retry_after)
+
+    def _grant(self, model: str, enqueued_at: float) -> Ticket:
+        self._in_flight[model] = self.in_flight(model) + 1
+        self.admitted += 1
+        now = self._clock()
+        self._waits.append(now - enqueued_at)
+        return Ticket(model, now)
+
+    async def acquire(self, model: str, key: str) -> Ticket:
+        """Wait for a generation slot for the model on behalf of an API key"""
+        enqueued_at = self._clock()
+        if self.in_flight(model) < self.max_in_flight_per_model and not self.queued(model):
+            return self._grant(model, enqueued_at)
+        if self._queued >= self.max_queue:
+            self._reject("queue is full", self.estimated_wait(model) or self.max_queue_wait_seconds)
+        estimate = self.estimated_wait(model)
+        if estimate > self.max_queue_wait_seconds:
+            self._reject("estimated wait is too long", estimate)
+
+        waiter = _Waiter(model, key, asyncio.get_running_loop().create_future())
+        self._queues.setdefault(model, OrderedDict()).setdefault(key, deque()).append(waiter)
+        self._queued += 1
+        try:
+            done, _ = await asyncio.wait({waiter.future}, timeout=self.max_queue_wait_seconds)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        if not done:
+            self._abandon(waiter)
+            self._reject("timed out in queue", self.estimated_wait(model) or self.max_queue_wait_seconds)
+        self._waits.append(self._clock() - enqueued_at)
+        return waiter.future.result()
+
+    def _abandon(self, waiter: _Waiter):
+        if waiter.future.done():
+            # The slot was granted just as the caller gave up
+            self.release(waiter.future.result())
+            return
+        waiter.future.cancel()
+        waiters = self._queues[waiter.model][waiter.key]
+        waiters.remove(waiter)
+        self._queued -= 1
+        if not waiters:
+            del self._queues[waiter.model][waiter.key]
+
+    def release(self, ticket: Ticket):
+        """Return a slot, handing it to the next waiting API key in turn"""
+        if ticket.released:
+            return
+        ticket.released = True
+        duration = self._clock() - ticket.started_at
+        previous = self._generation_seconds.get(ticket.model)
+        self._generation_seconds[ticket.model] = duration if previous is None else 0.8 * previous + 0.2 * duration
+        self._in_flight[ticket.model] -= 1
+        self.completed += 1
+        self._dispatch(ticket.model)
+
+    def _dispatch(self, model: str):
+        keys = self._queues.get(model)
+        while keys and self.in_flight(model) < self.max_in_flight_per_model:
+            key, waiters = next(iter(keys.items()))
+            waiter = waiters.popleft()
+            self._queued -= 1
+            if waiters:
+                keys.move_to_end(key)
+            else:
+                del keys[key]
+            self._in_flight[model] = self.in_flight(model) + 1
+            self.admitted += 1
+            waiter.future.set_result(Ticket(model, self._clock()))
+
+    @asynccontextmanager
+    async def slot(self, model: str, key: str):
+        ticket = await self.acquire(model, key)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def metrics(self) -> dict:
+        waits = sorted(self._waits)
+        models = set(self._in_flight) | set(self._queues)
+        return {
+            "queue_depth": self._queued,
+            "models": {
+                model: {
+                    "queued": self.queued(model),
+                    "in_flight": self.in_flight(model),
+                    "estimated_wait_seconds": round(self.estimated_wait(model), 3),
+                }
+                for model in sorted(models)
+            },
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "wait_seconds": {
+                "count": len(waits),
+                "mean": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 4) if waits else 0.0,
+                "max": round(waits[-1], 4) if waits else 0.0,
+            },
+        }
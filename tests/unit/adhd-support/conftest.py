@@ -0,0 +1,248 @@
+"""
+Shared fixtures for adhd-support unit tests
+Redis, PostgreSQL and WebSocket clients are replaced by small in-memory fakes so that the
+service logic can be exercised without running containers or a browser
+"""
+
+import asyncio
+import importlib
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import pytest
+
+ADHD_SUPPORT_DIR = Path(__file__).resolve().parents[3] / "Jane" / "adhd-support"
+sys.path.insert(0, str(ADHD_SUPPORT_DIR))
+
+
+class FakePubSub:
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.channels = set()
+
+    async def subscribe(self, *channels):
+        for channel in channels:
+            self.channels.add(channel)
+            self.redis.subscribers.setdefault(channel, []).append(self)
+            await self.queue.put({"type": "subscribe", "channel": channel, "data": 1})
+
+    async def unsubscribe(self, *channels):
+        for channel in channels or list(self.channels):
+            self.channels.discard(channel)
+            if self in self.redis.subscribers.get(channel, []):
+                self.redis.subscribers[channel].remove(self)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def close(self):
+        await self.unsubscribe()
+
+
+class FakePipeline:
+    """Queues commands and runs them on execute, like a redis.asyncio pipeline"""
+
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self.redis, name)
+
+        def queue(*args, **kwargs):
+            self.commands.append((method, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self):
+        results = [await method(*args, **kwargs) for method, args, kwargs in self.commands]
+        self.commands = []
+        return results
+
+
+class FakeRedis:
+    """Subset of the redis.asyncio client used by the ADHD support service"""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.zsets = {}
+        self.subscribers = {}
+        self.calls = []
+
+    def _get(self, key):
+        if key in self.expires and self.expires[key] <= time.time():
+            self.data.pop(key, None)
+            del self.expires[key]
+        return self.data.get(key)
+
+    async def get(self, key):
+        self.calls.append(("get", key))
+        return self._get(key)
+
+    async def mget(self, keys):
+        self.calls.append(("mget", tuple(keys)))
+        return [self._get(key) for key in keys]
+
+    async def setex(self, key, seconds, value):
+        self.calls.append(("setex", key))
+        self.data[key] = value
+        self.expires[key] = time.time() + seconds
+        return True
+
+    async def delete(self, *keys):
+        self.calls.append(("delete", keys))
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    async def lpush(self, key, *values):
+        self.calls.append(("lpush", key))
+        items = self.data.setdefault(key, [])
+        for value in values:
+            items.insert(0, value)
+        return len(items)
+
+    async def ltrim(self, key, start, end):
+        self.calls.append(("ltrim", key))
+        self.data[key] = self.data.get(key, [])[start:None if end == -1 else end + 1]
+        return True
+
+    async def keys(self, pattern):
+        raise AssertionError("KEYS blocks Redis and must not be used")
+
+    async def zadd(self, key, mapping):
+        self.calls.append(("zadd", key))
+        zset = self.zsets.setdefault(key, {})
+        added = sum(1 for member in mapping if member not in zset)
+        zset.update(mapping)
+        return added
+
+    async def zrem(self, key, *members):
+        self.calls.append(("zrem", key))
+        zset = self.zsets.get(key, {})
+        return sum(1 for member in members if zset.pop(member, None) is not None)
+
+    async def zremrangebyscore(self, key, minimum, maximum):
+        self.calls.append(("zremrangebyscore", key))
+        zset = self.zsets.get(key, {})
+        removed = [member for member, score in zset.items() if float(minimum) <= score <= float(maximum)]
+        for member in removed:
+            del zset[member]
+        return len(removed)
+
+    async def zrange(self, key, start, end):
+        self.calls.append(("zrange", key))
+        members = sorted(self.zsets.get(key, {}).items(), key=lambda item: item[1])
+        return [member for member, _ in members[start:None if end == -1 else end + 1]]
+
+    async def zcard(self, key):
+        self.calls.append(("zcard", key))
+        return len(self.zsets.get(key, {}))
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def publish(self, channel, message):
+        self.calls.append(("publish", channel))
+        receivers = self.subscribers.get(channel, [])
+        for pubsub in receivers:
+            await pubsub.queue.put({"type": "message", "channel": channel, "data": message})
+        return len(receivers)
+
+    async def ping(self):
+        return True
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+
+class FakeWebSocket:
+    """Records the frames sent to it, optionally taking a while to send each one"""
+
+    def __init__(self, send_delay: float = 0.0, blocked: bool = False):
+        self.send_delay = send_delay
+        self.blocked = blocked
+        self.accepted = False
+        self.closed_with = None
+        self.sent = []
+        self.received = asyncio.Event()
+        self.expected = 0
+
+    async def accept(self):
+        self.accepted = True
+
+    async def send_text(self, text):
+        if self.blocked:
+            await asyncio.Event().wait()
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+        self.sent.append(text)
+        if len(self.sent) >= self.expected:
+            self.received.set()
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+    def expect(self, count: int):
+        self.expected = count
+        self.received.clear()
+        if len(self.sent) >= count:
+            self.received.set()
+
+
+class FakeConnection:
+    def __init__(self, database: "FakeDatabase"):
+        self.database = database
+
+    async def fetchval(self, query, *args):
+        return self.database.handle("fetchval", query, args)
+
+    async def fetchrow(self, query, *args):
+        return self.database.handle("fetchrow", query, args)
+
+    async def fetch(self, query, *args):
+        return self.database.handle("fetch", query, args)
+
+    async def execute(self, query, *args):
+        return self.database.handle("execute", query, args)
+
+
+class FakeDatabase:
+    """asyncpg pool stand-in answering queries through a handler callable"""
+
+    def __init__(self, handler=None):
+        self.handler = handler or (lambda method, query, args: None)
+        self.queries = []
+
+    def handle(self, method, query, args):
+        self.queries.append((method, " ".join(query.split()), args))
+        return self.handler(method, query, args)
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield FakeConnection(self)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture(scope="session")
+def adhd_main(tmp_path_factory):
+    """Import the service module with its log file redirected to a temporary directory"""
+    previous = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("adhd-support"))
+    try:
+        return importlib.import_module("main")
+    finally:
+        os.chdir(previous)
@@ -0,0 +1,119 @@
+"""
+Local stand-in for the Motoko LLM server
+Answers /generate after a configurable delay, streams /generate/stream one token
+per delay, and records how it was called, so that connection reuse, concurrency
+limits and stream cancellation can be observed from the outside
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeMotokoServer:
+    def __init__(self, delay_seconds: float = 0.0, healthy: bool = True, tokens=("Hello", ",", " world")):
+        self.delay_seconds = delay_seconds
+        self.healthy = healthy
+        self.tokens = list(tokens)
+        self.tokens_sent = 0
+        self.streams_completed = 0
+        self.streams_aborted = 0
+        self.payloads = []
+        self.connections = 0
+        self.generations = 0
+        self.health_checks = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, body: dict):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                if self.path != "/health":
+                    return self._reply(404, {"detail": "Not Found"})
+                with fake._lock:
+                    fake.health_checks += 1
+                self._reply(200 if fake.healthy else 503, {"status": "healthy" if fake.healthy else "unhealthy"})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                fake.payloads.append(body)
+                if self.path == "/generate/stream":
+                    return self._stream()
+                if self.path != "/generate":
+                    return self._reply(404, {"detail": "Not Found"})
+                with fake._lock:
+                    fake.generations += 1
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    time.sleep(fake.delay_seconds)
+                    self._reply(200, {"response": f"echo: {body['prompt'][-20:]}"})
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+
+            def _chunk(self, line: dict):
+                payload = (json.dumps(line) + "\n").encode()
+                self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+                self.wfile.flush()
+
+            def _stream(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for token in fake.tokens:
+                        time.sleep(fake.delay_seconds)
+                        self._chunk({"token": token})
+                        with fake._lock:
+                            fake.tokens_sent += 1
+                    self._chunk({"done": True, "model_used": "llama2", "tokens_generated": len(fake.tokens)})
+                    self.wfile.write(b"0\r\n\r\n")
+                    with fake._lock:
+                        fake.streams_completed += 1
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client went away, a real server stops generating here
+                    with fake._lock:
+                        fake.streams_aborted += 1
+                    self.close_connection = True
+
+        return Handler
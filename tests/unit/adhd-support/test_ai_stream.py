@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+from conftest import FakeRedis, FakeWebSocket
+from connection_manager import ConnectionManager
+from fake_motoko import FakeMotokoServer
+from motoko_client import MotokoClient
+
+
+def make_service(adhd_main, server, **options):
+    service = adhd_main.ADHDSupportService()
+    service.redis_pool = FakeRedis()
+    options.setdefault("max_concurrency", 1)
+    options.setdefault("max_queue", 0)
+    options.setdefault("queue_timeout_seconds", 1)
+    service.motoko_client = MotokoClient(server.url, **options)
+    return service
+
+
+def test_stream_yields_tokens_and_remembers_the_exchange(adhd_main):
+    async def scenario():
+        with FakeMotokoServer() as server:
+            service = make_service(adhd_main, server)
+            request = adhd_main.AIRequest(prompt="Plan my day", conversation_id="c1")
+            tokens = [token async for token in service.stream_ai(request)]
+            await service.motoko_client.aclose()
+            return tokens, server.payloads, service.redis_pool.data["conversation:c1"]
+
+    tokens, payloads, conversation = asyncio.run(scenario())
+    assert tokens == ["Hello", ",", " world"]
+    assert "Plan my day" in payloads[0]["prompt"]
+    assert payloads[0]["options"] == {"max_tokens": 500, "temperature": 0.7}
+    assert json.loads(conversation[0])["response"] == "Hello, world"
+
+
+def test_stream_is_relayed_to_the_asking_socket(adhd_main, monkeypatch):
+    async def scenario():
+        with FakeMotokoServer() as server:
+            manager = ConnectionManager()
+            monkeypatch.setattr(adhd_main, "manager", manager)
+            monkeypatch.setattr(adhd_main, "adhd_service", make_service(adhd_main, server))
+            asking, other = FakeWebSocket(), FakeWebSocket()
+            await manager.connect(asking, "alice")
+            await manager.connect(other, "alice")
+            await adhd_main.relay_ai_stream(asking, {"type": "ask", "content": "Plan my day", "request_id": "r1"})
+            await asyncio.sleep(0.05)
+            await manager.close_all()
+            await adhd_main.adhd_service.motoko_client.aclose()
+            return [json.loads(text) for text in asking.sent], other.sent
+
+    messages, other_messages = asyncio.run(scenario())
+    assert [message["type"] for message in messages] == ["ai_token", "ai_token", "ai_token", "ai_done"]
+    assert "".join(message.get("token", "") for message in messages) == "Hello, world"
+    assert all(message["request_id"] == "r1" for message in messages)
+    assert other_messages == []
+
+
+def test_cancelled_relay_stops_generation(adhd_main, monkeypatch):
+    async def scenario():
+        with FakeMotokoServer(delay_seconds=0.02, tokens=[f"t{i} " for i in range(100)]) as server:
+            manager = ConnectionManager()
+            service = make_service(adhd_main, server)
+            monkeypatch.setattr(adhd_main, "manager", manager)
+            monkeypatch.setattr(adhd_main, "adhd_service", service)
+            websocket = FakeWebSocket()
+            await manager.connect(websocket, "alice")
+            websocket.expect(3)
+            relay = asyncio.create_task(adhd_main.relay_ai_stream(websocket, {"type": "ask", "content": "Tell me a story"}))
+            await asyncio.wait_for(websocket.received.wait(), 5)
+            relay.cancel()
+            await asyncio.gather(relay, return_exceptions=True)
+            assert service.motoko_client.running == 0
+            await asyncio.sleep(0.3)
+            await manager.close_all()
+            await service.motoko_client.aclose()
+            return server.tokens_sent, server.streams_aborted, server.streams_completed
+
+    tokens_sent, aborted, completed = asyncio.run(scenario())
+    assert aborted == 1
+    assert completed == 0
+    assert tokens_sent < 50
+
+
+def test_busy_motoko_is_reported_on_the_socket(adhd_main, monkeypatch):
+    async def scenario():
+        with FakeMotokoServer(delay_seconds=0.1) as server:
+            manager = ConnectionManager()
+            service = make_service(adhd_main, server)
+            monkeypatch.setattr(adhd_main, "manager", manager)
+            monkeypatch.setattr(adhd_main, "adhd_service", service)
+            first, second = FakeWebSocket(), FakeWebSocket()
+            await manager.connect(first, "alice")
+            await manager.connect(second, "bob")
+            await asyncio.gather(
+                adhd_main.relay_ai_stream(first, {"type": "ask", "content": "one"}),
+                adhd_main.relay_ai_stream(second, {"type": "ask", "content": "two"}),
+            )
+            await asyncio.sleep(0.05)
+            await manager.close_all()
+            await service.motoko_client.aclose()
+            return [json.loads(text) for text in first.sent], [json.loads(text) for text in second.sent]
+
+    first, second = asyncio.run(scenario())
+    assert first[-1]["type"] == "ai_done"
+    assert second == [{"type": "ai_error", "request_id": None, "message": "AI service is busy, please retry"}]
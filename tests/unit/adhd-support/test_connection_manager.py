@@ -0,0 +1,179 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from loguru import logger
+
+import connection_manager
+from conftest import FakeRedis, FakeWebSocket
+from connection_manager import DISCONNECT, DROP_NEWEST, DROP_OLDEST, TRY_AGAIN_LATER, ConnectionManager
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_broadcast_serializes_once(monkeypatch):
+    async def scenario():
+        dumps = []
+        original = json.dumps
+        monkeypatch.setattr(connection_manager.json, "dumps", lambda *args, **kwargs: dumps.append(args) or original(*args, **kwargs))
+        manager = ConnectionManager()
+        sockets = [FakeWebSocket() for _ in range(10)]
+        for i, websocket in enumerate(sockets):
+            await manager.connect(websocket, f"user-{i}")
+        await manager.broadcast({"type": "chat", "message": "hello"})
+        await settle()
+        assert len(dumps) == 1
+        assert all(websocket.sent == ['{"type": "chat", "message": "hello"}'] for websocket in sockets)
+
+    asyncio.run(scenario())
+
+
+def test_users_can_have_several_sockets():
+    async def scenario():
+        manager = ConnectionManager()
+        laptop, phone, other = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        await manager.connect(laptop, "alice")
+        await manager.connect(phone, "alice")
+        await manager.connect(other, "bob")
+        await manager.send_personal_message({"type": "reminder"}, "alice")
+        await settle()
+        assert len(laptop.sent) == len(phone.sent) == 1
+        assert other.sent == []
+        manager.disconnect(laptop, "alice")
+        manager.disconnect(laptop, "alice")
+        assert len(manager.user_connections["alice"]) == 1
+        manager.disconnect(phone, "alice")
+        assert "alice" not in manager.user_connections
+        await manager.close_all()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("policy,expected", [(DROP_OLDEST, ["7", "8", "9"]), (DROP_NEWEST, ["1", "2", "3"])])
+def test_slow_consumer_drops_messages(policy, expected):
+    async def scenario():
+        manager = ConnectionManager(queue_size=3, slow_consumer_policy=policy)
+        slow, fast = FakeWebSocket(blocked=True), FakeWebSocket()
+        await manager.connect(slow, "slow")
+        await manager.connect(fast, "fast")
+        await manager.broadcast("0")
+        await settle()
+        for i in range(1, 10):
+            await manager.broadcast(str(i))
+            await settle()
+        assert len(fast.sent) == 10
+        connection = manager.connections[slow]
+        queued = [json.loads(connection.queue.get_nowait()) for _ in range(connection.queue.qsize())]
+        assert queued == expected
+        assert connection.dropped == 6
+        assert manager.dropped_messages == 6
+        await manager.close_all()
+
+    asyncio.run(scenario())
+
+
+def test_slow_consumer_is_disconnected():
+    async def scenario():
+        manager = ConnectionManager(queue_size=2, slow_consumer_policy=DISCONNECT)
+        slow, fast = FakeWebSocket(blocked=True), FakeWebSocket()
+        await manager.connect(slow, "slow")
+        await manager.connect(fast, "fast")
+        for i in range(5):
+            await manager.broadcast(i)
+            await settle()
+        assert slow not in manager.connections
+        assert "slow" not in manager.user_connections
+        assert slow.closed_with == TRY_AGAIN_LATER
+        assert not manager._closing
+        assert manager.slow_disconnects == 1
+        assert len(fast.sent) == 5
+
+    asyncio.run(scenario())
+
+
+def test_stalled_send_times_out():
+    async def scenario():
+        manager = ConnectionManager(send_timeout_seconds=0.05)
+        stalled = FakeWebSocket(blocked=True)
+        await manager.connect(stalled, "stalled")
+        await manager.broadcast({"type": "chat"})
+        await asyncio.sleep(0.1)
+        assert stalled not in manager.connections
+        assert stalled.closed_with == TRY_AGAIN_LATER
+
+    asyncio.run(scenario())
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        ConnectionManager(slow_consumer_policy="ignore")
+
+
+def test_messages_are_relayed_across_workers():
+    async def scenario():
+        redis = FakeRedis()
+        first, second = ConnectionManager(), ConnectionManager()
+        first.start_relay(redis)
+        second.start_relay(redis)
+        await settle()
+        on_first, on_second = FakeWebSocket(), FakeWebSocket()
+        await first.connect(on_first, "alice")
+        await second.connect(on_second, "bob")
+        await first.broadcast({"type": "chat", "message": "hi"})
+        await second.send_personal_message({"type": "reminder"}, "alice")
+        await settle()
+        assert [json.loads(text) for text in on_first.sent] == [{"type": "chat", "message": "hi"}, {"type": "reminder"}]
+        assert [json.loads(text) for text in on_second.sent] == [{"type": "chat", "message": "hi"}]
+        await first.stop_relay()
+        await second.stop_relay()
+        assert not redis.subscribers[connection_manager.BROADCAST_CHANNEL]
+
+    asyncio.run(scenario())
+
+
+def test_broadcast_benchmark():
+    """Benchmark: thousands of clients, some of them stuck, keep receiving every message"""
+    clients, stuck, messages = 5000, 50, 20
+
+    async def scenario():
+        manager = ConnectionManager(queue_size=messages, slow_consumer_policy=DROP_OLDEST, send_timeout_seconds=30)
+        sockets = [FakeWebSocket(send_delay=0.001) for _ in range(clients - stuck)]
+        for i, websocket in enumerate(sockets + [FakeWebSocket(blocked=True) for _ in range(stuck)]):
+            await manager.connect(websocket, f"user-{i % 1000}")
+        for websocket in sockets:
+            websocket.expect(messages)
+        start = time.perf_counter()
+        broadcast_times = []
+        for i in range(messages):
+            broadcast_start = time.perf_counter()
+            await manager.broadcast({"type": "chat", "message": f"message {i}"})
+            broadcast_times.append(time.perf_counter() - broadcast_start)
+            await asyncio.sleep(0)
+        await asyncio.wait_for(asyncio.gather(*(websocket.received.wait() for websocket in sockets)), 30)
+        delivered = time.perf_counter() - start
+        await manager.close_all()
+        return max(broadcast_times), delivered
+
+    logger.disable("connection_manager")
+    try:
+        slowest_broadcast, delivered = asyncio.run(scenario())
+    finally:
+        logger.enable("connection_manager")
+    print(f"{clients} clients ({stuck} stuck): slowest broadcast call {slowest_broadcast * 1e3:.2f} ms, {messages} messages delivered to every live client in {delivered:.2f} s")
+    assert slowest_broadcast < 1
+    assert delivered < 10
+
+
+def test_chat_websocket_endpoint(adhd_main):
+    client = TestClient(adhd_main.app)
+    with client.websocket_connect("/ws/chat/alice") as websocket:
+        websocket.send_text(json.dumps({"type": "chat", "content": "hello"}))
+        message = websocket.receive_json()
+        assert message["type"] == "chat"
+        assert message["user_id"] == "alice"
+        assert message["message"] == "hello"
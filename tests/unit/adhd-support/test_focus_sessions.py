@@ -0,0 +1,70 @@
+import asyncio
+import json
+import time
+import uuid
+
+from conftest import FakeDatabase, FakeRedis
+
+
+def make_service(adhd_main):
+    def handler(method, query, args):
+        if "INSERT INTO focus_sessions" in query:
+            return {"id": uuid.uuid4()}
+        return None
+
+    service = adhd_main.ADHDSupportService()
+    service.redis_pool = FakeRedis()
+    service.db_pool = FakeDatabase(handler)
+    return service
+
+
+def test_active_sessions_are_indexed(adhd_main):
+    async def scenario():
+        service = make_service(adhd_main)
+        started = [await service.start_focus_session(adhd_main.FocusSession(duration_minutes=25 + i)) for i in range(3)]
+        assert await service.count_active_sessions() == 3
+        sessions = await service.get_active_sessions()
+        assert [session["id"] for session in sessions] == [session.id for session in started]
+        assert sessions[0]["duration_minutes"] == 25
+        assert len([call for call in service.redis_pool.calls if call[0] in ("get", "mget")]) == 1
+
+    asyncio.run(scenario())
+
+
+def test_expired_and_evicted_sessions_are_cleaned_up(adhd_main):
+    async def scenario():
+        service = make_service(adhd_main)
+        redis = service.redis_pool
+        active = await service.start_focus_session(adhd_main.FocusSession())
+        evicted = await service.start_focus_session(adhd_main.FocusSession())
+        await redis.delete(f"active_session:{evicted.id}")
+        redis.zsets[adhd_main.ACTIVE_SESSIONS_KEY]["expired"] = time.time() - 1
+        assert await service.count_active_sessions() == 2
+        assert "expired" not in redis.zsets[adhd_main.ACTIVE_SESSIONS_KEY]
+        sessions = await service.get_active_sessions()
+        assert [session["id"] for session in sessions] == [active.id]
+        assert list(redis.zsets[adhd_main.ACTIVE_SESSIONS_KEY]) == [active.id]
+        assert await service.count_active_sessions() == 1
+
+    asyncio.run(scenario())
+
+
+def test_no_active_sessions(adhd_main):
+    async def scenario():
+        service = make_service(adhd_main)
+        assert await service.get_active_sessions() == []
+        assert await service.count_active_sessions() == 0
+        assert not any(call[0] == "mget" for call in service.redis_pool.calls)
+
+    asyncio.run(scenario())
+
+
+def test_stored_session_is_json(adhd_main):
+    async def scenario():
+        service = make_service(adhd_main)
+        session = await service.start_focus_session(adhd_main.FocusSession(notes="deep work"))
+        stored = json.loads(service.redis_pool.data[f"active_session:{session.id}"])
+        assert stored["notes"] == "deep work"
+        assert stored["started_at"]
+
+    asyncio.run(scenario())
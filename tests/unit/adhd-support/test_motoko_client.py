@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from fake_motoko import FakeMotokoServer
+from motoko_client import MotokoBusy, MotokoClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def make_service(adhd_main, server, **options):
+    service = adhd_main.ADHDSupportService()
+    options.setdefault("max_concurrency", 2)
+    options.setdefault("max_queue", 8)
+    options.setdefault("queue_timeout_seconds", 5)
+    service.motoko_client = MotokoClient(server.url, **options)
+    return service
+
+
+def test_connections_are_reused(adhd_main):
+    async def scenario():
+        with FakeMotokoServer() as server:
+            service = make_service(adhd_main, server)
+            for i in range(10):
+                result = await service.ask_ai(adhd_main.AIRequest(prompt=f"question {i}"))
+                assert result["response"].startswith("echo:")
+            await service.motoko_client.aclose()
+            return server.generations, server.connections
+
+    generations, connections = asyncio.run(scenario())
+    assert generations == 10
+    assert connections == 1
+
+
+def test_concurrent_generations_are_capped(adhd_main):
+    async def scenario():
+        with FakeMotokoServer(delay_seconds=0.1) as server:
+            service = make_service(adhd_main, server, max_concurrency=2)
+            results = await asyncio.gather(*(service.ask_ai(adhd_main.AIRequest(prompt=f"q{i}")) for i in range(6)))
+            await service.motoko_client.aclose()
+            return results, server.max_in_flight
+
+    results, max_in_flight = asyncio.run(scenario())
+    assert len(results) == 6
+    assert max_in_flight == 2
+
+
+def test_excess_generations_are_shed(adhd_main):
+    async def scenario():
+        with FakeMotokoServer(delay_seconds=0.2) as server:
+            service = make_service(adhd_main, server, max_concurrency=1, max_queue=1)
+            results = await asyncio.gather(
+                *(service.ask_ai(adhd_main.AIRequest(prompt=f"q{i}")) for i in range(3)),
+                return_exceptions=True,
+            )
+            await service.motoko_client.aclose()
+            return results, server.generations
+
+    results, generations = asyncio.run(scenario())
+    errors = [result for result in results if isinstance(result, HTTPException)]
+    assert len(errors) == 1
+    assert errors[0].status_code == 503
+    assert errors[0].headers["Retry-After"] == "1"
+    assert generations == 2
+
+
+def test_queue_timeout():
+    async def scenario():
+        with FakeMotokoServer(delay_seconds=0.3) as server:
+            client = MotokoClient(server.url, max_concurrency=1, max_queue=4, queue_timeout_seconds=0.05)
+            running = asyncio.create_task(client.generate({"prompt": "a"}))
+            await asyncio.sleep(0.01)
+            assert client.running == 1
+            with pytest.raises(MotokoBusy):
+                await client.generate({"prompt": "b"})
+            assert (await running).status_code == 200
+            await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_slow_generation_times_out(adhd_main):
+    async def scenario():
+        with FakeMotokoServer(delay_seconds=0.3) as server:
+            service = make_service(adhd_main, server, generate_timeout_seconds=0.05)
+            with pytest.raises(HTTPException) as error:
+                await service.ask_ai(adhd_main.AIRequest(prompt="slow"))
+            await service.motoko_client.aclose()
+            return error.value.status_code
+
+    assert asyncio.run(scenario()) == 408
+
+
+def test_health_is_cached():
+    async def scenario():
+        clock = FakeClock()
+        with FakeMotokoServer() as server:
+            client = MotokoClient(server.url, max_concurrency=1, max_queue=0, queue_timeout_seconds=1, health_ttl_seconds=10, clock=clock)
+            assert all(await asyncio.gather(*(client.healthy() for _ in range(20))))
+            assert server.health_checks == 1
+            server.healthy = False
+            clock.advance(5)
+            assert await client.healthy()
+            clock.advance(6)
+            assert not await client.healthy()
+            assert server.health_checks == 2
+            await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_unreachable_motoko_is_unhealthy():
+    async def scenario():
+        with FakeMotokoServer() as server:
+            url = server.url
+        client = MotokoClient(url, max_concurrency=1, max_queue=0, queue_timeout_seconds=1, health_timeout_seconds=0.5)
+        assert not await client.healthy()
+        await client.aclose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,164 @@
+"""
+Shared fixtures for ai-workflow-fastapi unit tests
+Cards come from a generated snapshot in the format of the spellbook /cards/
+endpoint, and outgoing connections are refused so that nothing reaches a backend
+"""
+
+import importlib
+import json
+import random
+import socket
+import sys
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+AI_WORKFLOW_DIR = Path(__file__).resolve().parents[3] / "Jane" / "ai-workflow-fastapi"
+sys.path.insert(0, str(AI_WORKFLOW_DIR))
+
+LEGALITIES = ["commander", "pauperCommanderMain", "pauperCommander", "oathbreaker", "predh", "brawl", "vintage", "legacy", "premodern", "modern", "pioneer", "standard", "pauper"]
+
+STAPLES = [
+    # name, type line, identity, mana value, oracle text, price, variant count
+    ("Sol Ring", "Artifact", "C", 1, "{T}: Add {C}{C}.", 1.5, 9000),
+    ("Arcane Signet", "Artifact", "C", 2, "{T}: Add one mana of any color in your commander's color identity.", 0.5, 800),
+    ("Command Tower", "Land", "C", 0, "{T}: Add one mana of any color in your commander's color identity.", 0.3, 700),
+    ("Plains", "Basic Land — Plains", "W", 0, "({T}: Add {W}.)", 0.1, 300),
+    ("Island", "Basic Land — Island", "U", 0, "({T}: Add {U}.)", 0.1, 300),
+    ("Swamp", "Basic Land — Swamp", "B", 0, "({T}: Add {B}.)", 0.1, 300),
+    ("Mountain", "Basic Land — Mountain", "R", 0, "({T}: Add {R}.)", 0.1, 300),
+    ("Forest", "Basic Land — Forest", "G", 0, "({T}: Add {G}.)", 0.1, 300),
+    ("Cultivate", "Sorcery", "G", 3, "Search your library for up to two basic land cards, reveal those cards, put one onto the battlefield tapped and the other into your hand.", 0.4, 200),
+    ("Kodama's Reach", "Sorcery", "G", 3, "Search your library for up to two basic land cards, reveal those cards, put one onto the battlefield tapped and the other into your hand.", 0.4, 150),
+    ("Swords to Plowshares", "Instant", "W", 1, "Exile target creature. Its controller gains life equal to its power.", 2.0, 400),
+    ("Counterspell", "Instant", "U", 2, "Counter target spell.", 1.0, 500),
+    ("Demonic Tutor", "Sorcery", "B", 2, "Search your library for a card, put that card into your hand, then shuffle.", 30.0, 2000),
+    ("Lightning Greaves", "Artifact — Equipment", "C", 2, "Equipped creature has haste and shroud. Equip {0}", 3.0, 600),
+    ("Atraxa, Praetors' Voice", "Legendary Creature — Phyrexian Angel Horror", "WUBG", 4, "Flying, vigilance, deathtouch, lifelink\nAt the beginning of your end step, proliferate.", 12.0, 1200),
+    ("Lim-Dûl the Necromancer", "Legendary Creature — Human Wizard", "B", 7, "Whenever a creature an opponent controls dies, you may pay {1}{B}.", 2.0, 5),
+    ("Teferi, Temporal Archmage", "Legendary Planeswalker — Teferi", "U", 6, "Teferi, Temporal Archmage can be your commander.", 4.0, 40),
+    ("Fire // Ice", "Instant // Instant", "UR", 2, "Fire deals 2 damage divided as you choose among one or two targets.\nTap target permanent.\nDraw a card.", 0.8, 90),
+]
+
+TYPES = ["Creature — Elf", "Creature — Wizard", "Instant", "Sorcery", "Artifact", "Enchantment", "Land", "Artifact Creature — Golem", "Legendary Creature — Human"]
+TEXTS = [
+    "When this creature enters the battlefield, draw a card.",
+    "{T}: Add one mana of any color.",
+    "Destroy target creature.",
+    "Search your library for a basic land card and put it onto the battlefield tapped.",
+    "Target player draws two cards.",
+    "This land enters the battlefield tapped.",
+]
+KEYWORDS = ["Flying", "Trample", "Haste", "Deathtouch", "Lifelink", "Vigilance"]
+IDENTITIES = ["C", "W", "U", "B", "R", "G", "WU", "UB", "BR", "RG", "WG", "WB", "UR", "BG", "WUB", "BRG", "WUBRG"]
+
+
+def card_record(card_id, name, type_line, identity, mana_value, oracle_text, price, variant_count, keywords=(), legal=True):
+    """A card as the spellbook /cards/ endpoint returns it"""
+    return {
+        "id": card_id,
+        "name": name,
+        "oracleId": f"00000000-0000-0000-0000-{card_id:012d}",
+        "identity": identity,
+        "variantCount": variant_count,
+        "typeLine": type_line,
+        "oracleText": oracle_text,
+        "keywords": list(keywords),
+        "manaValue": mana_value,
+        "spoiler": False,
+        "features": [],
+        "legalities": {name: legal for name in LEGALITIES},
+        "prices": {"tcgplayer": f"{price:.2f}", "cardkingdom": f"{price:.2f}", "cardmarket": f"{price:.2f}"},
+    }
+
+
+def generate_records(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    records = [card_record(i + 1, *staple) for i, staple in enumerate(STAPLES)]
+    for card_id in range(len(records) + 1, count + 1):
+        type_line = rng.choice(TYPES)
+        records.append(card_record(
+            card_id,
+            f"Generated Card {card_id}",
+            type_line,
+            rng.choice(IDENTITIES),
+            rng.randint(0, 8),
+            rng.choice(TEXTS),
+            round(rng.uniform(0.1, 40), 2),
+            rng.randint(0, 500),
+            keywords=rng.sample(KEYWORDS, rng.randint(0, 2)) if "Creature" in type_line else (),
+            legal=rng.random() > 0.05,
+        ))
+    return records
+
+
+@pytest.fixture(scope="session")
+def snapshot_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("cards") / "cards.json"
+    path.write_text(json.dumps({"version": "2025-06-01T00:00:00+00:00", "cards": generate_records(20000)}), encoding="utf8")
+    return path
+
+
+@pytest.fixture(scope="session")
+def card_database(snapshot_path):
+    from services.card_database import CardDatabase
+
+    database = CardDatabase(str(snapshot_path))
+    database.load()
+    return database
+
+
+@pytest.fixture
+def no_network(monkeypatch):
+    """Fail any attempt to open a connection"""
+    def refuse(*args, **kwargs):
+        raise AssertionError("unexpected network access")
+
+    monkeypatch.setattr(socket.socket, "connect", refuse)
+    monkeypatch.setattr(socket, "create_connection", refuse)
+
+
+class FakeRedis:
+    """The subset of redis.asyncio.Redis used by the result cache"""
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def setex(self, key, seconds, value):
+        self.data[key] = value
+        self.expiry[key] = seconds
+
+
+class CountingCardDatabase:
+    """Wraps a card database and counts calls to each of its methods"""
+
+    def __init__(self, database):
+        self.database = database
+        self.calls = Counter()
+
+    def __getattr__(self, name):
+        attr = getattr(self.database, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self.calls[name] += 1
+            return attr(*args, **kwargs)
+        return call
+
+
+@pytest.fixture(scope="session")
+def ai_workflow_main():
+    return importlib.import_module("main")
+
+
+@pytest.fixture
+def counted_cards(ai_workflow_main, card_database, monkeypatch):
+    counting = CountingCardDatabase(card_database)
+    monkeypatch.setattr(ai_workflow_main, "card_db", counting)
+    return counting
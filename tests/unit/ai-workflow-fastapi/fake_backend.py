@@ -0,0 +1,100 @@
+"""
+Local stand-in for the spellbook backend
+Answers /variants/ and /cards/ after a configurable delay and records the queries
+it was asked and how many connections and concurrent requests it saw
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def variant(variant_id: str, card_ids, identity: str = "WUBG"):
+    return {
+        "id": variant_id,
+        "description": f"Variant {variant_id}",
+        "identity": identity,
+        "mana_value_needed": 3,
+        "popularity": 10,
+        "uses": [{"card": {"id": card_id, "name": f"Card {card_id}"}, "must_be_commander": i == 0} for i, card_id in enumerate(card_ids)],
+        "produces": [{"feature": {"id": 1, "name": "Infinite mana"}}],
+    }
+
+
+class FakeBackendServer:
+    def __init__(self, delay_seconds: float = 0.0, fail: bool = False):
+        self.delay_seconds = delay_seconds
+        self.fail = fail
+        self.variants = [variant("1-2", [1, 2]), variant("2-3", [2, 3, 4])]
+        self.cards = [{"id": 1, "name": "Card 1"}, {"id": 2, "name": "Card 2"}]
+        self.queries = []
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self) -> int:
+        return len(self.queries)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, body: dict):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {name: values[0] for name, values in parse_qs(url.query).items()}
+                with fake._lock:
+                    fake.queries.append((url.path, params))
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    time.sleep(fake.delay_seconds)
+                    if fake.fail:
+                        return self._reply(500, {"detail": "Internal Server Error"})
+                    if url.path == "/variants/":
+                        return self._reply(200, {"count": len(fake.variants), "results": fake.variants})
+                    if url.path == "/cards/":
+                        return self._reply(200, {"count": len(fake.cards), "results": fake.cards})
+                    self._reply(404, {"detail": "Not Found"})
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+
+        return Handler
@@ -0,0 +1,62 @@
+from fastapi.testclient import TestClient
+
+from services.combo_database import Combo, combo_db
+
+
+def make_combo(combo_id, card_ids):
+    return Combo(
+        id=combo_id,
+        description=f"Combo {combo_id}",
+        commander_ids=[],
+        card_ids=card_ids,
+        feature_ids=[],
+        mana_value=4,
+        power_level=6,
+        identity="WUBG",
+    )
+
+
+def test_get_and_find_cards(card_database):
+    found = card_database.get_cards([1, 2, 999999, 2])
+    assert {card_id: card.name for card_id, card in found.items()} == {1: "Sol Ring", 2: "Arcane Signet"}
+
+    found = card_database.find_cards(["sol ring", "Atraxa", "No Such Card"])
+    assert found["sol ring"].name == "Sol Ring"
+    assert found["Atraxa"].name == "Atraxa, Praetors' Voice"
+    assert "No Such Card" not in found
+
+
+def test_analysis_resolves_cards_in_one_batch(ai_workflow_main, counted_cards, no_network, monkeypatch):
+    commander_combos = [make_combo(f"c{i}", [100 + i * 5 + j for j in range(6)]) for i in range(12)]
+    related_combos = [make_combo(f"r{i}", [1, 2, 300 + i]) for i in range(3)]
+    asked_with = []
+
+    async def find_combos_for_commander(commander_id):
+        return commander_combos
+
+    async def find_combos_with_cards(card_ids):
+        asked_with.append(card_ids)
+        return related_combos
+
+    async def get_combo_pieces_for_colors(colors):
+        return list(range(1, 20))
+
+    monkeypatch.setattr(combo_db, "find_combos_for_commander", find_combos_for_commander)
+    monkeypatch.setattr(combo_db, "find_combos_with_cards", find_combos_with_cards)
+    monkeypatch.setattr(combo_db, "get_combo_pieces_for_colors", get_combo_pieces_for_colors)
+
+    response = TestClient(ai_workflow_main.app).post("/api/ai/analyze-combos", json={
+        "commander": "Atraxa",
+        "cards": ["Sol Ring", "Demonic Tutor", "Not A Card", "Counterspell"],
+    })
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert counted_cards.calls == {"find_commander": 1, "find_cards": 1, "get_cards": 1}
+    assert asked_with == [[1, 13, 12]]
+    assert body["total_combos_found"] == 15
+    assert len(body["commander_combos"]) == 10
+    assert body["commander_combos"][0]["cards"] == [counted_cards.get(100 + j).name for j in range(5)]
+    assert body["related_combos"][0]["cards"] == ["Sol Ring", "Arcane Signet", "Generated Card 300"]
+    assert body["combo_pieces"][:3] == ["Sol Ring", "Arcane Signet", "Command Tower"]
+    assert len(body["combo_pieces"]) == 10
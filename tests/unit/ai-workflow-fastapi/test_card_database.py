@@ -0,0 +1,99 @@
+import gzip
+import json
+import sys
+import time
+
+import pytest
+
+from conftest import card_record
+from services.card_database import CardDatabase, Query
+from services.recommendation_engine import CardRecommendationEngine
+
+# The package re-exports the engine singleton under the module's name
+engine_module = sys.modules["services.recommendation_engine"]
+
+
+def names(cards):
+    return [card.name for card in cards]
+
+
+def test_snapshot_records_are_parsed(card_database):
+    assert card_database.version == "2025-06-01T00:00:00+00:00"
+    assert len(card_database) == 20000
+    atraxa = card_database.find_card("atraxa, praetors' voice")
+    assert atraxa.identity == "WUBG"
+    assert atraxa.colors == ["W", "U", "B", "G"]
+    assert atraxa.mana_value == 4
+    assert atraxa.price_tcgplayer == 12.0
+    assert atraxa.legalities["pauper_commander_main"] is True
+
+
+def test_find_commander(card_database, no_network):
+    assert card_database.find_commander("Atraxa").name == "Atraxa, Praetors' Voice"
+    assert card_database.find_commander("lim-dul the necromancer").name == "Lim-Dûl the Necromancer"
+    assert card_database.find_commander("Teferi").name == "Teferi, Temporal Archmage"
+    assert card_database.find_commander("Sol Ring") is None
+    assert card_database.find_commander("Nobody") is None
+
+
+def test_search_syntax(card_database, no_network):
+    assert names(card_database.search_cards("Sol Ring", 10)) == ["Sol Ring"]
+    assert names(card_database.search_cards("Kodama's Reach", 1)) == ["Kodama's Reach"]
+    assert names(card_database.search_cards('name:"Fire"', 1)) == ["Fire // Ice"]
+    assert names(card_database.search_cards("id:1", 1)) == ["Sol Ring"]
+
+    tutors = card_database.search_cards('oracle:"search your library" type:sorcery', 50)
+    assert "Demonic Tutor" in names(tutors)
+    assert all("search your library" in card.oracle_text.lower() and "Sorcery" in card.type_line for card in tutors)
+
+    azorius = card_database.search_cards("type:creature legal:commander identity:WU", 500)
+    assert azorius
+    assert all(set(card.identity) <= {"W", "U", "C"} and card.legalities["commander"] for card in azorius)
+
+    cheap = card_database.search_cards("type:artifact usd<=1 mv>=2", 500)
+    assert cheap
+    assert all(card.price_tcgplayer <= 1 and card.mana_value >= 2 for card in cheap)
+
+    flyers = card_database.search_cards("keyword:flying", 20)
+    assert all("Flying" in card.keywords for card in flyers)
+
+
+def test_results_are_ordered_by_popularity(card_database):
+    lands = card_database.search_cards("type:land", 50)
+    counts = [card.variant_count for card in lands]
+    assert counts == sorted(counts, reverse=True)
+
+
+def test_gzipped_snapshot_and_missing_snapshot(tmp_path):
+    path = tmp_path / "cards.json.gz"
+    with gzip.open(path, "wt", encoding="utf8") as f:
+        json.dump([card_record(1, "Sol Ring", "Artifact", "C", 1, "{T}: Add {C}{C}.", 1.5, 10)], f)
+    assert CardDatabase(str(path)).search_cards("sol ring", 1)[0].id == 1
+    assert len(CardDatabase(str(tmp_path / "missing.json"))) == 0
+
+
+def test_100_card_build_is_local_and_fast(card_database, no_network, monkeypatch):
+    monkeypatch.setattr(engine_module, "card_db", card_database)
+    engine = CardRecommendationEngine()
+    commander = card_database.find_commander("Atraxa")
+
+    for strategy in ("balanced", "aggro", "control", "combo"):
+        card_database._search.cache_clear()
+        start = time.perf_counter()
+        result = engine.recommend_deck_with_combos(commander, strategy, "casual")
+        elapsed = time.perf_counter() - start
+        assert len(result.recommended_cards) == 99
+        assert all(set(card.colors) <= set(commander.colors) for card in result.recommended_cards)
+        assert elapsed < 0.1, f"a {strategy} 100-card build took {elapsed * 1000:.1f}ms"
+
+
+@pytest.mark.parametrize("query", ["", "   ", "type:", 'oracle:"'])
+def test_odd_queries_do_not_fail(card_database, query):
+    card_database.search_cards(query, 5)
+
+
+@pytest.mark.parametrize("query", ["mv:abc", "usd<cheap", "sol ring mv>=two"])
+def test_malformed_numeric_terms_are_name_text(card_database, query):
+    parsed = Query(query)
+    assert parsed.name_phrase == query and not parsed.filters and not parsed.price
+    assert card_database.search_cards(query, 5) == []
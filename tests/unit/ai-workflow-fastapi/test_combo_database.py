@@ -0,0 +1,123 @@
+import asyncio
+import time
+
+from fake_backend import FakeBackendServer
+from services.combo_database import ComboDatabaseService, normalize_request
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def test_request_key_ignores_order_case_and_spacing():
+    assert normalize_request("/variants/", {"q": "Card:1  identity:WU", "limit": 50}) == normalize_request("variants", {"limit": "50", "q": "card:1 identity:wu"})
+    assert normalize_request("/variants/", {"q": "card:1"}) != normalize_request("/cards/", {"q": "card:1"})
+
+
+def test_independent_lookups_run_concurrently_over_a_pool():
+    async def scenario(url):
+        combos = ComboDatabaseService(url, max_connections=4)
+        try:
+            start = time.perf_counter()
+            commander_combos, pieces, staples = await asyncio.gather(
+                combos.find_combos_for_commander(1),
+                combos.get_combo_pieces_for_colors(["W", "U"]),
+                combos.get_meta_staples(["W", "U"]),
+            )
+            elapsed = time.perf_counter() - start
+            again = [await combos.find_combos_with_cards([2, 3]) for _ in range(3)]
+            return commander_combos, pieces, staples, elapsed, again
+        finally:
+            await combos.aclose()
+
+    with FakeBackendServer(delay_seconds=0.2) as backend:
+        commander_combos, pieces, staples, elapsed, again = asyncio.run(scenario(backend.url))
+        assert [combo.id for combo in commander_combos] == ["1-2", "2-3"]
+        assert commander_combos[0].commander_ids == [1]
+        assert sorted(pieces) == [1, 2, 3, 4]
+        assert staples == [1, 2]
+        assert backend.max_in_flight == 3
+        assert elapsed < 0.5
+        # The repeated lookup was fetched once, over a connection already open
+        assert all(len(combos) == 2 for combos in again)
+        assert backend.requests == 4
+        assert backend.connections <= 3
+
+
+def test_related_combos_are_found_in_one_cards_lookup():
+    async def scenario(url):
+        combos = ComboDatabaseService(url)
+        try:
+            return await combos.find_combos_with_cards([3, 2, 3]), await combos.find_combos_with_cards([])
+        finally:
+            await combos.aclose()
+
+    with FakeBackendServer() as backend:
+        related, none = asyncio.run(scenario(backend.url))
+        assert [combo.id for combo in related] == ["1-2", "2-3"]
+        assert none == []
+        assert backend.queries == [("/variants/", {"cards": "2,3", "limit": "100"})]
+
+
+def test_cache_is_keyed_on_the_normalized_query_and_expires():
+    async def scenario(url, backend):
+        clock = FakeClock()
+        combos = ComboDatabaseService(url, ttl_seconds=60, clock=clock)
+        try:
+            await combos.get_combo_pieces_for_colors(["U", "W"])
+            await combos.get_combo_pieces_for_colors(["W", "U"])
+            assert backend.requests == 1
+            clock.advance(61)
+            await combos.get_combo_pieces_for_colors(["W", "U"])
+            assert backend.requests == 2
+        finally:
+            await combos.aclose()
+
+    with FakeBackendServer() as backend:
+        asyncio.run(scenario(backend.url, backend))
+        assert backend.queries[0] == ("/variants/", {"q": "identity:UW", "limit": "50", "ordering": "-popularity"})
+
+
+def test_concurrent_identical_lookups_share_one_request():
+    async def scenario(url):
+        combos = ComboDatabaseService(url)
+        try:
+            return await asyncio.gather(*(combos.find_combos_for_commander(7) for _ in range(10)))
+        finally:
+            await combos.aclose()
+
+    with FakeBackendServer(delay_seconds=0.1) as backend:
+        results = asyncio.run(scenario(backend.url))
+        assert all(len(combos) == 2 for combos in results)
+        assert backend.requests == 1
+
+
+def test_failures_are_empty_and_not_cached():
+    async def scenario(url, backend):
+        combos = ComboDatabaseService(url)
+        try:
+            assert await combos.find_combos_for_commander(1) == []
+            backend.fail = False
+            assert len(await combos.find_combos_for_commander(1)) == 2
+        finally:
+            await combos.aclose()
+
+    with FakeBackendServer(fail=True) as backend:
+        asyncio.run(scenario(backend.url, backend))
+        assert backend.requests == 2
+
+    async def unreachable():
+        combos = ComboDatabaseService("http://127.0.0.1:9", timeout_seconds=1)
+        try:
+            return await combos.get_meta_staples(["B"])
+        finally:
+            await combos.aclose()
+
+    assert asyncio.run(unreachable()) == []
@@ -0,0 +1,129 @@
+import asyncio
+import sys
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from conftest import FakeRedis
+from services.combo_database import combo_db
+from services.result_cache import COALESCED, HIT, MISS, ResultCache, result_key
+
+engine_module = sys.modules["services.recommendation_engine"]
+
+
+def test_results_are_cached_and_concurrent_computations_coalesced():
+    async def scenario():
+        redis = FakeRedis()
+        cache = ResultCache(redis, ttl_seconds=60)
+        computed = []
+        admitted = []
+
+        async def compute():
+            computed.append(1)
+            await asyncio.sleep(0.05)
+            return {"deck": ["Sol Ring"]}
+
+        key = result_key("build-deck", "v1", 1, "commander", "balanced", "casual")
+        results = await asyncio.gather(*(cache.get_or_compute(key, compute, admit=lambda: admitted.append(1)) for _ in range(5)))
+        assert len(computed) == 1
+        assert len(admitted) == 1
+        assert sorted(outcome for _, outcome in results) == [COALESCED] * 4 + [MISS]
+        assert all(value == {"deck": ["Sol Ring"]} for value, _ in results)
+        assert list(redis.expiry.values()) == [60]
+
+        value, outcome = await cache.get_or_compute(key, compute)
+        assert (value, outcome) == ({"deck": ["Sol Ring"]}, HIT)
+        assert cache.metrics() == {"enabled": True, "hits": 1, "misses": 1, "coalesced": 4}
+
+        # A new data version is a new key
+        assert result_key("build-deck", "v2", 1, "commander", "balanced", "casual") != key
+
+    asyncio.run(scenario())
+
+
+def test_rejected_admission_only_fails_its_own_caller():
+    async def scenario():
+        cache = ResultCache(FakeRedis())
+
+        def reject():
+            raise HTTPException(status_code=429)
+
+        async def compute():
+            return {"ok": True}
+
+        with pytest.raises(HTTPException):
+            await cache.get_or_compute("key", compute, admit=reject)
+        assert await cache.get_or_compute("key", compute) == ({"ok": True}, MISS)
+
+    asyncio.run(scenario())
+
+
+def test_without_redis_results_are_computed_each_time():
+    async def scenario():
+        cache = ResultCache(None)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return {"ok": True}
+
+        await cache.get_or_compute("key", compute)
+        await cache.get_or_compute("key", compute)
+        return len(calls)
+
+    assert asyncio.run(scenario()) == 2
+
+
+@pytest.fixture
+def cached_app(ai_workflow_main, counted_cards, no_network, monkeypatch):
+    async def no_combos(*args):
+        return []
+
+    monkeypatch.setattr(combo_db, "find_combos_for_commander", no_combos)
+    monkeypatch.setattr(combo_db, "get_combo_pieces_for_colors", no_combos)
+    monkeypatch.setattr(engine_module, "card_db", counted_cards.database)
+    monkeypatch.setattr(ai_workflow_main, "result_cache", ResultCache(FakeRedis()))
+    ai_workflow_main.limiter.reset()
+    return TestClient(ai_workflow_main.app)
+
+
+def test_repeated_builds_are_served_from_the_cache(ai_workflow_main, cached_app, monkeypatch):
+    builds = []
+    build = engine_module.recommendation_engine.recommend_deck_with_combos
+    monkeypatch.setattr(engine_module.recommendation_engine, "recommend_deck_with_combos", lambda *args: builds.append(args) or build(*args))
+
+    request = {"commander": "Atraxa", "strategy_focus": "control", "budget_range": "casual"}
+    first = cached_app.post("/api/ai/build-deck", json=request)
+    second = cached_app.post("/api/ai/build-deck", json={**request, "commander": "atraxa, praetors' voice"})
+
+    assert first.status_code == second.status_code == 200
+    assert (first.headers["X-Cache"], second.headers["X-Cache"]) == (MISS, HIT)
+    assert first.json() == second.json()
+    assert len(first.json()["recommended_cards"]) == 30
+    assert len(builds) == 1
+
+    monkeypatch.setattr(ai_workflow_main.card_db.database, "version", "2025-07-01T00:00:00+00:00")
+    assert cached_app.post("/api/ai/build-deck", json=request).headers["X-Cache"] == MISS
+
+
+def test_only_computed_builds_count_against_the_build_limit(cached_app):
+    strategies = ["balanced", "aggro", "control", "combo"]
+    budgets = ["budget", "casual"]
+    requests = [{"commander": "Atraxa", "strategy_focus": s, "budget_range": b} for s in strategies for b in budgets]
+
+    statuses = [cached_app.post("/api/ai/build-deck", json=request).status_code for request in requests[:6]]
+    assert statuses == [200] * 5 + [429]
+
+    for _ in range(10):
+        cached = cached_app.post("/api/ai/build-deck", json=requests[0])
+        assert cached.status_code == 200
+        assert cached.headers["X-Cache"] == HIT
+
+
+def test_combo_analyses_are_cached(cached_app):
+    request = {"commander": "Atraxa", "cards": ["Sol Ring", "Demonic Tutor"]}
+    first = cached_app.post("/api/ai/analyze-combos", json=request)
+    second = cached_app.post("/api/ai/analyze-combos", json={**request, "cards": ["demonic tutor", "Sol Ring "]})
+    assert (first.headers["X-Cache"], second.headers["X-Cache"]) == (MISS, HIT)
+    assert first.json() == second.json()
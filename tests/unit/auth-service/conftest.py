@@ -0,0 +1,157 @@
+"""
+Shared fixtures for auth-service unit tests
+Redis and PostgreSQL are replaced by small in-memory fakes so that the service
+logic can be exercised without running containers
+"""
+
+import asyncio
+import importlib
+import os
+import sys
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import jwt
+import pytest
+from fastapi.security import HTTPAuthorizationCredentials
+
+AUTH_SERVICE_DIR = Path(__file__).resolve().parents[3] / "Jane" / "auth-service"
+sys.path.insert(0, str(AUTH_SERVICE_DIR))
+
+
+class FakePubSub:
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.channels = set()
+
+    async def subscribe(self, *channels):
+        for channel in channels:
+            self.channels.add(channel)
+            self.redis.subscribers.setdefault(channel, []).append(self)
+            await self.queue.put({"type": "subscribe", "channel": channel, "data": 1})
+
+    async def unsubscribe(self, *channels):
+        for channel in channels or list(self.channels):
+            self.channels.discard(channel)
+            if self in self.redis.subscribers.get(channel, []):
+                self.redis.subscribers[channel].remove(self)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def close(self):
+        await self.unsubscribe()
+
+
+class FakeRedis:
+    """Subset of the redis.asyncio client used by the auth service"""
+
+    def __init__(self):
+        self.data = {}
+        self.subscribers = {}
+        self.calls = []
+
+    async def get(self, key):
+        self.calls.append(("get", key))
+        return self.data.get(key)
+
+    async def set(self, key, value, **kwargs):
+        self.calls.append(("set", key))
+        self.data[key] = value
+        return True
+
+    async def setex(self, key, seconds, value):
+        self.calls.append(("setex", key))
+        self.data[key] = value
+        return True
+
+    async def delete(self, *keys):
+        self.calls.append(("delete", keys))
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    async def publish(self, channel, message):
+        self.calls.append(("publish", channel))
+        receivers = self.subscribers.get(channel, [])
+        for pubsub in receivers:
+            await pubsub.queue.put({"type": "message", "channel": channel, "data": message})
+        return len(receivers)
+
+    async def ping(self):
+        return True
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+
+class FakeConnection:
+    def __init__(self, database: "FakeDatabase"):
+        self.database = database
+
+    async def fetchval(self, query, *args):
+        return self.database.handle("fetchval", query, args)
+
+    async def fetchrow(self, query, *args):
+        return self.database.handle("fetchrow", query, args)
+
+    async def fetch(self, query, *args):
+        return self.database.handle("fetch", query, args)
+
+    async def execute(self, query, *args):
+        return self.database.handle("execute", query, args)
+
+
+class FakeDatabase:
+    """asyncpg pool stand-in answering queries through a handler callable"""
+
+    def __init__(self, handler=None):
+        self.handler = handler or (lambda method, query, args: None)
+        self.queries = []
+
+    def handle(self, method, query, args):
+        self.queries.append((method, " ".join(query.split()), args))
+        return self.handler(method, query, args)
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield FakeConnection(self)
+
+    async def close(self):
+        pass
+
+
+def make_token(service, user_id: str, redis: FakeRedis) -> HTTPAuthorizationCredentials:
+    jti = str(uuid.uuid4())
+    token = jwt.encode(
+        {
+            "sub": user_id,
+            "username": "alice",
+            "jti": jti,
+            "exp": datetime.utcnow() + timedelta(minutes=60),
+            "iat": datetime.utcnow(),
+            "type": "access",
+        },
+        service.jwt_secret,
+        algorithm=service.jwt_algorithm,
+    )
+    redis.data[f"session:{jti}"] = user_id
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def p99(samples):
+    samples = sorted(samples)
+    return samples[int(len(samples) * 0.99) - 1]
+
+
+@pytest.fixture(scope="session")
+def auth_main(tmp_path_factory):
+    """Import the service module with its log file redirected to a temporary directory"""
+    previous = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("auth-service"))
+    try:
+        return importlib.import_module("main")
+    finally:
+        os.chdir(previous)
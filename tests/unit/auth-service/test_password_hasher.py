@@ -0,0 +1,166 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from conftest import FakeDatabase, FakeRedis, make_token, p99
+from password_hasher import PasswordHasher, PasswordHasherSaturated
+
+PASSWORD = "correct horse battery staple"
+
+
+class SlowContext:
+    """CryptContext stand-in whose operations take a fixed time"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def hash(self, password):
+        time.sleep(self.seconds)
+        return f"hashed:{password}"
+
+    def verify(self, password, password_hash):
+        time.sleep(self.seconds)
+        return password_hash == f"hashed:{password}"
+
+
+def test_operations_run_off_the_event_loop():
+    async def scenario():
+        hasher = PasswordHasher(SlowContext(0.2), max_concurrency=2, max_queue=0, queue_timeout_seconds=1)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        hashes = await asyncio.gather(hasher.hash("a"), hasher.hash("b"))
+        ticking.cancel()
+        assert hashes == ["hashed:a", "hashed:b"]
+        assert await hasher.verify("a", "hashed:a")
+        assert ticks >= 10
+        hasher.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_saturation_fails_fast():
+    async def scenario():
+        hasher = PasswordHasher(SlowContext(0.2), max_concurrency=1, max_queue=1, queue_timeout_seconds=5)
+        running = asyncio.create_task(hasher.hash("a"))
+        await asyncio.sleep(0.01)
+        queued = asyncio.create_task(hasher.hash("b"))
+        await asyncio.sleep(0.01)
+        assert hasher.waiting == 1
+        start = time.perf_counter()
+        with pytest.raises(PasswordHasherSaturated):
+            await hasher.hash("c")
+        assert time.perf_counter() - start < 0.05
+        assert await running == "hashed:a"
+        assert await queued == "hashed:b"
+        hasher.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout():
+    async def scenario():
+        hasher = PasswordHasher(SlowContext(0.3), max_concurrency=1, max_queue=5, queue_timeout_seconds=0.05)
+        running = asyncio.create_task(hasher.hash("a"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(PasswordHasherSaturated):
+            await hasher.hash("b")
+        await running
+        hasher.shutdown()
+
+    asyncio.run(scenario())
+
+
+def make_service(auth_main, redis: FakeRedis, user_id: str, password_hash: str, **hasher_options):
+    row = {
+        "id": uuid.UUID(user_id),
+        "username": "alice",
+        "email": "alice@jane.local",
+        "full_name": None,
+        "password_hash": password_hash,
+        "is_active": True,
+        "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+        "last_login": None,
+    }
+
+    def handler(method, query, args):
+        if "FROM users" in query:
+            return row
+        return "UPDATE 1"
+
+    service = auth_main.AuthService()
+    service.redis_pool = redis
+    service.db_pool = FakeDatabase(handler)
+    if hasher_options:
+        service.password_hasher = PasswordHasher(auth_main.pwd_context, **hasher_options)
+    return service
+
+
+def test_busy_hasher_answers_503(auth_main):
+    async def scenario():
+        redis = FakeRedis()
+        service = make_service(auth_main, redis, str(uuid.uuid4()), f"hashed:{PASSWORD}", max_concurrency=1, max_queue=0, queue_timeout_seconds=1)
+        service.password_hasher.context = SlowContext(0.2)
+        results = await asyncio.gather(
+            service.authenticate_user("alice", PASSWORD),
+            service.authenticate_user("alice", PASSWORD),
+            return_exceptions=True,
+        )
+        errors = [r for r in results if isinstance(r, HTTPException)]
+        assert len(errors) == 1
+        assert errors[0].status_code == 503
+        assert errors[0].headers["Retry-After"] == "1"
+        service.password_hasher.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_me_latency_stays_flat_during_login_storm(auth_main):
+    """Concurrency test: /auth/me keeps answering while bcrypt logins pile up"""
+    password_hash = CryptContext(schemes=["bcrypt"], deprecated="auto").hash(PASSWORD)
+
+    async def me(service, credentials):
+        user = await service.verify_token(credentials)
+        return await auth_main.get_current_user_info(user)
+
+    async def scenario():
+        redis = FakeRedis()
+        user_id = str(uuid.uuid4())
+        service = make_service(auth_main, redis, user_id, password_hash, max_concurrency=2, max_queue=16, queue_timeout_seconds=30)
+        credentials = make_token(service, user_id, redis)
+        await me(service, credentials)
+
+        async def sample(duration: float):
+            samples = []
+            deadline = time.perf_counter() + duration
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                await me(service, credentials)
+                samples.append(time.perf_counter() - start)
+                await asyncio.sleep(0.005)
+            return samples
+
+        baseline = await sample(0.3)
+        storm_start = time.perf_counter()
+        logins = asyncio.gather(*(service.authenticate_user("alice", PASSWORD) for _ in range(6)))
+        during_storm = await sample(0.6)
+        users = await logins
+        storm_duration = time.perf_counter() - storm_start
+        service.password_hasher.shutdown()
+        return baseline, during_storm, users, storm_duration
+
+    baseline, during_storm, users, storm_duration = asyncio.run(scenario())
+    print(f"/auth/me p99: {p99(baseline) * 1e3:.2f} ms idle, {p99(during_storm) * 1e3:.2f} ms during a storm of 6 logins taking {storm_duration:.2f} s")
+    assert all(user is not None for user in users)
+    assert max(during_storm) < 0.05
@@ -0,0 +1,268 @@
+import asyncio
+import time
+import uuid
+from types import SimpleNamespace
+from datetime import datetime, timezone
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from conftest import FakeDatabase, FakeRedis, make_token, p99
+from principal_cache import PrincipalCache, listen_for_revocations
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def active_cache(**kwargs) -> PrincipalCache:
+    cache = PrincipalCache(**kwargs)
+    cache.active = True
+    return cache
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = active_cache(ttl_seconds=10, max_size=10, clock=clock)
+    cache.put("a", "alice", cache.generation)
+    clock.now = 9.9
+    assert cache.get("a") == "alice"
+    clock.now = 10
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_ttl_is_capped_by_token_lifetime():
+    clock = FakeClock()
+    cache = active_cache(ttl_seconds=10, max_size=10, clock=clock)
+    cache.put("a", "alice", cache.generation, ttl_seconds=2)
+    clock.now = 2
+    assert cache.get("a") is None
+    cache.put("b", "bob", cache.generation, ttl_seconds=-1)
+    assert cache.get("b") is None
+
+
+def test_size_is_bounded_least_recently_used_first():
+    cache = active_cache(ttl_seconds=10, max_size=2)
+    cache.put("a", "alice", cache.generation)
+    cache.put("b", "bob", cache.generation)
+    assert cache.get("a") == "alice"
+    cache.put("c", "carol", cache.generation)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == "alice"
+    assert cache.get("c") == "carol"
+
+
+def test_inactive_cache_serves_nothing():
+    cache = PrincipalCache(ttl_seconds=10, max_size=10)
+    cache.put("a", "alice", cache.generation)
+    cache.active = True
+    assert cache.get("a") is None
+
+
+def test_put_racing_with_invalidation_is_dropped():
+    cache = active_cache(ttl_seconds=10, max_size=10)
+    generation = cache.generation
+    cache.invalidate("a")
+    cache.put("a", "alice", generation)
+    assert cache.get("a") is None
+
+
+def test_listener_applies_broadcast_revocations():
+    async def scenario():
+        redis = FakeRedis()
+        cache = PrincipalCache(ttl_seconds=10, max_size=10)
+        listener = asyncio.create_task(listen_for_revocations(redis, cache))
+        await asyncio.sleep(0)
+        assert cache.active
+        cache.put("a", "alice", cache.generation)
+        cache.put("b", "bob", cache.generation)
+        await redis.publish("auth:revocations", "a")
+        await asyncio.sleep(0)
+        assert cache.get("a") is None
+        assert cache.get("b") == "bob"
+        await redis.publish("auth:revocations", "*")
+        await asyncio.sleep(0)
+        assert len(cache) == 0
+        listener.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await listener
+        assert not cache.active
+
+    asyncio.run(scenario())
+
+
+def test_listener_applies_broadcast_user_revocations():
+    async def scenario():
+        redis = FakeRedis()
+        cache = PrincipalCache(ttl_seconds=10, max_size=10)
+        listener = asyncio.create_task(listen_for_revocations(redis, cache))
+        await asyncio.sleep(0)
+        alice, bob = SimpleNamespace(id="1"), SimpleNamespace(id="2")
+        cache.put("a1", alice, cache.generation)
+        cache.put("a2", alice, cache.generation)
+        cache.put("b", bob, cache.generation)
+        await redis.publish("auth:revocations", "user:1")
+        await asyncio.sleep(0)
+        assert cache.get("a1") is None and cache.get("a2") is None
+        assert cache.get("b") is bob
+        listener.cancel()
+
+    asyncio.run(scenario())
+
+
+def make_row(user_id: str):
+    return {
+        "id": uuid.UUID(user_id),
+        "username": "alice",
+        "email": "alice@jane.local",
+        "full_name": None,
+        "is_active": True,
+        "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+        "last_login": None,
+    }
+
+
+def make_service(auth_main, redis: FakeRedis, user_id: str):
+    row = make_row(user_id)
+
+    def handler(method, query, args):
+        if "FROM users" in query:
+            return row
+        if "FROM sessions" in query:
+            return False
+        return "UPDATE 1"
+
+    service = auth_main.AuthService()
+    service.redis_pool = redis
+    service.db_pool = FakeDatabase(handler)
+    return service
+
+
+def test_user_lookups_come_from_redis(auth_main):
+    async def scenario():
+        redis = FakeRedis()
+        user_id = str(uuid.uuid4())
+        service = make_service(auth_main, redis, user_id)
+        first = await service.verify_token(make_token(service, user_id, redis))
+        assert len(service.db_pool.queries) == 1
+        second = await service.verify_token(make_token(service, user_id, redis))
+        assert second == first
+        assert len(service.db_pool.queries) == 1
+
+    asyncio.run(scenario())
+
+
+def test_revocation_reaches_every_worker(auth_main):
+    async def scenario():
+        redis = FakeRedis()
+        user_id = str(uuid.uuid4())
+        workers = [make_service(auth_main, redis, user_id) for _ in range(2)]
+        listeners = [asyncio.create_task(listen_for_revocations(redis, w.principal_cache)) for w in workers]
+        await asyncio.sleep(0)
+        credentials = make_token(workers[0], user_id, redis)
+        for worker in workers:
+            await worker.verify_token(credentials)
+            assert len(worker.principal_cache) == 1
+        jti = jwt.decode(credentials.credentials, options={"verify_signature": False})["jti"]
+        await workers[0].revoke_token(jti)
+        await asyncio.sleep(0)
+        for worker in workers:
+            with pytest.raises(HTTPException) as error:
+                await worker.verify_token(credentials)
+            assert error.value.status_code == 401
+        for listener in listeners:
+            listener.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_deactivated_users_stop_authenticating_on_every_worker(auth_main):
+    async def scenario():
+        redis = FakeRedis()
+        user_id = str(uuid.uuid4())
+        workers = [make_service(auth_main, redis, user_id) for _ in range(2)]
+        listeners = [asyncio.create_task(listen_for_revocations(redis, w.principal_cache)) for w in workers]
+        await asyncio.sleep(0)
+        credentials = make_token(workers[0], user_id, redis)
+        for worker in workers:
+            await worker.verify_token(credentials)
+        assert f"user:{user_id}" in redis.data
+        redis.data[f"api_key:{'0' * 64}"] = "{}"
+        active = {"is_active": True}
+
+        def handler(method, query, args):
+            if query.startswith("UPDATE users SET is_active = FALSE"):
+                active["is_active"] = False
+                return "UPDATE 1"
+            if "FROM api_keys" in query:
+                return [{"key_hash": "0" * 64}]
+            if "FROM users" in query:
+                return make_row(user_id) if active["is_active"] else None
+            return "UPDATE 1"
+        for worker in workers:
+            worker.db_pool.handler = handler
+
+        assert await workers[0].deactivate_user(user_id)
+        await asyncio.sleep(0)
+        assert f"user:{user_id}" not in redis.data
+        assert f"api_key:{'0' * 64}" not in redis.data
+        for worker in workers:
+            assert len(worker.principal_cache) == 0
+            with pytest.raises(HTTPException) as error:
+                await worker.verify_token(credentials)
+            assert error.value.status_code == 401
+        for listener in listeners:
+            listener.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_invalid_token_is_rejected_with_401(auth_main):
+    async def scenario():
+        redis = FakeRedis()
+        service = make_service(auth_main, redis, str(uuid.uuid4()))
+        with pytest.raises(HTTPException) as error:
+            await service.verify_token(HTTPAuthorizationCredentials(scheme="Bearer", credentials="not-a-jwt"))
+        assert error.value.status_code == 401
+
+    asyncio.run(scenario())
+
+
+def test_warm_cache_verify_token_latency(auth_main):
+    """Load test: p99 verify_token latency with a warm principal cache"""
+    async def measure(warm: bool):
+        redis = FakeRedis()
+        user_id = str(uuid.uuid4())
+        service = make_service(auth_main, redis, user_id)
+        listener = None
+        if warm:
+            listener = asyncio.create_task(listen_for_revocations(redis, service.principal_cache))
+            await asyncio.sleep(0)
+        tokens = [make_token(service, user_id, redis) for _ in range(50)]
+        for credentials in tokens:
+            await service.verify_token(credentials)
+        redis.calls.clear()
+        samples = []
+        for i in range(5000):
+            start = time.perf_counter()
+            await service.verify_token(tokens[i % len(tokens)])
+            samples.append(time.perf_counter() - start)
+        backend_calls = len(redis.calls)
+        if listener:
+            listener.cancel()
+        return p99(samples), backend_calls
+
+    warm_p99, warm_backend_calls = asyncio.run(measure(warm=True))
+    cold_p99, cold_backend_calls = asyncio.run(measure(warm=False))
+    print(f"verify_token p99: {warm_p99 * 1e6:.0f} us warm, {cold_p99 * 1e6:.0f} us without the principal cache")
+    assert warm_backend_calls == 0
+    assert cold_backend_calls > 0
+    assert warm_p99 < 0.005
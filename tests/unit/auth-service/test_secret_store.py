@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+from vault_secrets import InMemoryVault, VaultSecrets
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class LeasedVault(InMemoryVault):
+    def __init__(self, lease_duration: int):
+        super().__init__()
+        self.lease_duration = lease_duration
+
+    def read_secret_version(self, path: str, **kwargs):
+        response = super().read_secret_version(path, **kwargs)
+        response["lease_duration"] = self.lease_duration
+        return response
+
+
+def test_reads_are_cached_until_ttl():
+    async def scenario():
+        clock = FakeClock()
+        vault = InMemoryVault()
+        vault.store["jane"] = {"api_key": "one"}
+        secrets = VaultSecrets(vault, ttl_seconds=60, clock=clock)
+        for _ in range(10):
+            assert (await secrets.read("jane"))["api_key"] == "one"
+        assert vault.reads == 1
+        vault.store["jane"] = {"api_key": "two"}
+        clock.advance(61)
+        assert (await secrets.read("jane"))["api_key"] == "two"
+        assert vault.reads == 2
+
+    asyncio.run(scenario())
+
+
+def test_lease_shortens_ttl():
+    async def scenario():
+        clock = FakeClock()
+        vault = LeasedVault(lease_duration=5)
+        vault.store["jane"] = {"token": "t"}
+        secrets = VaultSecrets(vault, ttl_seconds=60, clock=clock)
+        await secrets.read("jane")
+        clock.advance(6)
+        await secrets.read("jane")
+        assert vault.reads == 2
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_reads_share_one_request():
+    async def scenario():
+        vault = InMemoryVault(latency_seconds=0.1)
+        vault.store["jane"] = {"api_key": "one"}
+        secrets = VaultSecrets(vault, ttl_seconds=60)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        results = await asyncio.gather(*(secrets.read("jane") for _ in range(50)))
+        ticking.cancel()
+        assert all(result == {"api_key": "one"} for result in results)
+        assert vault.reads == 1
+        assert ticks >= 5
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_reader_does_not_abort_shared_read():
+    async def scenario():
+        vault = InMemoryVault(latency_seconds=0.05)
+        vault.store["jane"] = {"api_key": "one"}
+        secrets = VaultSecrets(vault, ttl_seconds=60)
+        first = asyncio.create_task(secrets.read("jane"))
+        second = asyncio.create_task(secrets.read("jane"))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == {"api_key": "one"}
+        assert vault.reads == 1
+
+    asyncio.run(scenario())
+
+
+def test_failed_reads_are_not_cached():
+    async def scenario():
+        vault = InMemoryVault()
+        secrets = VaultSecrets(vault, ttl_seconds=60)
+        with pytest.raises(InMemoryVault.InvalidPath):
+            await secrets.read("jane")
+        vault.store["jane"] = {"api_key": "one"}
+        assert await secrets.read("jane") == {"api_key": "one"}
+
+    asyncio.run(scenario())
+
+
+def test_write_invalidates_and_drops_stale_inflight_read():
+    async def scenario():
+        vault = InMemoryVault(latency_seconds=0.05)
+        vault.store["jane"] = {"api_key": "old"}
+        secrets = VaultSecrets(vault, ttl_seconds=60)
+        reading = asyncio.create_task(secrets.read("jane"))
+        await asyncio.sleep(0.01)
+        await secrets.write("jane", {"api_key": "new"})
+        await reading
+        assert await secrets.read("jane") == {"api_key": "new"}
+
+    asyncio.run(scenario())
+
+
+def test_auth_service_uses_cached_vault(auth_main, monkeypatch):
+    async def scenario():
+        service = auth_main.AuthService()
+        vault = InMemoryVault()
+        service.vault_client = vault
+        service.vault = VaultSecrets(vault, ttl_seconds=60)
+        assert await service.store_secret("openai_api_key", "sk-test")
+        for _ in range(20):
+            assert await service.get_secret("openai_api_key") == "sk-test"
+        assert vault.reads == 1
+        assert vault.writes == 1
+        monkeypatch.setenv("MISSING_KEY", "from-env")
+        assert await service.get_secret("missing_key", path="elsewhere") == "from-env"
+
+    asyncio.run(scenario())
+
+
+def test_auth_service_without_vault_falls_back_to_environment(auth_main, monkeypatch):
+    async def scenario():
+        service = auth_main.AuthService()
+        monkeypatch.setenv("OPENAI_API_KEY", "from-env")
+        assert await service.get_secret("openai_api_key") == "from-env"
+        assert not await service.store_secret("openai_api_key", "sk-test")
+
+    asyncio.run(scenario())
@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from conftest import FakeDatabase, FakeRedis
+from timestamp_buffer import TimestampBuffer, flush_periodically
+
+API_KEY = "jane_secret"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += timedelta(seconds=seconds)
+
+
+def test_touches_are_coalesced_per_precision_window():
+    clock = FakeClock()
+    buffer = TimestampBuffer("api_keys", "last_used", precision_seconds=60, clock=clock)
+    row_id = uuid.uuid4()
+    assert buffer.touch(row_id)
+    clock.advance(30)
+    assert not buffer.touch(row_id)
+    assert len(buffer) == 1
+    clock.advance(30)
+    assert buffer.touch(row_id)
+    assert buffer.touch(uuid.uuid4())
+    assert len(buffer) == 2
+
+
+def test_flush_writes_one_batched_statement():
+    async def scenario():
+        clock = FakeClock()
+        buffer = TimestampBuffer("api_keys", "last_used", precision_seconds=60, clock=clock)
+        database = FakeDatabase()
+        ids = [uuid.uuid4() for _ in range(100)]
+        for _ in range(10):
+            for row_id in ids:
+                buffer.touch(row_id)
+        assert await buffer.flush(database) == 100
+        assert len(database.queries) == 1
+        method, query, (flushed_ids, timestamps) = database.queries[0]
+        assert method == "execute"
+        assert query.startswith("UPDATE api_keys AS t SET last_used = GREATEST(t.last_used, v.touched_at)")
+        assert flushed_ids == [str(row_id) for row_id in ids]
+        assert timestamps == [clock.now] * 100
+        assert await buffer.flush(database) == 0
+        assert len(database.queries) == 1
+
+    asyncio.run(scenario())
+
+
+def test_failed_flush_keeps_timestamps():
+    async def scenario():
+        buffer = TimestampBuffer("users", "last_login", precision_seconds=60)
+
+        def failing(method, query, args):
+            raise ConnectionError("database is down")
+
+        buffer.touch(uuid.uuid4())
+        with pytest.raises(ConnectionError):
+            await buffer.flush(FakeDatabase(failing))
+        assert len(buffer) == 1
+        assert await buffer.flush(FakeDatabase()) == 1
+
+    asyncio.run(scenario())
+
+
+def test_periodic_flusher_flushes_on_cancel():
+    async def scenario():
+        buffer = TimestampBuffer("users", "last_login", precision_seconds=60)
+        database = FakeDatabase()
+        flusher = asyncio.create_task(flush_periodically(database, [buffer], interval_seconds=3600))
+        await asyncio.sleep(0)
+        buffer.touch(uuid.uuid4())
+        flusher.cancel()
+        await asyncio.gather(flusher, return_exceptions=True)
+        assert len(database.queries) == 1
+        assert len(buffer) == 0
+
+    asyncio.run(scenario())
+
+
+def make_service(auth_main, expires_at=None):
+    key_row = {
+        "id": uuid.uuid4(),
+        "user_id": uuid.uuid4(),
+        "name": "ci",
+        "permissions": ["read"],
+        "expires_at": expires_at,
+        "username": "alice",
+        "email": "alice@jane.local",
+        "is_active": True,
+    }
+    deleted = []
+
+    def handler(method, query, args):
+        if query.lstrip().startswith("SELECT ak.id"):
+            return None if deleted else key_row
+        if "DELETE FROM api_keys" in query:
+            deleted.append(args[0])
+            return hashlib.sha256(API_KEY.encode()).hexdigest()
+        return None
+
+    service = auth_main.AuthService()
+    service.redis_pool = FakeRedis()
+    service.db_pool = FakeDatabase(handler)
+    return service, key_row
+
+
+def test_api_key_lookups_are_cached(auth_main):
+    async def scenario():
+        service, key_row = make_service(auth_main)
+        for _ in range(50):
+            key_data = await service.verify_api_key(API_KEY)
+            assert key_data["id"] == str(key_row["id"])
+            assert key_data["permissions"] == ["read"]
+        assert len(service.db_pool.queries) == 1
+        assert len(service.api_key_last_used) == 1
+
+    asyncio.run(scenario())
+
+
+def test_api_key_cache_respects_expiry(auth_main):
+    async def scenario():
+        service, _ = make_service(auth_main, expires_at=datetime.now(timezone.utc) + timedelta(seconds=1))
+        await service.verify_api_key(API_KEY)
+        assert not any(call[0] == "setex" for call in service.redis_pool.calls)
+
+    asyncio.run(scenario())
+
+
+def test_api_key_deletion_invalidates_cache(auth_main):
+    async def scenario():
+        service, key_row = make_service(auth_main)
+        assert await service.verify_api_key(API_KEY) is not None
+        assert await service.verify_api_key(API_KEY) is not None
+        assert len(service.db_pool.queries) == 1
+        assert await service.delete_api_key(str(key_row["id"]), str(key_row["user_id"]))
+        assert await service.verify_api_key(API_KEY) is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,170 @@
+"""
+Shared fixtures for MCP server unit tests
+Security tools are replaced by fake executables and a fake Docker client that
+report what they were asked to do, what they pulled and how many of them ran at once,
+and a Tree-sitter grammar library is compiled for the parser tests
+"""
+
+import os
+import stat
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+MCP_SERVER_DIR = Path(__file__).resolve().parents[3] / "Jane" / "mcp-server"
+sys.path.insert(0, str(MCP_SERVER_DIR))
+
+
+class FakeTools:
+    """Writes fake tool executables that sleep, print and exit as told
+
+    Each run records its pid in a file named after the tool while it runs, and
+    appends to a shared log when it starts and finishes.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.log = directory / "runs.log"
+        self.log.touch()
+
+    def make(self, name: str, stdout: str = "", seconds: float = 0.0, exit_code: int = 0) -> str:
+        path = self.directory / name
+        path.write_text(textwrap.dedent(f"""\
+            #!{sys.executable}
+            import os, sys, time
+            with open({str(self.log)!r}, "a") as log:
+                log.write("start {name}\\n")
+            with open({str(self.directory / (name + ".pid"))!r}, "w") as pid:
+                pid.write(str(os.getpid()))
+            time.sleep({seconds!r})
+            sys.stdout.write({stdout!r})
+            with open({str(self.log)!r}, "a") as log:
+                log.write("end {name}\\n")
+            sys.exit({exit_code!r})
+        """))
+        path.chmod(path.stat().st_mode | stat.S_IXUSR)
+        return str(path)
+
+    def pid(self, name: str) -> int:
+        return int((self.directory / (name + ".pid")).read_text())
+
+    def max_concurrent(self) -> int:
+        running = peak = 0
+        for line in self.log.read_text().splitlines():
+            running += 1 if line.startswith("start") else -1
+            peak = max(peak, running)
+        return peak
+
+    def finished(self, name: str) -> bool:
+        return f"end {name}" in self.log.read_text().splitlines()
+
+
+class FakeContainer:
+    def __init__(self, seconds: float, exit_code: int = 0):
+        self.seconds = seconds
+        self.exit_code = exit_code
+        self.killed = threading.Event()
+
+    def wait(self):
+        # Returns once the container "exits" by itself or is killed
+        if self.killed.wait(self.seconds):
+            return {"StatusCode": 137}
+        return {"StatusCode": self.exit_code}
+
+    def kill(self):
+        self.killed.set()
+
+
+class FakeImages:
+    def __init__(self, present=(), pull_seconds: float = 0.0):
+        self.present = set(present)
+        self.pull_seconds = pull_seconds
+        self.pulls = []
+        self.fail = None
+
+    def get(self, name):
+        if name not in self.present:
+            raise LookupError(f"No such image: {name}")
+
+    def pull(self, repository, tag=None):
+        time.sleep(self.pull_seconds)
+        self.pulls.append(f"{repository}:{tag}")
+        if self.fail:
+            raise RuntimeError(self.fail)
+        self.present.add(repository if tag == "latest" else f"{repository}:{tag}")
+
+
+class FakeDockerClient:
+    """The subset of docker.DockerClient used to pull images and run tool containers"""
+
+    def __init__(self, seconds: float = 0.0, present_images=(), pull_seconds: float = 0.0):
+        self.seconds = seconds
+        self.exit_code = 0
+        self.runs = []
+        self.containers = self
+        self.images = FakeImages(present_images, pull_seconds)
+        self.pings = 0
+        self.down = None
+        self.closed = False
+
+    def run(self, image, detach=False, **kwargs):
+        container = FakeContainer(self.seconds, self.exit_code)
+        self.runs.append((image, kwargs, container))
+        return container
+
+    def ping(self):
+        self.pings += 1
+        if self.down:
+            raise RuntimeError(self.down)
+        return True
+
+    def close(self):
+        self.closed = True
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+@pytest.fixture
+def fake_tools(tmp_path):
+    return FakeTools(tmp_path)
+
+
+# Pinned as in the Dockerfile's TREE_SITTER_GRAMMARS
+PYTHON_GRAMMAR_TAG = "v0.20.4"
+
+
+@pytest.fixture(scope="session")
+def grammar_library(tmp_path_factory):
+    """Compile the Python grammar into a library of its own
+
+    The grammar vendored into the image is used when there is one, and it is
+    cloned otherwise.
+    """
+    import code_parser
+
+    if code_parser.Language is None:
+        pytest.skip("needs tree_sitter")
+    grammars_dir = Path(code_parser.GRAMMARS_DIR)
+    if not (grammars_dir / code_parser.GRAMMAR_SOURCES["python"] / "src" / "parser.c").exists():
+        grammars_dir = tmp_path_factory.mktemp("grammars")
+        clone = subprocess.run(
+            ["git", "clone", "--depth", "1", "--branch", PYTHON_GRAMMAR_TAG,
+             "https://github.com/tree-sitter/tree-sitter-python", str(grammars_dir / "tree-sitter-python")],
+            capture_output=True,
+        )
+        if clone.returncode != 0:
+            pytest.skip(f"could not fetch the Python grammar: {clone.stderr.decode(errors='replace').strip()}")
+    library_path = str(tmp_path_factory.mktemp("tree-sitter") / "languages.so")
+    assert "python" in code_parser.build_library(str(grammars_dir), library_path)
+    return library_path
@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+
+from analysis_jobs import COMPLETED, FAILED, QUEUED, RUNNING, AnalysisJobQueue, JobQueueFull
+
+
+class Analysis:
+    """Counts how many analyses run at once, each taking two stages"""
+
+    def __init__(self, seconds: float = 0.0):
+        self.seconds = seconds
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, job):
+        self.calls += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            async with job.stage("file_structure"):
+                await asyncio.sleep(self.seconds)
+            async with job.stage("security"):
+                await asyncio.sleep(self.seconds)
+            return {"analysis_id": job.id, "call": self.calls}
+        finally:
+            self.running -= 1
+
+
+def test_submissions_return_at_once_and_run_on_a_bounded_pool():
+    async def scenario():
+        queue = AnalysisJobQueue(max_workers=2)
+        analysis = Analysis(seconds=0.05)
+        jobs = [queue.submit("codebase", {"repository_path": f"/repo/{i}"}, analysis) for i in range(5)]
+        statuses = [job.status for job in jobs]
+        await asyncio.gather(*(job.wait() for job in jobs))
+        await queue.stop()
+        return queue, analysis, jobs, statuses
+
+    queue, analysis, jobs, statuses = asyncio.run(scenario())
+    assert statuses == [QUEUED] * 5
+    assert analysis.calls == 5
+    assert analysis.max_running == 2
+    for job in jobs:
+        stored = queue.get(job.id).snapshot()
+        assert stored["status"] == COMPLETED
+        assert stored["result"]["analysis_id"] == job.id
+        assert [(stage["name"], stage["status"]) for stage in stored["stages"]] == [("file_structure", COMPLETED), ("security", COMPLETED)]
+    assert queue.metrics()["stored"] == 5
+
+
+def test_identical_concurrent_submissions_share_one_job():
+    async def scenario():
+        queue = AnalysisJobQueue(max_workers=2)
+        analysis = Analysis(seconds=0.05)
+        request = {"repository_path": "/repo", "language": "python"}
+        first = queue.submit("codebase", request, analysis)
+        second = queue.submit("codebase", dict(reversed(list(request.items()))), analysis)
+        other_kind = queue.submit("security", request, analysis)
+        await asyncio.gather(first.wait(), other_kind.wait())
+        # Once finished, the same request is analysed again
+        again = queue.submit("codebase", request, analysis)
+        await again.wait()
+        await queue.stop()
+        return queue, analysis, first, second, other_kind, again
+
+    queue, analysis, first, second, other_kind, again = asyncio.run(scenario())
+    assert second is first
+    assert other_kind is not first
+    assert again is not first
+    assert analysis.calls == 3
+    assert queue.metrics()["deduplicated"] == 1
+
+
+def test_progress_is_streamed_stage_by_stage():
+    async def scenario():
+        queue = AnalysisJobQueue()
+        job = queue.submit("codebase", {"repository_path": "/repo"}, Analysis(seconds=0.02))
+        events = [event async for event in job.events()]
+        await queue.stop()
+        return events
+
+    events = asyncio.run(scenario())
+    progress = [(event["status"], [(stage["name"], stage["status"]) for stage in event["stages"]]) for event in events]
+    assert progress[0] == (QUEUED, [])
+    assert (RUNNING, [("file_structure", RUNNING)]) in progress
+    assert (RUNNING, [("file_structure", COMPLETED), ("security", RUNNING)]) in progress
+    assert progress[-1] == (COMPLETED, [("file_structure", COMPLETED), ("security", COMPLETED)])
+    assert "result" in events[-1]
+    assert all("result" not in event for event in events[:-1])
+
+
+def test_failures_are_stored_with_the_failed_stage():
+    class NotFound(Exception):
+        detail = "Repository path not found"
+
+    async def failing(job):
+        async with job.stage("file_structure"):
+            raise NotFound()
+
+    async def scenario():
+        queue = AnalysisJobQueue()
+        job = queue.submit("codebase", {"repository_path": "/missing"}, failing)
+        await job.wait()
+        await queue.stop()
+        return job.snapshot()
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot["status"] == FAILED
+    assert snapshot["error"] == "Repository path not found"
+    assert snapshot["stages"][0]["status"] == FAILED
+    assert "result" not in snapshot
+
+
+def test_submissions_beyond_the_queue_bound_are_rejected():
+    async def scenario():
+        queue = AnalysisJobQueue(max_workers=1, max_queued=2)
+        analysis = Analysis(seconds=0.05)
+        jobs = [queue.submit("codebase", {"i": i}, analysis) for i in range(2)]
+        with pytest.raises(JobQueueFull) as rejected:
+            queue.submit("codebase", {"i": 2}, analysis)
+        await asyncio.gather(*(job.wait() for job in jobs))
+        await queue.stop()
+        return queue, rejected.value
+
+    queue, rejected = asyncio.run(scenario())
+    assert rejected.retry_after >= 1
+    assert queue.metrics()["rejected"] == 1
+
+
+def test_only_the_latest_finished_jobs_are_kept():
+    async def scenario():
+        queue = AnalysisJobQueue(max_stored_jobs=2)
+        analysis = Analysis()
+        ids = []
+        for i in range(4):
+            job = queue.submit("codebase", {"i": i}, analysis)
+            await job.wait()
+            ids.append(job.id)
+        await queue.stop()
+        return queue, ids
+
+    queue, ids = asyncio.run(scenario())
+    assert [queue.get(job_id) is not None for job_id in ids] == [False, False, True, True]
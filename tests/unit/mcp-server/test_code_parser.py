@@ -0,0 +1,130 @@
+import asyncio
+import os
+import signal
+
+from code_parser import CodeParser, complexity_rating, tree_metrics
+from file_metrics import FileMetricsCache
+
+
+class Node:
+    """Just enough of a tree_sitter.Node to walk"""
+
+    def __init__(self, type, children=(), line=0, end_line=None, text=None, **fields):
+        self.type = type
+        self.children = list(children)
+        self.start_point = (line, 0)
+        self.end_point = (line if end_line is None else end_line, 0)
+        self.text = text.encode() if text is not None else None
+        self.fields = fields
+        self.has_error = False
+        self.parent = None
+        for child in self.children + list(fields.values()):
+            child.parent = self
+        self.children += [child for child in fields.values() if child not in self.children]
+
+    def child_by_field_name(self, name):
+        return self.fields.get(name)
+
+
+def identifier(name, line=0):
+    return Node("identifier", line=line, text=name)
+
+
+def python_module():
+    """The tree of this module, with rows counted from 0 as Tree-sitter does
+
+    import os
+
+    def handle(x):
+        if x and ready(x):
+            return [y for y in x if y]
+        def inner():
+            while True:
+                pass
+
+    class Handler:
+        pass
+    """
+    inner = Node("function_definition", [Node("while_statement", line=6)], line=5, end_line=7, name=identifier("inner", 5))
+    handle = Node("function_definition", [
+        Node("if_statement", [Node("boolean_operator", line=3)], line=3),
+        Node("list_comprehension", [Node("for_in_clause", line=4), Node("if_clause", line=4)], line=4),
+        inner,
+    ], line=2, end_line=7, name=identifier("handle", 2))
+    handler = Node("class_definition", line=9, name=identifier("Handler", 9))
+    return Node("module", [Node("import_statement", line=0, text="import os"), handle, handler])
+
+
+def test_functions_classes_imports_and_complexity_from_the_tree():
+    metrics = tree_metrics(python_module(), "python")
+    assert [(f["name"], f["line"], f["end_line"], f["complexity"]) for f in metrics["functions"]] == [
+        ("handle", 3, 8, 5),
+        ("inner", 6, 8, 2),
+    ]
+    assert metrics["classes"] == [{"name": "Handler", "line": 10}]
+    assert metrics["imports"] == ["import os"]
+    assert metrics["complexity"] == 1 + 4 + 1
+    assert complexity_rating(metrics["functions"]) == "low"
+
+
+def test_c_names_and_short_circuit_operators():
+    declarator = Node("function_declarator", declarator=Node("identifier", text="parse"))
+    pointer = Node("pointer_declarator", declarator=declarator)
+    condition = Node("binary_expression", operator=Node("&&"))
+    arithmetic = Node("binary_expression", operator=Node("+"))
+    function = Node("function_definition", [Node("if_statement", [condition, arithmetic])], declarator=pointer)
+    forward = Node("struct_specifier", name=Node("type_identifier", text="node"))
+    definition = Node("struct_specifier", name=Node("type_identifier", text="list"), body=Node("field_declaration_list"))
+    metrics = tree_metrics(Node("translation_unit", [function, forward, definition]), "c")
+    assert [(f["name"], f["complexity"]) for f in metrics["functions"]] == [("parse", 3)]
+    assert [c["name"] for c in metrics["classes"]] == ["list"]
+
+
+def test_without_a_grammar_library_files_are_still_measured(tmp_path):
+    parser = CodeParser(library_path=str(tmp_path / "missing.so"))
+    assert parser.languages == []
+    assert asyncio.run(parser.parse("def f(): pass", "python")) is None
+
+    (tmp_path / "app.py").write_text("def f():\n    pass\n")
+    metrics = FileMetricsCache(parser=parser).scan(tmp_path, "python")
+    assert metrics["lines_of_code"] == 2
+    assert metrics["function_count"] == 0
+
+
+def test_a_pool_broken_by_a_dying_worker_is_replaced(tmp_path):
+    (tmp_path / "app.py").write_text("def f():\n    pass\n")
+    parser = CodeParser(library_path=str(tmp_path / "missing.so"), max_workers=1)
+    try:
+        assert parser.measure_files([str(tmp_path / "app.py")]) == [{"lines": 2}]
+        broken = parser.executor
+        for pid in list(broken._processes):
+            os.kill(pid, signal.SIGKILL)
+
+        assert parser.measure_files([str(tmp_path / "app.py")]) == [{"lines": 2}]
+        assert parser.executor is not broken
+    finally:
+        parser.shutdown()
+
+
+def test_real_grammars_parse_in_parallel_with_cached_results(tmp_path, grammar_library):
+    source = "import os\n\ndef handle(x):\n    if x and x.ready:\n        return 1\n    return 0\n\nclass Handler:\n    pass\n"
+    for i in range(8):
+        (tmp_path / f"module_{i}.py").write_text(source)
+
+    parser = CodeParser(library_path=grammar_library, max_workers=2)
+    assert "python" in parser.languages
+    try:
+        async def scenario():
+            return await parser.parse(source, "python"), await parser.parse(source, "python")
+
+        first, again = asyncio.run(scenario())
+        assert again is first
+        assert parser.metrics()["hits"] == 1
+        assert [(f["name"], f["complexity"]) for f in first["functions"]] == [("handle", 3)]
+        assert [c["name"] for c in first["classes"]] == ["Handler"]
+
+        metrics = FileMetricsCache(parser=parser).scan(tmp_path, "python")
+        assert metrics["function_count"] == 8
+        assert metrics["class_count"] == 8
+    finally:
+        parser.shutdown()
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from conftest import FakeDockerClient
+from docker_service import FAILED, HEALTHY, READY, STARTING, UNHEALTHY, DockerService, DockerUnavailable
+
+SEMGREP = "returntocorp/semgrep"
+TRIVY = "aquasec/trivy"
+
+
+def test_missing_images_are_pulled_once_at_startup():
+    client = FakeDockerClient(present_images=[SEMGREP], pull_seconds=0.2)
+
+    async def scenario():
+        service = DockerService(lambda: client, [SEMGREP, TRIVY])
+        before = service.status()["status"]
+        await service.start()
+        # A run arriving during the pre-pull waits for it instead of pulling again
+        await asyncio.gather(service.ensure_image(TRIVY), service.ensure_image(TRIVY), service.ensure_image(SEMGREP))
+        status = service.status()
+        await service.stop()
+        return before, status
+
+    before, status = asyncio.run(scenario())
+    assert before == STARTING
+    assert status["status"] == HEALTHY
+    assert status["images"] == {SEMGREP: READY, TRIVY: READY}
+    assert client.images.pulls == [f"{TRIVY}:latest"]
+    assert client.closed
+
+
+def test_failed_pulls_fail_runs_fast_and_are_retried_in_the_background():
+    client = FakeDockerClient()
+    client.images.fail = "pull access denied"
+
+    async def scenario():
+        service = DockerService(lambda: client, [TRIVY], health_interval_seconds=0.05)
+        await service.start()
+        with pytest.raises(DockerUnavailable, match="pull access denied"):
+            await service.ensure_image(TRIVY)
+        with pytest.raises(DockerUnavailable, match="not a pre-pulled tool image"):
+            await service.ensure_image("someone/else")
+        failed = service.status()["images"][TRIVY]
+        client.images.fail = None
+        await asyncio.sleep(0.2)
+        await service.ensure_image(TRIVY)
+        await service.stop()
+        return failed
+
+    assert asyncio.run(scenario()) == FAILED
+    assert client.images.pulls[-1] == f"{TRIVY}:latest"
+
+
+def test_health_is_served_from_the_background_check():
+    client = FakeDockerClient(present_images=[TRIVY])
+
+    async def scenario():
+        service = DockerService(lambda: client, [TRIVY], health_interval_seconds=0.05)
+        await service.start()
+        pings = client.pings
+        statuses = [service.status()["status"] for _ in range(100)]
+        assert client.pings == pings
+        client.down = "daemon not responding"
+        await asyncio.sleep(0.15)
+        down = service.status()
+        await service.stop()
+        return statuses, down
+
+    statuses, down = asyncio.run(scenario())
+    assert set(statuses) == {HEALTHY}
+    assert down["status"] == UNHEALTHY
+    assert down["error"] == "daemon not responding"
+
+
+def test_an_unreachable_daemon_does_not_stop_startup():
+    def no_daemon():
+        raise RuntimeError("Error while fetching server API version")
+
+    async def scenario():
+        service = DockerService(no_daemon, [TRIVY])
+        await service.start()
+        with pytest.raises(DockerUnavailable):
+            await service.ensure_image(TRIVY)
+        status = service.status()
+        with pytest.raises(DockerUnavailable, match="unhealthy"):
+            async with service.container_slot():
+                pass
+        await service.stop()
+        return status
+
+    status = asyncio.run(scenario())
+    assert status["status"] == UNHEALTHY
+    assert status["images"] == {TRIVY: FAILED}
+
+
+def test_containers_run_in_a_bounded_number_of_slots():
+    client = FakeDockerClient(present_images=[SEMGREP])
+    running = []
+
+    async def scenario():
+        service = DockerService(lambda: client, [SEMGREP], max_containers=2)
+        await service.start()
+
+        async def tool():
+            async with service.container_for(SEMGREP) as docker_client:
+                assert docker_client is client
+                running.append(service.running)
+                await asyncio.sleep(0.05)
+
+        await asyncio.gather(*(tool() for _ in range(5)))
+        status = service.status()
+        await service.stop()
+        return status
+
+    status = asyncio.run(scenario())
+    assert max(running) == 2
+    assert status["containers"] == {"slots": 2, "running": 0}
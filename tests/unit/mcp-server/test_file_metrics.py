@@ -0,0 +1,69 @@
+import asyncio
+import os
+import threading
+
+import file_metrics
+from file_metrics import FileMetricsCache, count_lines
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def make_repo(root):
+    write(root / "app.py", "import os\n\ndef main():\n    pass\n")
+    write(root / "pkg" / "util.py", "x = 1\ny = 2")
+    write(root / "README.md", "# app\n")
+    for ignored in (".git", "node_modules", "vendor", "pkg/__pycache__"):
+        write(root / ignored / "ignored.py", "print('ignored')\n" * 50)
+    return root
+
+
+def test_count_lines_streams_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_metrics, "READ_CHUNK_BYTES", 4)
+    for text, lines in (("", 0), ("a", 1), ("a\n", 1), ("a\nb", 2), ("one\ntwo\nthree\n\n", 4)):
+        (tmp_path / "f.py").write_text(text)
+        assert count_lines(str(tmp_path / "f.py")) == lines == len(text.splitlines())
+
+
+def test_walk_skips_ignored_directories(tmp_path):
+    metrics = FileMetricsCache().scan(make_repo(tmp_path), "python")
+    assert metrics["total_files"] == 3
+    assert metrics["source_files"] == 2
+    assert metrics["lines_of_code"] == 6
+    assert metrics["file_types"] == {".py": 2, ".md": 1}
+    assert [f["path"] for f in metrics["largest_files"]] == ["app.py", os.path.join("pkg", "util.py")]
+
+
+def test_unchanged_files_are_only_stat(tmp_path, monkeypatch):
+    repo = make_repo(tmp_path)
+    cache = FileMetricsCache()
+    first = cache.scan(repo, "python")
+
+    reads = []
+    real_count_lines = file_metrics.count_lines
+    monkeypatch.setattr(file_metrics, "count_lines", lambda path: reads.append(path) or real_count_lines(path))
+    assert cache.scan(repo, "python") == first
+    assert reads == []
+    assert cache.metrics() == {"entries": 2, "hits": 2, "misses": 2}
+
+    write(repo / "pkg" / "util.py", "x = 1\ny = 2\nz = 3\n")
+    changed = cache.scan(repo, "python")
+    assert reads == [str(repo / "pkg" / "util.py")]
+    assert changed["lines_of_code"] == 7
+
+
+def test_analysis_runs_off_the_event_loop(tmp_path, monkeypatch):
+    repo = make_repo(tmp_path)
+    cache = FileMetricsCache()
+    threads = []
+    real_scan = cache.scan
+    monkeypatch.setattr(cache, "scan", lambda *args: threads.append(threading.get_ident()) or real_scan(*args))
+
+    async def scenario():
+        return await cache.analyze(repo, "python"), threading.get_ident()
+
+    metrics, loop_thread = asyncio.run(scenario())
+    assert metrics["source_files"] == 2
+    assert threads and threads[0] != loop_thread
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+
+from conftest import FakeDockerClient, pid_alive
+from docker_service import DockerService
+from tool_runner import FAILED, OK, TIMED_OUT, ToolRunner
+
+
+def command_job(runner, argv):
+    async def job():
+        _, stdout, _ = await runner.run_command(argv)
+        return json.loads(stdout)["findings"]
+    return job
+
+
+def test_tools_run_concurrently_up_to_the_limit(fake_tools):
+    report = json.dumps({"findings": [{"severity": "high"}]})
+    binaries = {f"tool{i}": fake_tools.make(f"tool{i}", report, seconds=0.5) for i in range(4)}
+
+    async def scenario():
+        runner = ToolRunner(max_concurrency=2)
+        start = time.perf_counter()
+        results = await runner.run_all({tool: command_job(runner, [binary]) for tool, binary in binaries.items()})
+        return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(scenario())
+    assert [result.tool for result in results] == ["tool0", "tool1", "tool2", "tool3"]
+    assert all(result.status == OK and result.findings == [{"severity": "high"}] for result in results)
+    assert fake_tools.max_concurrent() == 2
+    # Four tools one after another would sleep for at least 2s
+    assert elapsed < 2
+
+
+def test_slow_and_failing_tools_do_not_hide_the_others(fake_tools):
+    fast = fake_tools.make("fast", json.dumps({"findings": [{"severity": "low"}]}))
+    slow = fake_tools.make("slow", seconds=30)
+    broken = fake_tools.make("broken", "not json", exit_code=2)
+
+    async def scenario():
+        runner = ToolRunner(max_concurrency=4, default_timeout_seconds=10, timeouts={"slow": 0.5})
+        start = time.perf_counter()
+        results = await runner.run_all({
+            "fast": command_job(runner, [fast]),
+            "slow": command_job(runner, [slow]),
+            "broken": command_job(runner, [broken]),
+            "missing": command_job(runner, [str(fake_tools.directory / "missing")]),
+        })
+        return runner, results, time.perf_counter() - start
+
+    runner, results, elapsed = asyncio.run(scenario())
+    by_tool = {result.tool: result for result in results}
+    assert by_tool["fast"].status == OK
+    assert by_tool["fast"].findings == [{"severity": "low"}]
+    assert by_tool["slow"].status == TIMED_OUT
+    assert by_tool["broken"].status == FAILED
+    assert by_tool["missing"].status == FAILED
+    assert elapsed < 2
+    # The timed out process was killed rather than left running
+    assert not pid_alive(fake_tools.pid("slow"))
+    assert not fake_tools.finished("slow")
+    assert runner.metrics() == {"max_concurrency": 4, "running": 0, "completed": 1, "failed": 2, "timed_out": 1}
+    assert by_tool["slow"].report()["status"] == TIMED_OUT
+
+
+def test_timed_out_containers_are_killed():
+    docker_client = FakeDockerClient(seconds=30)
+
+    async def scenario():
+        runner = ToolRunner(timeouts={"semgrep": 0.2})
+
+        async def job():
+            await runner.run_container(docker_client, "returntocorp/semgrep", command="semgrep /src", remove=True)
+            return []
+        return await runner.run("semgrep", job)
+
+    result = asyncio.run(scenario())
+    assert result.status == TIMED_OUT
+    (image, kwargs, container), = docker_client.runs
+    assert image == "returntocorp/semgrep"
+    assert kwargs == {"command": "semgrep /src", "remove": True}
+    assert container.killed.is_set()
+
+
+def test_containers_exiting_with_an_unexpected_status_fail():
+    docker_client = FakeDockerClient()
+
+    async def scenario(exit_code, exit_codes):
+        docker_client.exit_code = exit_code
+        runner = ToolRunner()
+
+        async def job():
+            await runner.run_container(docker_client, "returntocorp/semgrep", exit_codes=exit_codes, command="semgrep /src")
+            return []
+        return await runner.run("semgrep", job)
+
+    assert asyncio.run(scenario(1, (0, 1))).status == OK
+    oom_killed = asyncio.run(scenario(137, (0, 1)))
+    assert oom_killed.status == FAILED
+    assert oom_killed.error == "returntocorp/semgrep exited with status 137"
+    assert asyncio.run(scenario(1, (0,))).status == FAILED
+
+
+def test_time_spent_acquiring_does_not_count_against_the_timeout():
+    held = []
+
+    @asynccontextmanager
+    async def slow_slot():
+        await asyncio.sleep(0.5)
+        held.append(True)
+        yield "docker-client"
+        held.pop()
+
+    @asynccontextmanager
+    async def no_slot():
+        raise RuntimeError("Docker is unhealthy")
+        yield
+
+    async def job(docker_client):
+        assert held
+        return [{"tool": "semgrep", "client": docker_client}]
+
+    async def scenario():
+        runner = ToolRunner(timeouts={"semgrep": 0.2, "trivy": 0.2})
+        return runner, await runner.run_all({"semgrep": job, "trivy": job}, {"semgrep": slow_slot, "trivy": no_slot})
+
+    runner, (semgrep, trivy) = asyncio.run(scenario())
+    assert semgrep.status == OK
+    assert semgrep.findings == [{"tool": "semgrep", "client": "docker-client"}]
+    assert semgrep.duration_seconds < 0.2
+    assert not held
+    assert trivy.status == FAILED and trivy.error == "Docker is unhealthy"
+    assert runner.metrics()["running"] == 0
+
+
+def test_tools_waiting_for_an_image_do_not_hold_a_slot(fake_tools):
+    bandit = fake_tools.make("bandit", json.dumps({"findings": [{"severity": "low"}]}), seconds=0.1)
+    docker_client = FakeDockerClient(pull_seconds=1.0)
+
+    async def scenario():
+        docker = DockerService(lambda: docker_client, ["returntocorp/semgrep"])
+        await docker.start()
+        runner = ToolRunner(max_concurrency=1)
+
+        async def semgrep(client):
+            # The pull is still going when bandit is started, so bandit has already run
+            assert fake_tools.finished("bandit")
+            await runner.run_container(client, "returntocorp/semgrep", command="semgrep /src")
+            return []
+
+        try:
+            return await runner.run_all(
+                {"semgrep": semgrep, "bandit": command_job(runner, [bandit])},
+                {"semgrep": lambda: docker.container_for("returntocorp/semgrep")},
+            )
+        finally:
+            await docker.stop()
+
+    semgrep, bandit = asyncio.run(scenario())
+    assert bandit.status == OK and bandit.findings == [{"severity": "low"}]
+    assert semgrep.status == OK
+    assert docker_client.images.pulls == ["returntocorp/semgrep:latest"]
@@ -0,0 +1,46 @@
+"""
+Shared fixtures for Motoko LLM server unit tests
+Ollama is replaced by a fake token-producing backend so that the server can be
+exercised without a GPU or downloaded models
+"""
+
+import asyncio
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+MOTOKO_LLM_DIR = Path(__file__).resolve().parents[3] / "motoko" / "llm"
+sys.path.insert(0, str(MOTOKO_LLM_DIR))
+
+
+class FakeOllama:
+    """Async Ollama client stand-in producing one token per delay"""
+
+    def __init__(self, tokens, delay_seconds: float = 0.0):
+        self.tokens = list(tokens)
+        self.delay_seconds = delay_seconds
+        self.produced = 0
+        self.closed = False
+        self.requests = []
+
+    async def generate(self, model, prompt, options=None, stream=False):
+        self.requests.append({"model": model, "prompt": prompt, "options": options, "stream": stream})
+        return self._stream()
+
+    async def _stream(self):
+        try:
+            for token in self.tokens:
+                if self.delay_seconds:
+                    await asyncio.sleep(self.delay_seconds)
+                self.produced += 1
+                yield {"response": token, "done": False}
+            yield {"response": "", "done": True, "eval_count": len(self.tokens)}
+        finally:
+            self.closed = True
+
+
+@pytest.fixture(scope="session")
+def llm_server():
+    return importlib.import_module("llm_server")
@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import httpx
+
+from response_cache import COALESCED, HIT, MISS, ResponseCache, cache_key
+from scheduler import GenerationScheduler
+
+HEADERS = {"Authorization": "Bearer test"}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def setex(self, key, seconds, value):
+        self.data[key] = value
+
+
+def test_key_normalizes_prompt_and_options():
+    options = {"temperature": 0, "top_p": 0.9, "max_tokens": 100}
+    assert cache_key("llama2", "Summarize:\r\n  tasks  \n", options) == cache_key("llama2", "Summarize:\n  tasks", dict(reversed(options.items())))
+    assert cache_key("llama2", "a", options) != cache_key("mistral", "a", options)
+    assert cache_key("llama2", "a", options) != cache_key("llama2", "a", {**options, "max_tokens": 200})
+
+
+def test_entries_expire_and_are_bounded():
+    async def scenario():
+        clock = FakeClock()
+        cache = ResponseCache(max_entries=2, ttl_seconds=60, clock=clock)
+        for key in "abc":
+            await cache.put(key, {"response": key})
+        assert len(cache) == 2
+        assert await cache.get("a") is None
+        assert await cache.get("c") == {"response": "c"}
+        clock.advance(61)
+        assert await cache.get("c") is None
+
+    asyncio.run(scenario())
+
+
+def test_redis_backend_is_shared():
+    async def scenario():
+        redis = FakeRedis()
+        first = ResponseCache(max_entries=10, ttl_seconds=60, redis=redis)
+        second = ResponseCache(max_entries=10, ttl_seconds=60, redis=redis)
+        await first.put("k", {"response": "shared"})
+        return await second.get("k")
+
+    assert asyncio.run(scenario()) == {"response": "shared"}
+
+
+def test_concurrent_identical_requests_generate_once():
+    async def scenario():
+        cache = ResponseCache(max_entries=10, ttl_seconds=60)
+        calls = 0
+
+        async def generate():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {"response": "once"}
+
+        results = await asyncio.gather(*(cache.get_or_generate("k", generate) for _ in range(10)))
+        later = await cache.get_or_generate("k", generate)
+        return calls, results, later
+
+    calls, results, later = asyncio.run(scenario())
+    assert calls == 1
+    assert [outcome for _, outcome in results].count(MISS) == 1
+    assert [outcome for _, outcome in results].count(COALESCED) == 9
+    assert later == ({"response": "once"}, HIT)
+
+
+def test_generate_endpoint_caches_deterministic_requests(llm_server, monkeypatch):
+    calls = []
+
+    def stub_generate(model, prompt, options):
+        calls.append(prompt)
+        time.sleep(0.05)
+        return {"response": f"answer to {prompt}", "eval_count": 3}
+
+    monkeypatch.setattr(llm_server.ollama, "generate", stub_generate)
+    monkeypatch.setattr(llm_server, "scheduler", GenerationScheduler(max_in_flight_per_model=1, max_queue=10, max_queue_wait_seconds=5))
+    monkeypatch.setattr(llm_server, "response_cache", ResponseCache(max_entries=10, ttl_seconds=60))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=llm_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://motoko") as client:
+            deterministic = {"prompt": "Summarize my day", "options": {"temperature": 0}}
+            concurrent = await asyncio.gather(*(client.post("/generate", json=deterministic, headers=HEADERS) for _ in range(5)))
+            repeated = await client.post("/generate", json={**deterministic, "prompt": "  Summarize my day\n"}, headers=HEADERS)
+            creative = [await client.post("/generate", json={"prompt": "Write a poem"}, headers=HEADERS) for _ in range(2)]
+            allowed = [await client.post("/generate", json={"prompt": "Write a poem", "cache": True}, headers=HEADERS) for _ in range(2)]
+            metrics = (await client.get("/metrics/queue", headers=HEADERS)).json()
+        return concurrent, repeated, creative, allowed, metrics
+
+    concurrent, repeated, creative, allowed, metrics = asyncio.run(scenario())
+    assert sorted(response.json()["cache"] for response in concurrent) == ["coalesced"] * 4 + ["miss"]
+    assert repeated.json() == {"response": "answer to Summarize my day", "model_used": "llama2", "tokens_generated": 3, "cache": "hit"}
+    assert [response.json()["cache"] for response in creative] == ["bypass", "bypass"]
+    assert [response.json()["cache"] for response in allowed] == ["miss", "hit"]
+    assert calls == ["Summarize my day", "Write a poem", "Write a poem", "Write a poem"]
+    assert metrics["response_cache"] == {"entries": 2, "hits": 2, "misses": 2, "coalesced": 4}
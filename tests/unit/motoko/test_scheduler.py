@@ -0,0 +1,170 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from scheduler import GenerationScheduler, SchedulerFull
+
+HEADERS = {"Authorization": "Bearer test"}
+
+
+async def stub_generation(scheduler, model, key, seconds, log):
+    async with scheduler.slot(model, key):
+        log.append(("start", model, key))
+        await asyncio.sleep(seconds)
+        log.append(("end", model, key))
+
+
+def test_in_flight_generations_are_capped_per_model():
+    async def scenario():
+        scheduler = GenerationScheduler(max_in_flight_per_model=2, max_queue=10, max_queue_wait_seconds=5)
+        running = {"llama2": 0, "mistral": 0}
+        peak = {"llama2": 0, "mistral": 0}
+
+        async def generation(model):
+            async with scheduler.slot(model, "key"):
+                running[model] += 1
+                peak[model] = max(peak[model], running[model])
+                await asyncio.sleep(0.02)
+                running[model] -= 1
+
+        await asyncio.gather(*(generation(model) for model in ["llama2"] * 6 + ["mistral"] * 2))
+        return peak, scheduler.metrics()
+
+    peak, metrics = asyncio.run(scenario())
+    assert peak == {"llama2": 2, "mistral": 2}
+    assert metrics["completed"] == 8
+    assert metrics["queue_depth"] == 0
+    assert metrics["wait_seconds"]["count"] == 8
+
+
+def test_api_keys_take_turns():
+    async def scenario():
+        scheduler = GenerationScheduler(max_in_flight_per_model=1, max_queue=10, max_queue_wait_seconds=5)
+        log = []
+        tasks = [asyncio.create_task(stub_generation(scheduler, "llama2", "busy", 0.01, log)) for _ in range(5)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(stub_generation(scheduler, "llama2", "quiet", 0.01, log)))
+        await asyncio.gather(*tasks)
+        return [key for event, _, key in log if event == "start"]
+
+    order = asyncio.run(scenario())
+    assert order[:3] == ["busy", "busy", "quiet"]
+
+
+def test_full_queue_is_rejected():
+    async def scenario():
+        scheduler = GenerationScheduler(max_in_flight_per_model=1, max_queue=1, max_queue_wait_seconds=5)
+        log = []
+        running = asyncio.create_task(stub_generation(scheduler, "llama2", "a", 0.05, log))
+        queued = asyncio.create_task(stub_generation(scheduler, "llama2", "b", 0.0, log))
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerFull) as rejection:
+            await scheduler.acquire("llama2", "c")
+        await asyncio.gather(running, queued)
+        return rejection.value, scheduler
+
+    rejection, scheduler = asyncio.run(scenario())
+    assert rejection.reason == "queue is full"
+    assert rejection.retry_after >= 1
+    assert scheduler.rejected == 1
+    assert scheduler.completed == 2
+
+
+def test_long_waits_are_rejected():
+    async def scenario():
+        scheduler = GenerationScheduler(max_in_flight_per_model=1, max_queue=10, max_queue_wait_seconds=0.05)
+        log = []
+        running = asyncio.create_task(stub_generation(scheduler, "llama2", "a", 0.2, log))
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        with pytest.raises(SchedulerFull) as timed_out:
+            await scheduler.acquire("llama2", "b")
+        assert time.perf_counter() - start >= 0.05
+        assert timed_out.value.reason == "timed out in queue"
+        assert scheduler.queued() == 0
+        await running
+
+        # Generation times are now known, so a request that cannot start in time is rejected at once
+        running = asyncio.create_task(stub_generation(scheduler, "llama2", "a", 0.2, log))
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        with pytest.raises(SchedulerFull) as estimated:
+            await scheduler.acquire("llama2", "b")
+        assert time.perf_counter() - start < 0.01
+        assert estimated.value.reason == "estimated wait is too long"
+        await running
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.in_flight("llama2") == 0
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def scenario():
+        scheduler = GenerationScheduler(max_in_flight_per_model=1, max_queue=10, max_queue_wait_seconds=5)
+        log = []
+        running = asyncio.create_task(stub_generation(scheduler, "llama2", "a", 0.05, log))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(scheduler.acquire("llama2", "b"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(running, waiting, return_exceptions=True)
+        await stub_generation(scheduler, "llama2", "c", 0, log)
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.in_flight("llama2") == 0
+    assert scheduler.queued() == 0
+
+
+def test_busy_server_answers_503(llm_server, monkeypatch):
+    def slow_generate(model, prompt, options):
+        time.sleep(0.2)
+        return {"response": "done", "eval_count": 1}
+
+    monkeypatch.setattr(llm_server.ollama, "generate", slow_generate)
+    monkeypatch.setattr(llm_server, "scheduler", GenerationScheduler(max_in_flight_per_model=1, max_queue=1, max_queue_wait_seconds=5))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=llm_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://motoko") as client:
+            responses = await asyncio.gather(*(client.post("/generate", json={"prompt": f"q{i}"}, headers=HEADERS) for i in range(3)))
+            metrics = (await client.get("/metrics/queue", headers=HEADERS)).json()
+        return responses, metrics
+
+    responses, metrics = asyncio.run(scenario())
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses == [200, 200, 503]
+    busy = next(response for response in responses if response.status_code == 503)
+    assert int(busy.headers["Retry-After"]) >= 1
+    assert metrics["admitted"] == 2
+    assert metrics["rejected"] == 1
+    assert metrics["models"]["llama2"]["in_flight"] == 0
+
+
+def test_stream_holds_a_slot_until_it_ends(llm_server, monkeypatch):
+    from conftest import FakeOllama
+
+    fake = FakeOllama(["a", "b"], delay_seconds=0.05)
+    scheduler = GenerationScheduler(max_in_flight_per_model=1, max_queue=0, max_queue_wait_seconds=5)
+    monkeypatch.setattr(llm_server, "ollama_client", fake)
+    monkeypatch.setattr(llm_server, "scheduler", scheduler)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=llm_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://motoko") as client:
+            streaming = asyncio.create_task(client.post("/generate/stream", json={"prompt": "hi"}, headers=HEADERS))
+            await asyncio.sleep(0.03)
+            assert scheduler.in_flight("llama2") == 1
+            rejected = await client.post("/generate/stream", json={"prompt": "hi"}, headers=HEADERS)
+            response = await streaming
+        return rejected, [json.loads(line) for line in response.text.splitlines() if line]
+
+    rejected, lines = asyncio.run(scenario())
+    assert rejected.status_code == 503
+    assert lines[-1]["done"]
+    assert scheduler.in_flight("llama2") == 0
+    assert scheduler.completed == 1
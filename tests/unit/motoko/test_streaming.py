@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from conftest import FakeOllama
+
+HEADERS = {"Authorization": "Bearer test"}
+
+
+def test_tokens_are_streamed(llm_server, monkeypatch):
+    fake = FakeOllama(["Hello", ",", " world"])
+    monkeypatch.setattr(llm_server, "ollama_client", fake)
+    client = TestClient(llm_server.app)
+    with client.stream("POST", "/generate/stream", json={"prompt": "Say hello", "options": {"max_tokens": 5000}}, headers=HEADERS) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+    assert lines[:3] == [{"token": "Hello"}, {"token": ","}, {"token": " world"}]
+    assert lines[3] == {"done": True, "model_used": "llama2", "tokens_generated": 3}
+    assert fake.requests[0]["stream"]
+    assert fake.requests[0]["options"]["max_tokens"] == 2000
+    assert fake.closed
+
+
+def test_invalid_request_is_rejected(llm_server, monkeypatch):
+    monkeypatch.setattr(llm_server, "ollama_client", FakeOllama([]))
+    client = TestClient(llm_server.app)
+    response = client.post("/generate/stream", json={"prompt": "hi", "model": "gpt-4"}, headers=HEADERS)
+    assert response.status_code == 422
+
+
+def test_ollama_errors_end_the_stream(llm_server, monkeypatch):
+    class FailingOllama(FakeOllama):
+        async def _stream(self):
+            yield {"response": "partial", "done": False}
+            raise llm_server.ollama.ResponseError("model not found")
+
+    monkeypatch.setattr(llm_server, "ollama_client", FailingOllama([]))
+    client = TestClient(llm_server.app)
+    with client.stream("POST", "/generate/stream", json={"prompt": "hi"}, headers=HEADERS) as response:
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+    assert lines == [{"token": "partial"}, {"error": "Ollama service error"}]
+
+
+def test_client_disconnect_stops_generation(llm_server, monkeypatch):
+    fake = FakeOllama([f"t{i} " for i in range(100)], delay_seconds=0.01)
+    monkeypatch.setattr(llm_server, "ollama_client", fake)
+
+    async def scenario():
+        body = json.dumps({"prompt": "Tell me a long story"}).encode()
+        disconnected = asyncio.Event()
+        received = []
+
+        async def receive():
+            if not received:
+                received.append(True)
+                return {"type": "http.request", "body": body, "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        chunks = []
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                chunks.append(message["body"])
+                if len(chunks) == 3:
+                    disconnected.set()
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/generate/stream",
+            "raw_path": b"/generate/stream",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"content-type", b"application/json"), (b"authorization", b"Bearer test")],
+            "client": ("127.0.0.1", 1234),
+            "server": ("127.0.0.1", 8000),
+        }
+        await asyncio.wait_for(llm_server.app(scope, receive, send), 5)
+        return chunks
+
+    chunks = asyncio.run(scenario())
+    assert 3 <= len(chunks) < 10
+    assert fake.closed
+    assert fake.produced < 10
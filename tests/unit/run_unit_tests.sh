@@ -66,7 +66,7 @@ PASSED_COMPONENTS=0
 FAILED_COMPONENTS=0
 
 # Components to test
-COMPONENTS=("spellbook" "spellbook-client" "website" "common")
+COMPONENTS=("spellbook" "spellbook-client" "website" "common" "auth-service" "adhd-support" "motoko" "ai-workflow-fastapi" "mcp-server")
 
 for component in "${COMPONENTS[@]}"; do
     ((TOTAL_COMPONENTS++))
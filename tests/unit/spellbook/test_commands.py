@@ -1,9 +1,11 @@
 import json
 import datetime
+from io import StringIO
 from time import sleep
 from pathlib import Path
 from datetime import timedelta
 from django.test import TestCase
+from django.core.management import call_command
 from django.utils import timezone
 from django.conf import settings
 from django.contrib.auth.models import User
@@ -97,3 +99,9 @@ class CleanJobsTest(TestCaseMixinWithSeeding, TestCase):
         launch_job_command('combo_of_the_day')
         result = WebsiteProperty.objects.get(key=COMBO_OF_THE_DAY).value
         self.assertTrue(Variant.objects.filter(pk=result).exists())
+
+    def test_benchmark_graph(self):
+        output = StringIO()
+        call_command('benchmark_graph', repeat=1, stdout=output)
+        self.assertIn('Graph construction', output.getvalue())
+        self.assertIn('matches found by both strategies', output.getvalue())
@@ -1,7 +1,8 @@
+import re
 from django.test import TestCase
 from spellbook.tests.testing import TestCaseMixinWithSeeding
 from common.inspection import count_methods
-from spellbook.models import Card, Job, PreSerializedSerializer, Template, Variant, id_from_cards_and_templates_ids
+from spellbook.models import Card, Feature, Job, PreSerializedSerializer, Template, Variant, id_from_cards_and_templates_ids, estimate_bracket
 from spellbook.serializers import VariantSerializer
 from decimal import Decimal
 from urllib.parse import quote_plus
@@ -62,7 +63,7 @@ class VariantTests(TestCaseMixinWithSeeding, TestCase):
         self.assertTrue(v.query_string().startswith('q='))
 
     def test_method_count(self):
-        self.assertEqual(count_methods(Variant), 12)
+        self.assertEqual(count_methods(Variant), 13)
 
     def test_update_variant_from_cards(self):
         v: Variant = Variant.objects.get(id=self.v1_id)
@@ -111,6 +112,31 @@ class VariantTests(TestCaseMixinWithSeeding, TestCase):
         self.assertTrue(v.update_variant_from_recipe(recipe))
         self.assertFalse(v.update_variant_from_recipe(recipe))
 
+    def test_bracket_fields(self):
+        patterns = {
+            'extra_turns': r'(?:near-)?infinite (?:extra )?turns?',
+            'mass_land_denial': r'mass land (?:destruction|denial)',
+            'skip_turns': r'(?:infinite(?:ly)? )?skip (?:(?:all )?(?:your )|infinite )?(?:future )?turns?',
+        }
+        f = Feature.objects.get(id=self.f4_id)
+        for name in ('Infinite turns', 'Near-infinite extra turns', 'Mass land denial', 'Lock', 'Infinitely skip all your turns', 'FD'):
+            with self.subTest(name):
+                f.name = name
+                f.save()
+                for v in Variant.recipes_prefetched.all():
+                    features = [feature.name for feature in v.produces.all()]
+                    for field, pattern in patterns.items():
+                        self.assertEqual(getattr(v, field), any(re.search(pattern, feature, re.IGNORECASE) for feature in features))
+                    self.assertEqual(v.lock, any(feature.lower() == 'lock' for feature in features))
+                    recipe = v.get_recipe()
+                    estimate = estimate_bracket([c for _, c in recipe.cards], [t for _, t in recipe.templates], [(v, recipe)])
+                    self.assertEqual(estimate.data.extra_turns_combos, [v] if v.extra_turns else [])
+                    self.assertEqual(estimate.data.mass_land_denial_combos, [v] if v.mass_land_denial else [])
+                    self.assertEqual(estimate.data.lock_combos, [v] if v.lock else [])
+                    self.assertEqual(estimate.data.skip_turns_combos, [v] if v.skip_turns else [])
+                    self.assertEqual(estimate.bracket_tag, v.bracket_tag)
+                    self.assertFalse(v.update_variant())
+
     def test_update_variant(self):
         v: Variant = Variant.objects.get(id=self.v1_id)
         self.assertFalse(v.update_variant())
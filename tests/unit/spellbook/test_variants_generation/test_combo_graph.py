@@ -2,8 +2,8 @@ from multiset import FrozenMultiset
 from django.test import TestCase
 from spellbook.models import Card, Combo, FeatureAttribute
 from spellbook.models.feature import Feature
-from spellbook.variants.variant_data import Data
-from spellbook.variants.combo_graph import FeatureWithAttributes, Graph, VariantIngredients, VariantSet, VariantRecipe
+from spellbook.variants.variant_data import AttributesMatcher, Data
+from spellbook.variants.combo_graph import AttributesIndex, FeatureWithAttributes, Graph, VariantIngredients, VariantSet, VariantRecipe
 from spellbook.tests.testing import TestCaseMixinWithSeeding, TestCaseMixin
 
 
@@ -108,6 +108,30 @@ class ComboGraphTest(TestCaseMixinWithSeeding, TestCase):
                     self.assertTrue(card_ids.issuperset(replacement_card_ids))
                     self.assertTrue(template_ids.issuperset(replacement_template_ids))
 
+    def test_attributes_index(self):
+        attribute_sets = [frozenset(s) for s in ((), (1,), (2,), (1, 2), (2, 3), (1, 2, 3), (4,))]
+        index = AttributesIndex({attributes: attributes for attributes in attribute_sets})
+        candidates = (frozenset(), frozenset({1}), frozenset({2, 3}), frozenset({1, 4}), frozenset({5}))
+        for any_of in candidates:
+            for all_of in candidates:
+                for none_of in candidates:
+                    matcher = AttributesMatcher(any_of=any_of, all_of=all_of, none_of=none_of)
+                    with self.subTest(matcher=matcher):
+                        self.assertEqual(index.matching(matcher), [a for a in attribute_sets if matcher.matches(a)])
+        self.assertEqual(AttributesIndex({}).matching(AttributesMatcher(frozenset(), frozenset(), frozenset())), [])
+
+    def test_attributes_matching(self):
+        data = Data()
+        combo_graph = Graph(data=data)
+        for feature_id, famnodes in combo_graph.famnodes.items():
+            for fam in famnodes.values():
+                self.assertEqual(
+                    fam.matches,
+                    {fa for attributes, fa in combo_graph.fanodes.get(feature_id, {}).items() if fam.item.matcher.matches(attributes)},
+                )
+                for fa in fam.matches:
+                    self.assertIn(fam, fa.matches)
+
 
 class ComboGraphTestGeneration(TestCaseMixin, TestCase):
     def assertReplacementsEqual(
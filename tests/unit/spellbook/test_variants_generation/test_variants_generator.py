@@ -9,7 +9,8 @@ from spellbook.models import Job, Variant, Card, IngredientInCombination, CardIn
 from spellbook.variants.combo_graph import FeatureWithAttributes
 from spellbook.variants.variant_data import Data
 from spellbook.variants.variants_generator import get_variants_from_graph, get_default_zone_location_for_card, update_state_with_default
-from spellbook.variants.variants_generator import generate_variants, apply_replacements, subtract_features, update_state
+from spellbook.variants.variants_generator import generate_variants, apply_replacements, get_replacements_strings, subtract_features, update_state
+from spellbook.variants.variants_generator import VariantRecipeDefinition
 from spellbook.variants.variants_generator import sync_variant_aliases
 from spellbook.utils import launch_job_command
 
@@ -156,6 +157,9 @@ class VariantsGeneratorTests(TestCaseMixinWithSeeding, TestCase):
             name='Normal Card',
             type_line='Instant',
         )
+
+        def recipe(card_ids: list[int], template_ids: list[int] = []) -> VariantRecipeDefinition:
+            return VariantRecipeDefinition(card_ids=FrozenMultiset(card_ids), template_ids=FrozenMultiset(template_ids))
         fx = Feature.objects.create(name='FX')
         fy = Feature.objects.create(name='FY')
         fz = Feature.objects.create(name='FZ')
@@ -165,15 +169,15 @@ class VariantsGeneratorTests(TestCaseMixinWithSeeding, TestCase):
         fn = FeatureNeededInCombo.objects.create(combo=combo, feature=fx)
         fn.none_of_attributes.add(fattr)
         replacements = {
-            FeatureWithAttributes(Feature.objects.get(id=self.f1_id), frozenset()): [([Card.objects.get(id=self.c1_id)], []), ([Card.objects.get(id=self.c2_id)], [])],
-            FeatureWithAttributes(Feature.objects.get(id=self.f2_id), frozenset()): [([], [Template.objects.get(id=self.t1_id)]), ([], [Template.objects.get(id=self.t2_id)])],
-            FeatureWithAttributes(Feature.objects.get(id=self.f3_id), frozenset()): [([Card.objects.get(id=self.c1_id), Card.objects.get(id=self.c2_id)], [Template.objects.get(id=self.t1_id), Template.objects.get(id=self.t2_id)])],
-            FeatureWithAttributes(fx, frozenset({fattr.id})): [([normal_card], [])],  # Test invalid entries due to attributes
-            FeatureWithAttributes(fx, frozenset()): [([legendary_card], [])],
-            FeatureWithAttributes(fy, frozenset()): [([non_legendary_card], [])],
-            FeatureWithAttributes(fy, frozenset({fattr.id})): [([normal_card], [])],  # Test for multiple valid entries with different attributes
-            FeatureWithAttributes(fz, frozenset()): [([legendary_modal_card], [])],
-            FeatureWithAttributes(fw, frozenset()): [([legendary_card, non_legendary_card, legendary_modal_card, normal_card], [])],
+            FeatureWithAttributes(Feature.objects.get(id=self.f1_id), frozenset()): [recipe([self.c1_id]), recipe([self.c2_id])],
+            FeatureWithAttributes(Feature.objects.get(id=self.f2_id), frozenset()): [recipe([], [self.t1_id]), recipe([], [self.t2_id])],
+            FeatureWithAttributes(Feature.objects.get(id=self.f3_id), frozenset()): [recipe([self.c1_id, self.c2_id], [self.t1_id, self.t2_id])],
+            FeatureWithAttributes(fx, frozenset({fattr.id})): [recipe([normal_card.id])],  # Test invalid entries due to attributes
+            FeatureWithAttributes(fx, frozenset()): [recipe([legendary_card.id])],
+            FeatureWithAttributes(fy, frozenset()): [recipe([non_legendary_card.id])],
+            FeatureWithAttributes(fy, frozenset({fattr.id})): [recipe([normal_card.id])],  # Test for multiple valid entries with different attributes
+            FeatureWithAttributes(fz, frozenset()): [recipe([legendary_modal_card.id])],
+            FeatureWithAttributes(fw, frozenset()): [recipe([legendary_card.id, non_legendary_card.id, legendary_modal_card.id, normal_card.id])],
         }
         tests = [
             ('', ''),
@@ -196,8 +200,14 @@ class VariantsGeneratorTests(TestCaseMixinWithSeeding, TestCase):
             ('Multiple replacements: [[FW]]', 'Multiple replacements: The Name + The Name, different Title + The Name, the Title  // Another Name, Another Title + Normal Card'),
         ]
         data = Data()
+        replacements_strings = get_replacements_strings(data, replacements, {combo.id})
+        for test in tests:
+            self.assertEqual(apply_replacements(test[0], replacements_strings), test[1])
         for test in tests:
-            self.assertEqual(apply_replacements(data, test[0], replacements, {combo.id}), test[1])
+            self.assertEqual(apply_replacements(test[0], replacements_strings), test[1])
+        self.assertEqual(get_replacements_strings(data, replacements, {combo.id}), replacements_strings)
+        self.assertIn(legendary_card.id, data.card_to_replacement_name)
+        self.assertIn(frozenset({combo.id}), data.combos_to_needed_features_by_feature)
 
     def test_restore_variant(self):
         # TODO: Implement